@@ -0,0 +1,368 @@
+"""
+Headless batch run of the MemoryDiary analysis over a directory of patient exports.
+
+Usage:
+    python batch.py <exports_folder> <manifest.csv> <output_folder> [--workers N] [--trace] [--profile-stage NAME]
+                    [--cohort] [--report [--raster-report]] [--state-folder FOLDER] [--store DB]
+                    [--format xlsx|parquet|csv]
+
+The manifest has a 'patient' column matching the export file names (without extension) and one column
+per treatment session date (YYYY-MM-DD), in session order.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+import flow_control
+from errors import InvalidExport
+from logics import (
+    artifacts,
+    cache,
+    cohort,
+    filter_data,
+    incremental,
+    loader,
+    output_writer,
+    statistics,
+    store,
+    trace,
+    trends,
+    validators,
+)
+from logics.utils import use_agg_backend
+
+use_agg_backend()
+
+EXPORT_EXTENSIONS = [".xlsx", ".xls", ".csv"]
+SUMMARY_FILE = "run_summary.csv"
+TRACE_FILE = "trace.json"
+VALIDATION_FILE = "validation_report.csv"
+
+
+def read_manifest(manifest_path: str) -> Dict[str, List]:
+    """
+    Read the patient to treatment dates manifest.
+
+    Args:
+        manifest_path (str): The path of the manifest CSV file.
+
+    Returns:
+        Dict[str, List]: The treatment dates (datetime.date) of every patient, in session order.
+    """
+    manifest = pd.read_csv(manifest_path, dtype={"patient": str})
+    session_columns = [col for col in manifest.columns if col != "patient"]
+    return {
+        row["patient"]: [
+            pd.Timestamp(row[col]).date() for col in session_columns if pd.notna(row[col])
+        ]
+        for _, row in manifest.iterrows()
+    }
+
+
+def find_export(exports_folder: str, patient: str) -> str:
+    """
+    Find the export file of a patient.
+
+    Args:
+        exports_folder (str): The folder containing the exports.
+        patient (str): The patient id, the export file name without extension.
+
+    Raises:
+        FileNotFoundError: If the folder has no export for the patient.
+
+    Returns:
+        str: The path of the export.
+    """
+    for extension in EXPORT_EXTENSIONS:
+        file_path = os.path.join(exports_folder, f"{patient}{extension}")
+        if os.path.isfile(file_path):
+            return file_path
+    raise FileNotFoundError(f"No export found for patient {patient}")
+
+
+def process_patient(
+    patient: str,
+    exports_folder: str,
+    treatment_dates: List,
+    output_folder: str,
+    cache_folder: str = None,
+    trace_enabled: bool = False,
+    profile_stage: str = None,
+    state_folder: str = None,
+    store_path: str = None,
+    graphs: bool = True,
+    output_format: str = None,
+) -> Tuple[dict, pd.DataFrame]:
+    """
+    Run the full pipeline for one patient and write the outputs to the patient's own folder.
+
+    Args:
+        patient (str): The patient id.
+        exports_folder (str): The folder containing the exports.
+        treatment_dates (List): The treatment dates of the patient.
+        output_folder (str): The folder where the per-patient folders are created.
+        cache_folder (str): The cache folder of the parsed and filtered tables, None to disable the cache.
+        trace_enabled (bool): Whether to write the stage timings of the run to trace.json in the patient's folder.
+        profile_stage (str): The name of a stage to profile with cProfile into the patient's folder.
+        state_folder (str): The folder of the incremental state of every patient, None to rebuild the patient.
+        store_path (str): The SQLite event store the patient's events, daily counts and sessions are saved to.
+        graphs (bool): Whether to write the graphs PDF of the patient.
+        output_format (str): None for the daily counts workbook and the two Excel summaries, or one of
+            output_writer.TABLE_FORMATS for the daily counts and the phase tables in a single workbook or in a
+            Parquet or CSV file each.
+
+    Returns:
+        Tuple[dict, pd.DataFrame]: A row of the run summary and the daily counts, None if the run failed or the
+        counts were saved to the store.
+    """
+    start = time.perf_counter()
+    summary = {"patient": patient, "status": "ok", "error": "", "days": 0}
+    df = None
+    try:
+        validators.validate_order(treatment_dates)
+        patient_folder = os.path.join(output_folder, patient)
+        os.makedirs(patient_folder, exist_ok=True)
+
+        trace_path = os.path.join(patient_folder, TRACE_FILE) if trace_enabled else None
+        profile_path = os.path.join(patient_folder, f"profile-{patient}-{profile_stage}.prof")
+        with trace.recording(trace_path, profile_stage, profile_path):
+            export_path = find_export(exports_folder, patient)
+            events = None
+            if state_folder:
+                df, phase_df, changed = incremental.update_patient(
+                    export_path, treatment_dates, os.path.join(state_folder, patient)
+                )
+                if store_path:
+                    events = incremental.read_events(os.path.join(state_folder, patient))
+                summary["status"] = "ok" if changed else "unchanged"
+                if changed or not os.listdir(patient_folder):
+                    flow_control.run_reports(
+                        df,
+                        treatment_dates,
+                        patient_folder,
+                        show_graphs=False,
+                        parallel=False,
+                        phase_df=phase_df,
+                        graphs=graphs,
+                        output_format=output_format,
+                        source=patient,
+                        counts=True,
+                    )
+            else:
+                if cache_folder:
+                    events, df = cache.load_filtered(export_path, cache_folder)
+                else:
+                    events, df = filter_data.build_tables(loader.load_export(export_path))
+                flow_control.run_reports(
+                    df,
+                    treatment_dates,
+                    patient_folder,
+                    show_graphs=False,
+                    parallel=False,
+                    graphs=graphs,
+                    output_format=output_format,
+                    source=patient,
+                    counts=True,
+                )
+            if store_path:
+                with trace.stage("write store", len(df)):
+                    connection = store.connect(store_path)
+                    store.put_patient(connection, patient, df, events, treatment_dates)
+                    connection.close()
+        summary["days"] = len(df)
+        if store_path:
+            df = None
+    except InvalidExport as e:
+        summary["status"] = "failed"
+        summary["error"] = "InvalidExport: " + e.args[0].replace("\n", "; ")
+        e.args[1].to_csv(os.path.join(output_folder, patient, VALIDATION_FILE), index=False)
+        df = None
+    except Exception as e:
+        summary["status"] = "failed"
+        summary["error"] = f"{type(e).__name__}: {e}"
+        df = None
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary, df
+
+
+def run_batch(
+    exports_folder: str,
+    manifest_path: str,
+    output_folder: str,
+    workers: int = None,
+    cache_folder: str = cache.CACHE_FOLDER,
+    trace_enabled: bool = False,
+    profile_stage: str = None,
+    cohort_report: bool = False,
+    state_folder: str = None,
+    store_path: str = None,
+    graphs_report: bool = False,
+    output_format: str = None,
+    raster_report: bool = False,
+) -> pd.DataFrame:
+    """
+    Run the pipeline for every patient of the manifest on a process pool.
+
+    Args:
+        exports_folder (str): The folder containing the exports.
+        manifest_path (str): The path of the manifest CSV file.
+        output_folder (str): The folder where the outputs and the run summary are written.
+        workers (int): The number of worker processes, defaults to the number of CPUs.
+        cache_folder (str): The cache folder of the parsed and filtered tables, None to disable the cache.
+        trace_enabled (bool): Whether to write a JSON trace of the stage timings for every patient.
+        profile_stage (str): The name of a stage to profile with cProfile for every patient.
+        cohort_report (bool): Whether to also write the cohort workbook (with the bootstrap intervals and permutation
+            tests of the changes from the baseline) and figure of all the processed patients.
+        state_folder (str): The folder of the incremental state of every patient, None to rebuild every patient.
+        store_path (str): The SQLite event store every patient is saved to. The cohort report is then read
+            from the store instead of the workers returning every patient's counts.
+        graphs_report (bool): Whether to write the graphs of all the processed patients into one multi-page PDF
+            instead of a graphs PDF per patient.
+        output_format (str): None for the Excel files of every patient, or one of output_writer.TABLE_FORMATS for
+            its daily counts and phase tables in a single streamed workbook or in a Parquet or CSV file each.
+        raster_report (bool): Whether the pages of the graphs report are rendered to images by the workers instead
+            of being drawn as vector pages.
+
+    Returns:
+        pd.DataFrame: The run summary, one row per patient.
+    """
+    manifest = read_manifest(manifest_path)
+    os.makedirs(output_folder, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                process_patient,
+                patient,
+                exports_folder,
+                dates,
+                output_folder,
+                cache_folder,
+                trace_enabled,
+                profile_stage,
+                state_folder,
+                store_path,
+                not graphs_report,
+                output_format,
+            )
+            for patient, dates in manifest.items()
+        ]
+        results = [future.result() for future in futures]
+
+    summary = pd.DataFrame([row for row, _ in results])
+    summary.to_csv(os.path.join(output_folder, SUMMARY_FILE), index=False)
+
+    daily_frames = {row["patient"]: df for row, df in results if df is not None}
+    processed = [row["patient"] for row, _ in results if row["status"] != "failed"]
+    if not (cohort_report or graphs_report):
+        return summary
+    if store_path and processed:
+        connection = store.connect(store_path)
+        daily_frames = {patient: store.read_daily(connection, patient) for patient in processed}
+        connection.close()
+    if not daily_frames:
+        return summary
+
+    # The cohort outputs are named after the daily counts and sessions of all the patients, and not rewritten
+    # when they are up to date
+    sessions = {patient: manifest[patient] for patient in daily_frames}
+    cohort_df = cohort.build_cohort(daily_frames)
+    key = artifacts.output_key(
+        cohort_df, {patient: artifacts.iso_dates(dates) for patient, dates in sessions.items()}
+    )
+    written = []
+    if cohort_report:
+        written += [artifacts.COHORT_SUMMARY, artifacts.COHORT_GRAPHS]
+        if not all(artifacts.is_up_to_date(output_folder, artifact, key) for artifact in written):
+            if store_path:
+                connection = store.connect(store_path)
+                patient_phases = store.query_phases(connection, sessions)
+                connection.close()
+            else:
+                patient_phases = cohort.cohort_phases(cohort_df, sessions)
+            cohort.write_cohort_outputs(
+                patient_phases,
+                cohort.summarize_phases(patient_phases),
+                output_folder,
+                statistics.cohort_effects(patient_phases),
+                statistics.cohort_patient_effects(daily_frames, manifest, workers=workers),
+                key,
+                trends.cohort_trends(cohort_df),
+            )
+    if graphs_report:
+        written.append(artifacts.GRAPHS_REPORT)
+        if not artifacts.is_up_to_date(output_folder, artifacts.GRAPHS_REPORT, key):
+            from logics import report
+
+            report.write_report(
+                {patient: (df, manifest[patient]) for patient, df in daily_frames.items()},
+                artifacts.artifact_path(output_folder, artifacts.GRAPHS_REPORT, key),
+                workers=workers,
+                raster=raster_report,
+            )
+    artifacts.record_artifacts(output_folder, key, written, {"patients": list(sessions)}, "cohort")
+    return summary
+
+
+def main(argv: List = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the MemoryDiary analysis for a folder of patients.")
+    parser.add_argument("exports_folder", help="folder containing the patient exports")
+    parser.add_argument("manifest", help="CSV file with a 'patient' column and one column per session date")
+    parser.add_argument("output_folder", help="folder where the outputs are written")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--cache-folder", default=cache.CACHE_FOLDER, help="cache of the parsed exports")
+    parser.add_argument("--no-cache", action="store_true", help="always parse and filter the exports")
+    parser.add_argument("--trace", action="store_true", help="write a JSON trace of the stages per patient")
+    parser.add_argument("--profile-stage", default=None, help="name of a stage to dump a cProfile of")
+    parser.add_argument("--cohort", action="store_true", help="also write the cohort workbook and figure")
+    parser.add_argument(
+        "--report", action="store_true", help="write the graphs of all the patients into one multi-page PDF"
+    )
+    parser.add_argument(
+        "--raster-report",
+        action="store_true",
+        help="render the pages of the --report PDF to images in parallel instead of vector pages",
+    )
+    parser.add_argument(
+        "--state-folder",
+        default=None,
+        help="update every patient incrementally from the state kept in this folder",
+    )
+    parser.add_argument("--store", default=None, help="SQLite event store to save every patient to")
+    parser.add_argument(
+        "--format",
+        choices=output_writer.TABLE_FORMATS,
+        default=None,
+        help="write the daily counts and phase tables of every patient into one workbook, or Parquet or CSV files",
+    )
+    args = parser.parse_args(argv)
+
+    summary = run_batch(
+        args.exports_folder,
+        args.manifest,
+        args.output_folder,
+        args.workers,
+        None if args.no_cache else args.cache_folder,
+        args.trace,
+        args.profile_stage,
+        args.cohort,
+        args.state_folder,
+        args.store,
+        args.report,
+        args.format,
+        args.raster_report,
+    )
+    failed = summary[summary["status"] == "failed"]
+    print(f"{len(summary) - len(failed)}/{len(summary)} patients processed")
+    for _, row in failed.iterrows():
+        print(f"{row['patient']}: {row['error']}", file=sys.stderr)
+    return 1 if len(failed) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Memory report of the event table and the daily counts of a synthetic cohort held in one process.
+
+Usage:
+    python -m benchmarks.memory_report [--patients N] [--days N] [--max-ideas N]
+
+The compact tables of the pipeline are compared column by column with the same tables widened to the
+representation the pipeline used before: Python dates, int64 counts, float64 codes and ratings and object
+patient ids.
+"""
+import argparse
+import os
+import tempfile
+from typing import List
+
+import pandas as pd
+
+from benchmarks import synthetic
+from logics import cohort, filter_data, loader, memory
+
+
+def widen(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a compact table to the wide representation: object dates and patient ids, 64-bit numbers.
+
+    Args:
+        df (pd.DataFrame): An event table or daily counts, with an optional 'Patient' column.
+
+    Returns:
+        pd.DataFrame: The widened copy.
+    """
+    wide = df.copy()
+    for column in wide:
+        values = wide[column]
+        if column == "Date":
+            wide[column] = values.dt.date
+        elif column == "Patient":
+            wide[column] = values.astype(str).astype(object)
+        elif isinstance(values.dtype, pd.CategoricalDtype) or values.dtype.kind == "f":
+            wide[column] = values.astype("float64")
+        elif values.dtype.kind in "iu":
+            wide[column] = values.astype("int64")
+    return wide
+
+
+def cohort_tables(n_patients: int, n_days: int, max_ideas: int) -> List[pd.DataFrame]:
+    """
+    Parse and count the exports of a synthetic cohort.
+
+    Args:
+        n_patients (int): The number of patients.
+        n_days (int): The number of diary days per patient.
+        max_ideas (int): The maximum number of memories in one response.
+
+    Returns:
+        List[pd.DataFrame]: The event table and the daily counts of all patients, with a leading 'Patient' column.
+    """
+    events, daily = {}, {}
+    with tempfile.TemporaryDirectory() as folder:
+        synthetic.generate_cohort(folder, n_patients, n_days, max_ideas, "csv")
+        for patient in range(1, n_patients + 1):
+            memories_df = loader.load_export(os.path.join(folder, f"{patient}.csv"))
+            events[str(patient)], daily[str(patient)] = filter_data.build_tables(memories_df)
+    return [cohort.build_cohort(events), cohort.build_cohort(daily)]
+
+
+def main(argv: List = None):
+    parser = argparse.ArgumentParser(description="Report the memory held by the compact cohort tables.")
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--max-ideas", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    events, daily = cohort_tables(args.patients, args.days, args.max_ideas)
+    for name, table in [("Events", events), ("Daily counts", daily)]:
+        print(f"{name} ({len(table)} rows)")
+        print(memory.memory_report(widen(table), table).to_string(index=False))
+        print()
+
+
+if __name__ == "__main__":
+    main()
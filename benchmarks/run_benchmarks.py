@@ -0,0 +1,216 @@
+"""
+Benchmark of every pipeline stage on synthetic exports, compared against stored baselines.
+
+Usage:
+    python -m benchmarks.run_benchmarks [--scales small medium large] [--repeats N] [--threshold 1.25]
+                                        [--update-baselines]
+
+Every scale is a number of patients x diary days x maximum memories per response. The stage timings come
+from the pipeline's own trace (logics/trace.py), are summed over the patients of the scale and the median
+over the repeats is kept. The run fails when a stage is slower than its baseline times the threshold.
+
+The timings depend on the host, so they are divided by the time of a fixed calibration workload run on the same
+host before being compared, and the baselines hold these calibration units. Updating the baselines takes the
+median over at least MIN_BASELINE_REPEATS repeats.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import flow_control  # noqa: E402
+from benchmarks import synthetic  # noqa: E402
+from logics import filter_data, loader, trace  # noqa: E402
+
+SCALES = {
+    "small": {"patients": 1, "days": 60, "max_ideas": 5, "format": "xlsx"},
+    "medium": {"patients": 5, "days": 180, "max_ideas": 20, "format": "xlsx"},
+    "large": {"patients": 20, "days": 365, "max_ideas": 50, "format": "csv"},
+}
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+THRESHOLD = 1.25
+# Stages faster than this are too noisy to compare
+MIN_SECONDS = 0.01
+MIN_BASELINE_REPEATS = 3
+CALIBRATION_REPEATS = 5
+CALIBRATION_ROWS = 500_000
+
+
+def calibration_workload():
+    """A fixed mix of the NumPy and pandas work of the pipeline: a grouped sum and mean, and a sort."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"day": rng.integers(0, 365, CALIBRATION_ROWS), "count": rng.integers(0, 50, CALIBRATION_ROWS)})
+    df.groupby("day")["count"].agg(["sum", "mean"])
+    np.sort(rng.random(CALIBRATION_ROWS))
+
+
+def calibrate(repeats: int = CALIBRATION_REPEATS) -> float:
+    """
+    Time the calibration workload on this host.
+
+    Args:
+        repeats (int): The number of runs to take the median of.
+
+    Returns:
+        float: The median seconds of the calibration workload.
+    """
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        calibration_workload()
+        seconds.append(time.perf_counter() - start)
+    return float(np.median(seconds))
+
+
+def normalize(results: Dict, calibration: float) -> Dict:
+    """
+    Express the stage timings in calibration units.
+
+    Args:
+        results (Dict): The median seconds of every stage of every scale.
+        calibration (float): The seconds of the calibration workload on the same host.
+
+    Returns:
+        Dict: The timings divided by the calibration seconds, in the same layout.
+    """
+    return {
+        scale: {stage: round(seconds / calibration, 4) for stage, seconds in stages.items()}
+        for scale, stages in results.items()
+    }
+
+
+def run_patient(export_path: str, dates: List, output_folder: str) -> List[dict]:
+    """
+    Run the whole pipeline on one export and record its stages.
+
+    Every output is written again, so every repeat times the writer and plot stages.
+
+    Args:
+        export_path (str): The path of the export.
+        dates (List): The treatment dates of the patient.
+        output_folder (str): The folder of the outputs.
+
+    Returns:
+        List[dict]: The recorded stages.
+    """
+    with trace.recording() as recorded:
+        _, daily = filter_data.build_tables(loader.load_export(export_path))
+        flow_control.run_reports(daily, dates, output_folder, show_graphs=False, parallel=False, reuse=False)
+    return recorded["stages"]
+
+
+def run_scale(scale: dict, repeats: int) -> Dict[str, float]:
+    """
+    Benchmark one scale.
+
+    Args:
+        scale (dict): The patients, days, max_ideas and format of the synthetic cohort.
+        repeats (int): The number of runs to take the median of.
+
+    Returns:
+        Dict[str, float]: The median seconds of every stage, summed over the patients.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        synthetic.generate_cohort(
+            folder, scale["patients"], scale["days"], scale["max_ideas"], scale["format"]
+        )
+        output_folder = os.path.join(folder, "out")
+        os.makedirs(output_folder)
+
+        runs = defaultdict(list)
+        for _ in range(repeats):
+            totals = defaultdict(float)
+            for patient in range(1, scale["patients"] + 1):
+                export_path = os.path.join(folder, f"{patient}.{scale['format']}")
+                for record in run_patient(export_path, synthetic.session_dates(), output_folder):
+                    totals[record["stage"]] += record["wall_seconds"]
+            for stage, seconds in totals.items():
+                runs[stage].append(seconds)
+    return {stage: round(float(np.median(seconds)), 4) for stage, seconds in runs.items()}
+
+
+def compare(results: Dict, baselines: Dict, threshold: float, calibration: float) -> pd.DataFrame:
+    """
+    Compare the results with the baselines.
+
+    Args:
+        results (Dict): The median seconds of every stage of every scale.
+        baselines (Dict): The stored baselines in calibration units, in the same layout.
+        threshold (float): The allowed ratio of a result to its baseline.
+        calibration (float): The seconds of the calibration workload on this host.
+
+    Returns:
+        pd.DataFrame: One row per scale and stage with the seconds, the calibration units, the baseline, the ratio,
+        a regression flag and a flag of the stages without a baseline (new or renamed stages), which cannot be
+        compared.
+    """
+    rows = []
+    for scale, stages in normalize(results, calibration).items():
+        for stage, units in stages.items():
+            seconds = results[scale][stage]
+            baseline = baselines.get(scale, {}).get(stage)
+            ratio = units / baseline if baseline else None
+            regression = ratio is not None and ratio > threshold and seconds > MIN_SECONDS
+            rows.append([scale, stage, seconds, units, baseline, ratio, regression, baseline is None])
+    return pd.DataFrame(
+        rows,
+        columns=["scale", "stage", "seconds", "units", "baseline", "ratio", "regression", "missing baseline"],
+    )
+
+
+def main(argv: List = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the MemoryDiary pipeline stages.")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--update-baselines", action="store_true")
+    args = parser.parse_args(argv)
+    if args.update_baselines and args.repeats < MIN_BASELINE_REPEATS:
+        parser.error(f"--update-baselines needs --repeats {MIN_BASELINE_REPEATS} or more")
+
+    calibration = calibrate()
+    results = {scale: run_scale(SCALES[scale], args.repeats) for scale in args.scales}
+
+    baselines = {}
+    if os.path.isfile(args.baselines):
+        with open(args.baselines) as file:
+            baselines = json.load(file)
+
+    report = compare(results, baselines.get("scales", {}), args.threshold, calibration)
+    print(f"Calibration: {calibration:.4f}s")
+    print(report.to_string(index=False))
+
+    if args.update_baselines:
+        scales = {**baselines.get("scales", {}), **normalize(results, calibration)}
+        baselines = {"calibration_seconds": round(calibration, 4), "repeats": args.repeats, "scales": scales}
+        with open(args.baselines, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        return 0
+
+    regressions = report[report["regression"]]
+    for _, row in regressions.iterrows():
+        print(
+            f"Regression: {row['scale']} / {row['stage']} took {row['seconds']}s, "
+            f"{row['units']} calibration units against a baseline of {row['baseline']}",
+            file=sys.stderr,
+        )
+    missing = report[report["missing baseline"]]
+    for _, row in missing.iterrows():
+        print(f"No baseline: {row['scale']} / {row['stage']}, store one with --update-baselines", file=sys.stderr)
+    return 1 if len(regressions) or len(missing) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
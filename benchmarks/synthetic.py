@@ -0,0 +1,208 @@
+"""
+Generator of synthetic Qualtrics-shaped diary exports for benchmarks.
+
+Usage:
+    python -m benchmarks.synthetic <output_folder> [--patients N] [--days N] [--max-ideas N] [--format xlsx|csv]
+
+Writes one export per patient (named after the patient id) and a manifest.csv of session dates that
+batch.py accepts as is.
+"""
+import argparse
+import os
+from datetime import date, timedelta
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+METADATA_COLUMNS = {
+    "StartDate": "Start Date",
+    "EndDate": "End Date",
+    "Status": "Response Type",
+    "IPAddress": "IP Address",
+    "Progress": "Progress",
+    "Duration (in seconds)": "Duration (in seconds)",
+    "Finished": "Finished",
+    "RecordedDate": "Recorded Date",
+    "ResponseId": "Response ID",
+    "RecipientLastName": "Recipient Last Name",
+    "RecipientFirstName": "Recipient First Name",
+    "RecipientEmail": "Recipient Email",
+    "ExternalReference": "External Data Reference",
+    "LocationLatitude": "Location Latitude",
+    "LocationLongitude": "Location Longitude",
+    "DistributionChannel": "Distribution Channel",
+    "UserLanguage": "User Language",
+    "ID": "Please enter your serial number:",
+}
+IDEA_QUESTIONS = {
+    "When": "When did you experience the intrusive memory?",
+    "Type": "What was the type of the intrusive memory?",
+    "Content": "What was the content of the intrusive memory?",
+    "Distress": "How much distress did you feel?",
+    "Vividness": "How vivid was the memory?",
+}
+IDEA_COLUMNS = 50
+TYPE_PROBABILITIES = [0.05, 0.65, 0.30]
+CONTENT_PROBABILITIES = [0.9, 0.1]
+RESPONSES_PER_DAY = 2
+MEAN_AMOUNT = 1.5
+START_DATE = date(2023, 1, 1)
+FIRST_SESSION_DAY = 14
+SESSIONS = 5
+
+
+def session_dates(start: date = START_DATE) -> List[date]:
+    """
+    Get the weekly treatment session dates of a synthetic patient.
+
+    Args:
+        start (date): The first day of the diary.
+
+    Returns:
+        List[date]: The session dates.
+    """
+    return [start + timedelta(days=FIRST_SESSION_DAY + 7 * i) for i in range(SESSIONS)]
+
+
+def generate_export(
+    n_days: int, max_ideas: int, seed: int = 0, patient_id: int = 1, start: date = START_DATE
+) -> pd.DataFrame:
+    """
+    Generate a synthetic export shaped like the Qualtrics diary export.
+
+    The first row holds the question texts, as in a real export. Every day has RESPONSES_PER_DAY responses,
+    each reporting a Poisson number of memories capped at max_ideas.
+
+    Args:
+        n_days (int): The number of diary days.
+        max_ideas (int): The maximum number of memories in one response.
+        seed (int): The seed of the random generator.
+        patient_id (int): The value of the 'ID' column.
+        start (date): The first day of the diary.
+
+    Returns:
+        pd.DataFrame: The export, with object columns as read from a real file.
+    """
+    rng = np.random.default_rng(seed)
+    n_responses = n_days * RESPONSES_PER_DAY
+    n_columns = max(IDEA_COLUMNS, max_ideas)
+
+    days = np.repeat(np.arange(n_days), RESPONSES_PER_DAY)
+    seconds = np.sort(rng.integers(8 * 3600, 22 * 3600, (n_days, RESPONSES_PER_DAY)), axis=1).ravel()
+    start_dates = pd.Timestamp(start) + pd.to_timedelta(days, "D") + pd.to_timedelta(seconds, "s")
+    durations = rng.integers(20, 300, n_responses)
+    amount = np.minimum(rng.poisson(MEAN_AMOUNT, n_responses), max_ideas)
+
+    df = pd.DataFrame(
+        {
+            "StartDate": start_dates.strftime("%Y-%m-%d %H:%M:%S"),
+            "EndDate": (start_dates + pd.to_timedelta(durations, "s")).strftime("%Y-%m-%d %H:%M:%S"),
+            "Status": 0,
+            "IPAddress": "127.0.0.1",
+            "Progress": 100,
+            "Duration (in seconds)": durations,
+            "Finished": 1,
+            "RecordedDate": (start_dates + pd.to_timedelta(durations, "s")).strftime("%Y-%m-%d %H:%M:%S"),
+            "ResponseId": [f"R_{value:015x}" for value in rng.integers(0, 2**60, n_responses)],
+            "RecipientLastName": np.nan,
+            "RecipientFirstName": np.nan,
+            "RecipientEmail": np.nan,
+            "ExternalReference": np.nan,
+            "LocationLatitude": 32.0803,
+            "LocationLongitude": 34.7805,
+            "DistributionChannel": "anonymous",
+            "UserLanguage": "EN",
+            "ID": patient_id,
+            "Amount": amount,
+        }
+    )
+
+    reported = np.arange(n_columns)[None, :] < amount[:, None]
+    shape = (n_responses, n_columns)
+    fields = {
+        "When": rng.integers(1, 7, shape),
+        "Type": rng.choice([1, 2, 3], shape, p=TYPE_PROBABILITIES),
+        "Content": rng.choice([1, 2], shape, p=CONTENT_PROBABILITIES),
+        "Distress": rng.integers(0, 11, shape),
+        "Vividness": rng.integers(1, 6, shape),
+    }
+    ideas = {
+        f"{i + 1}_{field}": np.where(reported[:, i], values[:, i], np.nan)
+        for i in range(n_columns)
+        for field, values in fields.items()
+    }
+    df = pd.concat([df, pd.DataFrame(ideas)], axis=1)
+
+    questions = dict(METADATA_COLUMNS)
+    questions["Amount"] = "How many intrusive memories did you experience since the last report?"
+    for i in range(1, n_columns + 1):
+        for field, question in IDEA_QUESTIONS.items():
+            questions[f"{i}_{field}"] = f"{i} - {question}"
+    return pd.concat([pd.DataFrame([questions]), df.astype(object)], ignore_index=True)
+
+
+def write_export(df: pd.DataFrame, file_path: str):
+    """
+    Write a synthetic export to an xlsx or csv file, depending on the extension.
+
+    Args:
+        df (pd.DataFrame): The export.
+        file_path (str): The path of the file.
+    """
+    if file_path.endswith(".csv"):
+        df.to_csv(file_path, index=False)
+    else:
+        df.to_excel(file_path, index=False)
+
+
+def generate_cohort(
+    output_folder: str,
+    n_patients: int,
+    n_days: int,
+    max_ideas: int,
+    file_format: str = "xlsx",
+    seed: int = 0,
+) -> str:
+    """
+    Write the exports of a synthetic cohort and its manifest of session dates.
+
+    Args:
+        output_folder (str): The folder of the exports.
+        n_patients (int): The number of patients.
+        n_days (int): The number of diary days per patient.
+        max_ideas (int): The maximum number of memories in one response.
+        file_format (str): 'xlsx' or 'csv'.
+        seed (int): The seed of the first patient, incremented for every patient.
+
+    Returns:
+        str: The path of the manifest.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    rows = []
+    for patient in range(1, n_patients + 1):
+        df = generate_export(n_days, max_ideas, seed + patient, patient)
+        write_export(df, os.path.join(output_folder, f"{patient}.{file_format}"))
+        rows.append([patient] + [d.isoformat() for d in session_dates()])
+
+    manifest_path = os.path.join(output_folder, "manifest.csv")
+    columns = ["patient"] + [f"session_{i}" for i in range(1, SESSIONS + 1)]
+    pd.DataFrame(rows, columns=columns).to_csv(manifest_path, index=False)
+    return manifest_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Qualtrics diary exports.")
+    parser.add_argument("output_folder")
+    parser.add_argument("--patients", type=int, default=1)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--max-ideas", type=int, default=5)
+    parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_cohort(args.output_folder, args.patients, args.days, args.max_ideas, args.format, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,18 @@
 class DateBeforeDataDates(Exception):
     pass
+
+
+class MissingColumns(Exception):
+    pass
+
+
+class DatesNotInOrder(Exception):
+    pass
+
+
+class AnalysisCancelled(Exception):
+    pass
+
+
+class InvalidExport(Exception):
+    pass
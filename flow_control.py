@@ -1,27 +1,292 @@
-from typing import List
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import Callable, List
 
 import pandas as pd
 
-from logics import excel_outputs, filter_data, validators, visualizations
+from errors import AnalysisCancelled
+from logics import artifacts, excel_outputs, filter_data, output_writer, phases, trace, utils, validators
 
-memories_df: pd.DataFrame = None
+daily_df: pd.DataFrame = None
 COUNT_OF_INTEREST = ["Count_Target", "Count_Nontarget", "Count_Total"]
+STAGES = [
+    "Validating dates",
+    "Aggregating phases",
+    "Writing graphs and summaries",
+]
+# How often the cancel event is checked while the outputs are written
+CANCEL_POLL_SECONDS = 0.1
 
 
-def run_statistics_flow(treatment_dates: List, folder_path: str):
+def run_statistics_flow(
+    treatment_dates: List,
+    folder_path: str,
+    show_graphs: bool = True,
+    progress: Callable[[int, str], None] = None,
+    cancel: threading.Event = None,
+):
     """
-    Run the statistics flow.
+    Run the statistics flow on the daily counts of the loaded file.
 
     Args:
         treatment_dates (List): A list of treatment dates in datetime.Date format.
         folder_path (str): The path where the generated output files will be saved.
+        show_graphs (bool): Whether to display the graphs in a window.
+        progress (Callable[[int, str], None]): Called with the index and the name of every stage before it runs,
+            and with len(STAGES) once the flow is done.
+        cancel (threading.Event): Set to stop the flow while the outputs are written.
 
     Returns:
-        None
+        matplotlib.figure.Figure: The figure of the graphs.
     """
-    df = filter_data.run_filter_flow(memories_df)
+    # The window displays the figure, so the graphs are drawn even when their file is up to date
+    return run_reports(
+        daily_df, treatment_dates, folder_path, show_graphs, progress, reuse=False, counts=True, cancel=cancel
+    )
 
-    validators.validate_range(treatment_dates, df["Date"].min())
-    visualizations.plot_all_graphs(df, treatment_dates, COUNT_OF_INTEREST, folder_path)
-    excel_outputs.weekly_count_zeros(df, treatment_dates, folder_path)
-    excel_outputs.weekly_sums(df, treatment_dates, folder_path)
+
+def run_patient_flow(
+    patient_df: pd.DataFrame,
+    treatment_dates: List,
+    folder_path: str,
+    counts_path: str = None,
+    show_graphs: bool = True,
+    parallel: bool = True,
+) -> pd.DataFrame:
+    """
+    Run the statistics flow on one patient's data, without relying on module-global state.
+
+    Args:
+        patient_df (pd.DataFrame): The loaded patient export.
+        treatment_dates (List): A list of treatment dates in datetime.Date format.
+        folder_path (str): The path where the generated output files will be saved.
+        counts_path (str): The path of the daily counts Excel file, None to skip writing it.
+        show_graphs (bool): Whether to display the graphs in a window.
+        parallel (bool): Whether to write the outputs concurrently in worker processes.
+
+    Returns:
+        pd.DataFrame: The daily counts of the patient.
+    """
+    df = filter_data.run_filter_flow(patient_df, counts_path)
+    run_reports(df, treatment_dates, folder_path, show_graphs, parallel=parallel)
+    return df
+
+
+def run_reports(
+    df: pd.DataFrame,
+    treatment_dates: List,
+    folder_path: str,
+    show_graphs: bool = True,
+    progress: Callable[[int, str], None] = None,
+    parallel: bool = True,
+    phase_df: pd.DataFrame = None,
+    graphs: bool = True,
+    reuse: bool = True,
+    output_format: str = None,
+    source: str = None,
+    counts: bool = False,
+    cancel: threading.Event = None,
+):
+    """
+    Validate the treatment dates and write the graphs and the Excel summaries of the daily counts.
+
+    The phase aggregates are computed once (unless given) and shared by all the outputs.
+
+    Args:
+        df (pd.DataFrame): The daily counts, as returned by filter_data.run_filter_flow.
+        treatment_dates (List): A list of treatment dates in datetime.Date format.
+        folder_path (str): The path where the generated output files will be saved.
+        show_graphs (bool): Whether to display the graphs in a window.
+        progress (Callable[[int, str], None]): Called with the index and the name of every stage before it runs,
+            and with len(STAGES) and 'Done' once the outputs are written. It may raise to stop the flow between two
+            stages.
+        parallel (bool): Whether to write the outputs concurrently in worker processes.
+        phase_df (pd.DataFrame): The phase aggregates of df, when they are already up to date.
+        graphs (bool): Whether to write the graphs PDF, the graphs of many patients being rather written into one
+            report by logics.report.
+        reuse (bool): Whether to skip the outputs already written for the same daily counts, dates and pipeline
+            version.
+        output_format (str): None for the two Excel summaries, or one of output_writer.TABLE_FORMATS for the
+            daily counts and the phase tables in a single workbook ('xlsx') or in a Parquet or CSV file each.
+        source (str): The identity of the inputs (e.g. the patient id), so the outputs of its earlier inputs are
+            removed from the folder. None, when the folder is shared by several patients, keeps them.
+        counts (bool): Whether to also write the daily counts workbook to the folder, the single workbook of
+            output_format holding them anyway.
+        cancel (threading.Event): Set to stop the flow while the outputs are written (see write_outputs).
+
+    Raises:
+        AnalysisCancelled: If cancel was set before the outputs were written.
+
+    Returns:
+        matplotlib.figure.Figure: The figure of the graphs, None if they were not drawn.
+    """
+    notify = progress or (lambda index, stage: None)
+
+    notify(0, STAGES[0])
+    with trace.stage("validation", len(df)):
+        validators.validate_range(treatment_dates, df["Date"].min())
+    notify(1, STAGES[1])
+    if phase_df is None:
+        with trace.stage("phase aggregation", len(df)):
+            phase_df = phases.aggregate_outcomes(df, treatment_dates, COUNT_OF_INTEREST)
+    notify(2, STAGES[2])
+    fig = write_outputs(
+        df,
+        treatment_dates,
+        phase_df,
+        folder_path,
+        show_graphs,
+        parallel,
+        graphs,
+        reuse,
+        output_format,
+        source,
+        counts,
+        cancel,
+    )
+    notify(len(STAGES), "Done")
+    return fig
+
+
+def check_cancel(cancel: threading.Event):
+    """Raise AnalysisCancelled if the cancel event is set."""
+    if cancel is not None and cancel.is_set():
+        raise AnalysisCancelled
+
+
+def collect(futures: List[Future], cancel: threading.Event = None) -> list:
+    """
+    Wait for the results of the writers running on a pool, checking the cancel event meanwhile.
+
+    Args:
+        futures (List[Future]): The futures of the writers.
+        cancel (threading.Event): Set to stop waiting.
+
+    Raises:
+        AnalysisCancelled: If cancel was set before all the writers were done.
+
+    Returns:
+        list: The results of the writers, in the order of the futures.
+    """
+    pending = set(futures)
+    while pending:
+        check_cancel(cancel)
+        _, pending = wait(pending, timeout=CANCEL_POLL_SECONDS)
+    return [future.result() for future in futures]
+
+
+def write_outputs(
+    df: pd.DataFrame,
+    treatment_dates: List,
+    phase_df: pd.DataFrame,
+    folder_path: str,
+    show_graphs: bool = True,
+    parallel: bool = True,
+    graphs: bool = True,
+    reuse: bool = True,
+    output_format: str = None,
+    source: str = None,
+    counts: bool = False,
+    cancel: threading.Event = None,
+):
+    """
+    Write the graphs PDF and both Excel summaries (or the tables of output_format), concurrently when parallel
+    is set.
+
+    Every output runs in its own worker process; the graphs are rendered there with the Agg backend and the
+    figure is sent back. Displaying the graphs needs the interactive backend, so they are then plotted here.
+
+    The file names hold a key derived from the daily counts, the treatment dates and the pipeline version (see
+    logics.artifacts). With reuse, an output whose file already exists is not written again, unless it is the
+    graphs to display. The outputs are then recorded in the manifest of the folder and, with a source, the files
+    recorded for its earlier inputs are removed.
+
+    Args:
+        df (pd.DataFrame): The daily counts.
+        treatment_dates (List): A list of treatment dates in datetime.Date format.
+        phase_df (pd.DataFrame): The phase aggregates of df.
+        folder_path (str): The path where the generated output files will be saved.
+        show_graphs (bool): Whether to display the graphs in a window.
+        parallel (bool): Whether to write the outputs concurrently in worker processes.
+        graphs (bool): Whether to write the graphs PDF.
+        reuse (bool): Whether to skip the outputs already written for the same inputs.
+        output_format (str): None for the two Excel summaries, or one of output_writer.TABLE_FORMATS for the
+            daily counts and the phase tables in a single workbook or in a file each.
+        source (str): The identity of the inputs, None to keep the outputs of every earlier run.
+        counts (bool): Whether to also write the daily counts workbook, unless output_format is set.
+        cancel (threading.Event): Set to stop the writers: the pool is then shut down without waiting for the
+            running writers and the writers not started yet are cancelled. Nothing is recorded in the manifest.
+
+    Raises:
+        AnalysisCancelled: If cancel was set before all the outputs were written.
+
+    Returns:
+        matplotlib.figure.Figure: The figure of the graphs, None if they were not drawn.
+    """
+    dates = artifacts.iso_dates(treatment_dates)
+    key = artifacts.output_key(df, dates, COUNT_OF_INTEREST)
+
+    def missing(artifact) -> bool:
+        return not (reuse and artifacts.is_up_to_date(folder_path, artifact, key))
+
+    if output_format:
+        tables = excel_outputs.summary_tables(df, treatment_dates, phase_df)
+        summaries = [
+            (
+                output_writer.table_artifacts(tables, output_format),
+                output_writer.write_tables,
+                (tables, folder_path, key, output_format),
+            )
+        ]
+    else:
+        summary_args = (df, treatment_dates, folder_path, phase_df, key)
+        summaries = [
+            ([artifacts.ZEROS_SUMMARY], excel_outputs.weekly_count_zeros, summary_args),
+            ([artifacts.WEEKLY_SUMMARY], excel_outputs.weekly_sums, summary_args),
+        ]
+        if counts:
+            summaries.append(([artifacts.DAILY_COUNTS], excel_outputs.daily_counts_workbook, summary_args))
+    writers = [(writer, args) for outputs, writer, args in summaries if any(map(missing, outputs))]
+    draw = graphs and (show_graphs or missing(artifacts.GRAPHS))
+    if draw:
+        # matplotlib is only imported when the graphs are drawn
+        from logics import visualizations
+
+        plot_args = (df, treatment_dates, COUNT_OF_INTEREST, folder_path, show_graphs, phase_df, key)
+        if parallel and not show_graphs:
+            writers.insert(0, (visualizations.plot_all_graphs, plot_args))
+
+    fig = None
+    if parallel and writers:
+        trace_settings = trace.settings()
+        executor = ProcessPoolExecutor(len(writers), initializer=utils.use_agg_backend)
+        try:
+            futures = [
+                executor.submit(trace.call_in_stage, trace_settings, writer.__name__, writer, *args)
+                for writer, args in writers
+            ]
+            if draw and show_graphs:
+                with trace.stage("plot_all_graphs", len(df)):
+                    fig = visualizations.plot_all_graphs(*plot_args)
+            results = collect(futures, cancel)
+        finally:
+            # All the writers are done unless the flow was cancelled or failed, so this does not wait for them
+            executor.shutdown(wait=False, cancel_futures=True)
+        for _, stages in results:
+            trace.extend(stages)
+        if draw and not show_graphs:
+            fig = results[0][0]
+    else:
+        for writer, args in writers:
+            check_cancel(cancel)
+            with trace.stage(writer.__name__, len(phase_df)):
+                writer(*args)
+        if draw:
+            check_cancel(cancel)
+            with trace.stage("plot_all_graphs", len(df)):
+                fig = visualizations.plot_all_graphs(*plot_args)
+    check_cancel(cancel)
+
+    written = [artifact for outputs, _, _ in summaries for artifact in outputs] + ([artifacts.GRAPHS] if graphs else [])
+    artifacts.record_artifacts(folder_path, key, written, {"dates": dates}, source)
+    return fig
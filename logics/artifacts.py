@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from importlib import metadata
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from logics.utils import get_unique
+
+MANIFEST_FILE = "outputs_manifest.json"
+# Length of the hex key in the file names, the length of the random names written before
+KEY_LENGTH = 12
+# The modules that shape the outputs from the daily counts, and the libraries that render them
+PIPELINE_FILES = [
+    "filter_data.py",
+    "daily_index.py",
+    "phases.py",
+    "excel_outputs.py",
+    "visualizations.py",
+    "cohort.py",
+    "statistics.py",
+    "report.py",
+    "output_writer.py",
+    "trends.py",
+    "artifacts.py",
+]
+PIPELINE_LIBRARIES = ["pandas", "numpy", "matplotlib", "openpyxl"]
+
+# (prefix, extension) of every artifact
+WEEKLY_SUMMARY = ("Weekly_Diary_Summary", ".xlsx")
+ZEROS_SUMMARY = ("Weekly_Summary_zeros", ".xlsx")
+GRAPHS = ("visualizations", ".pdf")
+DAILY_COUNTS = ("memories_count", ".xlsx")
+DIARY_SUMMARY = ("Diary_Summary", ".xlsx")
+COHORT_SUMMARY = ("Cohort_Summary", ".xlsx")
+COHORT_GRAPHS = ("cohort", ".pdf")
+GRAPHS_REPORT = ("Graphs_Report", ".pdf")
+
+
+def pipeline_version() -> str:
+    """
+    Hash the source of the modules that produce the outputs and the versions of the libraries rendering them.
+
+    Returns:
+        str: A hex digest that changes whenever the outputs of the same daily counts may change.
+    """
+    digest = hashlib.sha256()
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for name in PIPELINE_FILES:
+        with open(os.path.join(folder, name), "rb") as file:
+            digest.update(file.read())
+    for library in PIPELINE_LIBRARIES:
+        digest.update(f"{library}={metadata.version(library)}".encode())
+    return digest.hexdigest()
+
+
+def iso_dates(dates: List) -> List[str]:
+    """Format treatment dates (datetime.date, strings or timestamps) as 'YYYY-MM-DD' strings."""
+    return [pd.Timestamp(d).date().isoformat() for d in dates]
+
+
+def output_key(*inputs) -> str:
+    """
+    Derive the key of a set of outputs from their inputs and the pipeline version.
+
+    Parameters:
+        *inputs: DataFrames, hashed by content, column names and dtypes, and JSON serializable values.
+
+    Returns:
+        str: The KEY_LENGTH first hex digits of the digest.
+    """
+    digest = hashlib.sha256(pipeline_version().encode())
+    for value in inputs:
+        if isinstance(value, pd.DataFrame):
+            digest.update(json.dumps([[str(c), str(t)] for c, t in value.dtypes.items()]).encode())
+            digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+        else:
+            digest.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:KEY_LENGTH]
+
+
+def artifact_path(folder: str, artifact: Tuple[str, str], key: str = None) -> str:
+    """
+    Get the path of an artifact.
+
+    Parameters:
+        folder (str): The output folder.
+        artifact (Tuple[str, str]): The prefix and extension of the artifact, e.g. WEEKLY_SUMMARY.
+        key (str): The key of the outputs, a random one when not given.
+
+    Returns:
+        str: The path '<folder>/<prefix>-<key><extension>'.
+    """
+    prefix, extension = artifact
+    return os.path.join(folder, f"{prefix}-{key or get_unique()}{extension}")
+
+
+def is_up_to_date(folder: str, artifact: Tuple[str, str], key: str) -> bool:
+    """Whether the file of an artifact was already written for the key."""
+    return os.path.isfile(artifact_path(folder, artifact, key))
+
+
+def read_manifest(folder: str) -> Dict[str, dict]:
+    """
+    Read the manifest of an output folder.
+
+    Parameters:
+        folder (str): The output folder.
+
+    Returns:
+        Dict[str, dict]: The entry of every recorded file by file name, empty without a manifest. The entries of
+        manifests written by artifact name are re-keyed by file name, without a source.
+    """
+    manifest_path = os.path.join(folder, MANIFEST_FILE)
+    if not os.path.isfile(manifest_path):
+        return {}
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    return {
+        entry.get("file", name): {"artifact": name, **entry} if "file" in entry else entry
+        for name, entry in manifest.items()
+    }
+
+
+def stale_artifacts(manifest: Dict[str, dict], artifact: Tuple[str, str], key: str, source: str) -> List[str]:
+    """
+    Find the files of an artifact recorded for earlier inputs of the same source.
+
+    Only recorded files are stale: the files of other sources (e.g. other patients sharing the folder), of runs
+    without a source and the files not in the manifest are never stale.
+
+    Parameters:
+        manifest (Dict[str, dict]): The manifest of the folder, as returned by read_manifest.
+        artifact (Tuple[str, str]): The prefix and extension of the artifact.
+        key (str): The key of the current outputs.
+        source (str): The identity of the inputs (e.g. the patient id), None to find no stale file.
+
+    Returns:
+        List[str]: The names of the stale files of the artifact.
+    """
+    if source is None:
+        return []
+    return [
+        name
+        for name, entry in manifest.items()
+        if entry.get("source") == source and entry.get("artifact") == artifact[0] and entry.get("key") != key
+    ]
+
+
+def record_artifacts(
+    folder: str, key: str, artifacts: List[Tuple[str, str]], inputs: Dict = None, source: str = None
+):
+    """
+    Record the current files of the artifacts in the manifest of the folder and remove their stale files.
+
+    The manifest is replaced atomically, so an interrupted run leaves the previous one in place.
+
+    Parameters:
+        folder (str): The output folder.
+        key (str): The key of the current outputs.
+        artifacts (List[Tuple[str, str]]): The artifacts written or found up to date.
+        inputs (Dict): A description of the inputs (e.g. the treatment dates), stored with every artifact.
+        source (str): The identity of the inputs (e.g. the patient id). The files recorded for earlier inputs of
+            the same source are removed; None keeps every file of the folder.
+    """
+    manifest = read_manifest(folder)
+    version = pipeline_version()
+    now = datetime.now().isoformat(timespec="seconds")
+    for artifact in artifacts:
+        for name in stale_artifacts(manifest, artifact, key, source):
+            if os.path.isfile(os.path.join(folder, name)):
+                os.remove(os.path.join(folder, name))
+            del manifest[name]
+        name = os.path.basename(artifact_path(folder, artifact, key))
+        previous = manifest.get(name, {})
+        manifest[name] = {
+            "artifact": artifact[0],
+            "source": source,
+            "key": key,
+            "pipeline_version": version,
+            "inputs": inputs or {},
+            # An artifact found up to date keeps the time it was written
+            "written": previous.get("written", now),
+        }
+
+    manifest_path = os.path.join(folder, MANIFEST_FILE)
+    partial = f"{manifest_path}.{os.getpid()}.partial"
+    with open(partial, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(partial, manifest_path)
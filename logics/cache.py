@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Tuple
+
+import pandas as pd
+
+from logics import filter_data, loader, trace, validators
+
+CACHE_FOLDER = os.environ.get(
+    "MEMORYDIARY_CACHE", os.path.join(os.path.expanduser("~"), ".memorydiary", "cache")
+)
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+EVENTS_FILE = "events.parquet"
+DAILY_FILE = "daily.parquet"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def code_version() -> str:
+    """
+    Hash the source of the modules that produce the cached tables.
+
+    Returns:
+        str: A hex digest that changes whenever the loading, validation (run on every loaded chunk) or filtering
+        code changes.
+    """
+    digest = hashlib.sha256()
+    for module in [loader, validators, filter_data]:
+        with open(module.__file__, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def file_digest(file_path: str) -> str:
+    """
+    Hash the content of a file in blocks.
+
+    Parameters:
+        file_path (str): The path of the file.
+
+    Returns:
+        str: The hex digest of the content.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(file_path: str, include_details: bool = True) -> str:
+    """
+    Compute the cache key of an export from its content, the code version and the filter settings.
+
+    Parameters:
+        file_path (str): The path of the export.
+        include_details (bool): The loader setting the tables are built with.
+
+    Returns:
+        str: The hex digest used as the name of the cache entry.
+    """
+    digest = hashlib.sha256(file_digest(file_path).encode())
+    settings = {"include_details": include_details, "excluded_type": filter_data.EXCLUDED_TYPE}
+    digest.update(code_version().encode())
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def folder_size(folder: str) -> int:
+    """
+    Sum the size of the files of a folder.
+
+    Parameters:
+        folder (str): The folder path.
+
+    Returns:
+        int: The size in bytes.
+    """
+    return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+
+
+def evict(cache_folder: str, max_bytes: int):
+    """
+    Delete the least recently used cache entries until the cache fits in max_bytes.
+
+    Parameters:
+        cache_folder (str): The cache folder.
+        max_bytes (int): The maximum total size of the cache.
+    """
+    entries = [
+        entry
+        for entry in os.scandir(cache_folder)
+        if entry.is_dir() and not entry.name.endswith(".partial")
+    ]
+    entries.sort(key=lambda entry: entry.stat().st_mtime)
+    sizes = [folder_size(entry.path) for entry in entries]
+    total = sum(sizes)
+    for entry, size in zip(entries, sizes):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry.path, ignore_errors=True)
+        total -= size
+
+
+def load_filtered(
+    file_path: str,
+    cache_folder: str = CACHE_FOLDER,
+    max_bytes: int = MAX_CACHE_BYTES,
+    include_details: bool = True,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Load the memory event table and the daily counts of an export, from the cache when possible.
+
+    On a miss the export is parsed and filtered, and both tables are stored in Parquet under a key derived
+    from the file content, the code version and the filter settings. Hits refresh the entry so eviction
+    removes the least recently used entries first.
+
+    Parameters:
+        file_path (str): The path of the export.
+        cache_folder (str): The cache folder.
+        max_bytes (int): The maximum total size of the cache.
+        include_details (bool): Whether to load the '_When', '_Distress' and '_Vividness' columns.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: The memory event table and the daily counts.
+    """
+    entry = os.path.join(cache_folder, cache_key(file_path, include_details))
+    if os.path.isdir(entry):
+        os.utime(entry)
+        with trace.stage("cache read") as record:
+            events = filter_data.restore_event_dtypes(pd.read_parquet(os.path.join(entry, EVENTS_FILE)))
+            daily = pd.read_parquet(os.path.join(entry, DAILY_FILE))
+            record["rows"] = len(events)
+        return events, daily
+
+    events, daily = filter_data.build_tables(loader.load_export(file_path, include_details))
+
+    partial = f"{entry}.{os.getpid()}.partial"
+    os.makedirs(partial, exist_ok=True)
+    events.to_parquet(os.path.join(partial, EVENTS_FILE), index=False)
+    daily.to_parquet(os.path.join(partial, DAILY_FILE), index=False)
+    try:
+        os.rename(partial, entry)
+    except OSError:
+        # Another process stored the same entry first
+        shutil.rmtree(partial, ignore_errors=True)
+    evict(cache_folder, max_bytes)
+    return events, daily
@@ -0,0 +1,207 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from logics.phases import COUNT_COLUMNS, PAD_DAYS, phase_edges, phase_labels, to_days
+from logics.artifacts import COHORT_GRAPHS, COHORT_SUMMARY, artifact_path
+from logics.output_writer import write_workbook
+
+
+def build_cohort(daily_frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Stack the daily frames of many patients into one frame tagged with the patient id.
+
+    Parameters:
+        daily_frames (Dict[str, pd.DataFrame]): The daily counts of every patient, by patient id.
+
+    Returns:
+        pd.DataFrame: The daily counts of all patients with a leading categorical 'Patient' column.
+    """
+    cohort_df = pd.concat(daily_frames, names=["Patient", None]).reset_index(0).reset_index(drop=True)
+    cohort_df["Patient"] = pd.Categorical(cohort_df["Patient"], categories=list(daily_frames))
+    return cohort_df
+
+
+def cohort_edges(sessions: Dict[str, List], pad_days: int = PAD_DAYS) -> Tuple[List, np.ndarray]:
+    """
+    Build the phase boundaries of every patient.
+
+    Parameters:
+        sessions (Dict[str, List]): The treatment dates of every patient, in ascending order.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+
+    Raises:
+        ValueError: If the patients do not have the same number of sessions, so their phases cannot be aligned.
+
+    Returns:
+        Tuple[List, np.ndarray]: The patient ids and a (patients x phases + 1) datetime64[D] array of edges.
+    """
+    if len({len(dates) for dates in sessions.values()}) > 1:
+        raise ValueError("All patients must have the same number of treatment sessions")
+    patients = list(sessions)
+    return patients, np.stack([phase_edges(sessions[patient], pad_days) for patient in patients])
+
+
+def cohort_phases(
+    cohort_df: pd.DataFrame,
+    sessions: Dict[str, List],
+    count_columns: List = None,
+    pad_days: int = PAD_DAYS,
+) -> pd.DataFrame:
+    """
+    Aggregate the daily counts of every patient into that patient's treatment phases in one groupby.
+
+    Parameters:
+        cohort_df (pd.DataFrame): The daily counts of all patients, as returned by build_cohort.
+        sessions (Dict[str, List]): The treatment dates of every patient, in ascending order.
+        count_columns (List): The count columns to aggregate. Defaults to COUNT_COLUMNS.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+
+    Returns:
+        pd.DataFrame: One row per patient and phase with the columns of phases.aggregate_phases and 'Patient'.
+    """
+    count_columns = count_columns or COUNT_COLUMNS
+    patients, edges = cohort_edges(sessions, pad_days)
+    n_phases = edges.shape[1] - 1
+
+    patient = pd.Categorical(cohort_df["Patient"], categories=patients).codes
+    known = patient >= 0
+    days = to_days(cohort_df["Date"])[known]
+    patient = patient[known]
+    row_edges = edges[patient]
+    phase = (days[:, None] >= row_edges).sum(axis=1) - 1
+    inside = (phase >= 0) & (phase < n_phases)
+
+    frame = cohort_df.loc[known, count_columns].astype(float)[inside]
+    zero_columns = [f"Zeros_{column}" for column in count_columns]
+    frame[zero_columns] = (frame[count_columns] == 0).to_numpy().astype(int)
+    frame["Days Reported"] = 1
+    frame["Patient"] = patient[inside]
+    frame["Phase"] = phase[inside]
+
+    full_index = pd.MultiIndex.from_product([range(len(patients)), range(n_phases)], names=["Patient", "Phase"])
+    grouped = frame.groupby(["Patient", "Phase"]).sum().reindex(full_index, fill_value=0)
+
+    gaps = np.diff(edges, axis=1).astype(int).ravel()
+    result = pd.DataFrame(
+        {
+            "Patient": np.repeat(patients, n_phases),
+            "Phase": np.tile(phase_labels(n_phases - 1), len(patients)),
+            "Start Date": pd.to_datetime(edges[:, :-1].ravel()),
+            "End Date": pd.to_datetime(edges[:, 1:].ravel()),
+            "Gap Between Sessions": gaps,
+            "Days Reported": grouped["Days Reported"].to_numpy(),
+        }
+    )
+    reported = result["Days Reported"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for column in count_columns:
+            sums = grouped[column].to_numpy()
+            result[f"Sum_{column}"] = sums
+            result[f"Average_{column}"] = sums / gaps
+            result[f"Zeros_{column}"] = grouped[f"Zeros_{column}"].to_numpy()
+            result[f"Mean_{column}"] = np.where(reported > 0, sums / reported, np.nan)
+    return result
+
+
+def summarize_phases(patient_phases: pd.DataFrame, count_columns: List = None) -> pd.DataFrame:
+    """
+    Compute the phase-aligned statistics across patients.
+
+    Parameters:
+        patient_phases (pd.DataFrame): The per patient phase aggregates, as returned by cohort_phases.
+        count_columns (List): The count columns to summarize. Defaults to COUNT_COLUMNS.
+
+    Returns:
+        pd.DataFrame: One row per phase with the number of patients reporting in the phase and, for every count
+        column, the mean, median and SD across those patients of the average per day, and their mean zero day
+        rate (zero days per day of the phase).
+    """
+    count_columns = count_columns or COUNT_COLUMNS
+    reporting = patient_phases["Days Reported"] > 0
+    frame = patient_phases[["Phase"]].copy()
+    frame["Reporting"] = reporting
+    aggregations = {"Patients Reporting": ("Reporting", "sum")}
+    for column in count_columns:
+        frame[column] = patient_phases[f"Average_{column}"].where(reporting)
+        frame[f"Zero Day Rate_{column}"] = (
+            patient_phases[f"Zeros_{column}"] / patient_phases["Gap Between Sessions"]
+        ).where(reporting)
+        aggregations[f"Mean_{column}"] = (column, "mean")
+        aggregations[f"Median_{column}"] = (column, "median")
+        aggregations[f"SD_{column}"] = (column, "std")
+        aggregations[f"Zero Day Rate_{column}"] = (f"Zero Day Rate_{column}", "mean")
+    return frame.groupby("Phase", sort=False).agg(**aggregations).reset_index()
+
+
+def plot_cohort(summary: pd.DataFrame, count_columns: List = None):
+    """
+    Plot the cohort averages per phase (mean and SD across patients) and the zero day rates.
+
+    Parameters:
+        summary (pd.DataFrame): The cohort statistics, as returned by summarize_phases.
+        count_columns (List): The count columns to plot. Defaults to COUNT_COLUMNS.
+
+    Returns:
+        plt.Figure: The figure.
+    """
+    import matplotlib.pyplot as plt
+
+    count_columns = count_columns or COUNT_COLUMNS
+    fig, axes = plt.subplots(2, len(count_columns), figsize=(5 * len(count_columns), 10))
+    positions = np.arange(len(summary))
+    for j, column in enumerate(count_columns):
+        # A phase reported by a single patient has no SD
+        errors = summary[f"SD_{column}"].fillna(0)
+        axes[0, j].bar(positions, summary[f"Mean_{column}"], yerr=errors, capsize=4)
+        axes[0, j].set_title(f"Cohort Average Per Day {column}")
+        axes[0, j].set_ylabel(f"Average {column}")
+        axes[1, j].bar(positions, summary[f"Zero Day Rate_{column}"], color="gray")
+        axes[1, j].set_title(f"Cohort Zero Day Rate {column}")
+        axes[1, j].set_ylim(0, 1)
+        for ax in axes[:, j]:
+            ax.set_xticks(positions, summary["Phase"], rotation=45)
+    fig.tight_layout()
+    return fig
+
+
+def write_cohort_outputs(
+    patient_phases: pd.DataFrame,
+    summary: pd.DataFrame,
+    target_folder: str,
+    effects: pd.DataFrame = None,
+    patient_effects: pd.DataFrame = None,
+    key: str = None,
+    trends: pd.DataFrame = None,
+) -> None:
+    """
+    Save the cohort workbook (per phase statistics and per patient phases) and the cohort figure.
+
+    Parameters:
+        patient_phases (pd.DataFrame): The per patient phase aggregates, as returned by cohort_phases.
+        summary (pd.DataFrame): The cohort statistics, as returned by summarize_phases.
+        target_folder (str): The path to the target folder where the results will be saved.
+        effects (pd.DataFrame): The cohort changes from the baseline, as returned by statistics.cohort_effects.
+        patient_effects (pd.DataFrame): The changes from the baseline of every patient, as returned by
+            statistics.cohort_patient_effects.
+        key (str): The key in the file names (see logics.artifacts), a random one when not given.
+        trends (pd.DataFrame): The trend of every count of every patient, as returned by trends.cohort_trends.
+
+    Returns:
+        None
+    """
+    sheets = {"Cohort": summary, "Patients": patient_phases}
+    if effects is not None:
+        sheets["Effects"] = effects
+    if patient_effects is not None:
+        sheets["Patient Effects"] = patient_effects
+    if trends is not None:
+        sheets["Trends"] = trends
+    write_workbook(sheets, artifact_path(target_folder, COHORT_SUMMARY, key))
+
+    import matplotlib.pyplot as plt
+
+    fig = plot_cohort(summary)
+    fig.savefig(artifact_path(target_folder, COHORT_GRAPHS, key))
+    plt.close(fig)
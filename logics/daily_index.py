@@ -0,0 +1,123 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from logics.filter_data import COUNT_COLUMNS
+
+
+def to_days(dates) -> np.ndarray:
+    """
+    Convert a column of dates (datetime.date, strings or timestamps) to a datetime64[D] array.
+
+    Parameters:
+        dates: Any array-like of dates accepted by pd.to_datetime.
+
+    Returns:
+        np.ndarray: The dates as a datetime64[D] array.
+    """
+    if isinstance(dates, np.ndarray) and np.issubdtype(dates.dtype, np.datetime64):
+        # Window edges are already datetime64, so the queries skip the parsing
+        return dates.astype("datetime64[D]")
+    return pd.to_datetime(pd.Series(dates)).to_numpy().astype("datetime64[D]")
+
+
+class DailyIndex:
+    """
+    Dense calendar of the daily counts with prefix sums, so any date window query is O(1).
+
+    Day i of the calendar is start + i days. Days without a response are marked as missed: they count as calendar
+    days but neither as reported days nor as zero days. Every query takes a single date or arrays of window
+    starts and ends, windows being half-open [start, end) like the treatment phases.
+
+    Args:
+        df (pd.DataFrame): The daily DataFrame with a 'Date' column and the count columns.
+        columns (List): The count columns to index. Defaults to COUNT_COLUMNS.
+        start: The first day of the calendar, defaults to the first reported day. Required if df is empty.
+        end: The day after the last day of the calendar, defaults to the day after the last reported day.
+            Required if df is empty.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: List = None, start=None, end=None):
+        columns = COUNT_COLUMNS if columns is None else columns
+        days = to_days(df["Date"])
+        starts = [days.min()] if len(days) else []
+        ends = [days.max() + np.timedelta64(1, "D")] if len(days) else []
+        if start is not None:
+            starts.append(to_days([start])[0])
+        if end is not None:
+            ends.append(to_days([end])[0])
+        self.start, self.end = min(starts), max(ends)
+        position = (days - self.start).astype(int)
+
+        self.reported = np.zeros(len(self), dtype=bool)
+        self.reported[position] = True
+        self.reported_prefix = np.concatenate([[0], np.cumsum(self.reported)])
+        self.values = {}
+        self.prefix = {}
+        self.zero_prefix = {}
+        for column in columns:
+            values = np.zeros(len(self))
+            values[position] = df[column].to_numpy(dtype=float)
+            self.values[column] = values
+            self.prefix[column] = np.concatenate([[0], np.cumsum(values)])
+            self.zero_prefix[column] = np.concatenate([[0], np.cumsum(self.reported & (values == 0))])
+
+    def __len__(self) -> int:
+        return int((self.end - self.start).astype(int))
+
+    def positions(self, dates) -> np.ndarray:
+        """Map dates to calendar positions, clipped to the calendar."""
+        return np.clip((to_days(np.atleast_1d(dates)) - self.start).astype(int), 0, len(self))
+
+    def window(self, prefix: np.ndarray, start, end) -> np.ndarray:
+        """Sum an array over the windows [start, end) from its prefix sums."""
+        return prefix[self.positions(end)] - prefix[self.positions(start)]
+
+    def sum(self, column: str, start, end) -> np.ndarray:
+        """The sum of a count over the windows."""
+        return self.window(self.prefix[column], start, end)
+
+    def days_reported(self, start, end) -> np.ndarray:
+        """The number of days with a response in the windows."""
+        return self.window(self.reported_prefix, start, end)
+
+    def zeros(self, column: str, start, end) -> np.ndarray:
+        """The number of reported days with a zero count in the windows."""
+        return self.window(self.zero_prefix[column], start, end)
+
+    def mean(self, column: str, start, end) -> np.ndarray:
+        """The mean of a count over the reported days of the windows, NaN without reported days."""
+        reported = self.days_reported(start, end)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(reported > 0, self.sum(column, start, end) / reported, np.nan)
+
+    def calendar_days(self, start, end) -> np.ndarray:
+        """The number of calendar days of the windows, including the days outside the calendar."""
+        return (to_days(np.atleast_1d(end)) - to_days(np.atleast_1d(start))).astype(int)
+
+    def compliance(self, start, end) -> np.ndarray:
+        """The share of the calendar days of the windows with a response."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.days_reported(start, end) / self.calendar_days(start, end)
+
+    def longest_missed_run(self, start, end) -> np.ndarray:
+        """The longest run of consecutive calendar days without a response in every window."""
+        runs = []
+        for first, last in zip(self.positions(start), self.positions(end)):
+            missed = np.concatenate([[0], ~self.reported[first:last], [0]]).astype(int)
+            edges = np.flatnonzero(np.diff(missed))
+            runs.append(int((edges[1::2] - edges[::2]).max()) if len(edges) else 0)
+        return np.array(runs, dtype=int)
+
+    def dense(self) -> pd.DataFrame:
+        """
+        Expand the index to one row per calendar day.
+
+        Returns:
+            pd.DataFrame: 'Date' (datetime64), 'Reported' and the indexed counts, NaN on missed days.
+        """
+        df = pd.DataFrame({"Date": pd.to_datetime(self.start + np.arange(len(self))), "Reported": self.reported})
+        for column, values in self.values.items():
+            df[column] = np.where(self.reported, values, np.nan)
+        return df
@@ -1,9 +1,62 @@
 import pandas as pd
 
-from logics.utils import get_unique
+from logics.artifacts import DAILY_COUNTS, WEEKLY_SUMMARY, ZEROS_SUMMARY, artifact_path
+from logics.filter_data import CONTENT_SPLITS, RATING_FIELDS, WHEN_COLUMNS
+from logics.output_writer import write_workbook
+from logics.phases import aggregate_compliance, aggregate_outcomes, aggregate_phases
+from logics.trends import phase_trends
 
+PHASE_COLUMNS = ["Start Date", "End Date", "Gap Between Sessions"]
+DAILY_SHEET = "Daily Counts"
+SUMMARY_SHEET = "Weekly Summary"
+TIME_OF_DAY_SHEET = "Time Of Day"
+ZEROS_SHEET = "Zero Days"
+TRENDS_SHEET = "Trends"
 
-def weekly_sums(df: pd.DataFrame, dates: list, target_folder: str) -> None:
+
+def time_of_day_table(phases: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the time of day sheet: the memories of every phase by '_When' answer code, with a total row.
+
+    Parameters:
+        phases (pd.DataFrame): The phase aggregates with the columns of logics.phases.aggregate_time_of_day.
+
+    Returns:
+        pd.DataFrame: The phase dates, the count and the share of every answer code, and a last 'All' row
+        for the whole diary of the patient.
+    """
+    result_df = phases[["Phase"] + PHASE_COLUMNS[:2] + WHEN_COLUMNS].copy()
+    totals = result_df[WHEN_COLUMNS].sum()
+    result_df.loc[len(result_df), ["Phase"] + WHEN_COLUMNS] = ["All"] + totals.tolist()
+    shares = result_df[WHEN_COLUMNS].div(result_df[WHEN_COLUMNS].sum(axis=1), axis=0)
+    for column in WHEN_COLUMNS:
+        result_df[f"Share {column.replace('_', ' ')}"] = shares[column]
+    result_df[WHEN_COLUMNS] = result_df[WHEN_COLUMNS].astype(int)
+    return result_df
+
+
+def daily_counts_workbook(
+    df: pd.DataFrame, dates: list, target_folder: str, phases: pd.DataFrame = None, key: str = None
+) -> None:
+    """
+    Write the daily counts to the target folder, with the days as dates.
+
+    Parameters:
+        df (pd.DataFrame): The daily counts.
+        dates (list): The treatment dates, unused: the writers of the folder share their arguments.
+        target_folder (str): The path to the target folder where the workbook will be saved.
+        phases (pd.DataFrame): The phase aggregates of df, unused.
+        key (str): The key in the file name (see logics.artifacts), a random one when not given.
+
+    Returns:
+        None
+    """
+    write_workbook({"Sheet1": df}, artifact_path(target_folder, DAILY_COUNTS, key))
+
+
+def weekly_sums(
+    df: pd.DataFrame, dates: list, target_folder: str, phases: pd.DataFrame = None, key: str = None
+) -> None:
     """
     Calculate weekly sums and averages based on the provided DataFrame and dates.
 
@@ -11,137 +64,57 @@ def weekly_sums(df: pd.DataFrame, dates: list, target_folder: str) -> None:
         df (pd.DataFrame): The DataFrame containing the data to be analyzed.
         dates (list): A list of date strings in ascending order representing the weekly intervals.
         target_folder (str): The path to the target folder where the results will be saved.
+        phases (pd.DataFrame): The precomputed phase aggregates of df, computed when not given.
+        key (str): The key in the file name (see logics.artifacts), a random one when not given.
 
     Returns:
         None: The function does not return any value, but it writes the results to an Excel file.
 
-    The function calculates the sum of specific columns in the DataFrame over each weekly interval and
-    calculates the average per day for each interval. The results are stored in a new DataFrame and
-    saved to an Excel file in the specified target folder.
+    The function reads the phase aggregates (the week before the first session, every gap between sessions
+    and the week after the last session) and writes the average per day of every count for each phase
+    to an Excel file in the specified target folder, followed by the distress and vividness of the phase
+    (mean over the rated memories, maximum and mean of the daily means) when the daily counts have them.
+    A second sheet holds the time of day of the memories of every phase when the daily counts have it, and a
+    last one the trend of every count over the whole diary and within every phase.
 
     Note: The DataFrame should have columns named 'Date', 'Count_Target', 'Count_Nontarget', and 'Count_Total'.
     """
-    # Convert the first and last dates in the list to Timestamp objects
-    first_date = pd.Timestamp(dates[0])
-    last_date = pd.Timestamp(dates[-1])
-    # Calculate the start and end dates of the desired range
-    start_date = first_date - pd.Timedelta(days=7)
-    end_date = last_date + pd.Timedelta(days=7)
-    # Filter the DataFrame based on the date range
-    filtered_df = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
-
-    # Create a new DataFrame to store the results
-    result_df = pd.DataFrame(
-        columns=[
-            "Start Date",
-            "End Date",
-            "Gap Between Sessions",
-            "Average Per Day - Target",
-            "Average Per Day - Nontarget",
-            "Average Per Day - Total",
-        ]
-    )
-    # Calculate the averages for the week before the first session 
-    filtered_df = df[(df["Date"] >= start_date) & (df["Date"] < first_date)]
-    num_days = (first_date - start_date).days
-
-    result_df = pd.concat(
-        [
-            result_df,
-            pd.DataFrame(
-                {
-                    "Start Date": [start_date],
-                    "End Date": [first_date],
-                    "Gap Between Sessions": [num_days],
-                    "Average Per Day - Target": [filtered_df["Count_Target"].sum() / num_days],
-                    "Average Per Day - Nontarget": [filtered_df["Count_Nontarget"].sum() / num_days],
-                    "Average Per Day - Total": [filtered_df["Count_Total"].sum() / num_days],
-                }
-            ),
-        ]
-    )
-
-    # Iterate over the dates in the list
-    for i in range(len(dates) - 1):
-        # Calculate the start and end dates for each gap
-        start_date = pd.Timestamp(dates[i])
-        end_date = pd.Timestamp(dates[i + 1])
-
-        # Filter the DataFrame based on the start and end dates for each gap
-        filtered_df = df[(df["Date"] >= start_date) & (df["Date"] < end_date)]
-
-        # Calculate the number of days between the start and end dates for each gap
-        num_days = (end_date - start_date).days
-
-        # Calculate the average values for each week, normalized by the number of days
-        average_target = filtered_df["Count_Target"].sum() / num_days
-        average_nontarget = filtered_df["Count_Nontarget"].sum() / num_days
-        average_total = filtered_df["Count_Total"].sum() / num_days
-
-        # Append the results to the new DataFrame
-        result_df = pd.concat(
-            [
-                result_df,
-                pd.DataFrame(
-                    {
-                        "Start Date": [start_date],
-                        "End Date": [end_date],
-                        "Gap Between Sessions": [num_days],
-                        "Average Per Day - Target": [average_target],
-                        "Average Per Day - Nontarget": [average_nontarget],
-                        "Average Per Day - Total": [average_total],
-                    }
-                ),
-            ]
-        )
-
-    # Calculate the last gap between the last session date and the end date
-    last_start_date = pd.Timestamp(dates[-1])
-    last_end_date = end_date
-
-    last_filtered_df = df[
-        (df["Date"] >= last_start_date) & (df["Date"] <= last_end_date)
-        ]
-    last_num_days = (last_end_date - last_start_date).days
-
-    # Check if last_num_days is not zero
-    if last_num_days != 0:
-        last_average_target = last_filtered_df["Count_Target"].sum() / last_num_days
-        last_average_nontarget = (
-                last_filtered_df["Count_Nontarget"].sum() / last_num_days
-        )
-        last_average_total = last_filtered_df["Count_Total"].sum() / last_num_days
-    else:  # If last_num_days is zero
-        last_average_target = None
-        last_average_nontarget = None
-        last_average_total = None
-
-    result_df = pd.concat(
-        [
-            result_df,
-            pd.DataFrame(
-                {
-                    "Start Date": [last_start_date],
-                    "End Date": [last_end_date],
-                    "Gap Between Sessions": [last_num_days],
-                    "Average Per Day - Target": [last_average_target],
-                    "Average Per Day - Nontarget": [last_average_nontarget],
-                    "Average Per Day - Total": [last_average_total],
-                }
-            ),
-        ]
-    )
-
-    # Reset the index of the result DataFrame
-    result_df = result_df.reset_index(drop=True)
-
-    # Write the new DataFrame to an Excel file
-    result_df.to_excel(
-        f"{target_folder}/Weekly_Diary_Summary-{get_unique()}.xlsx", index=False
-    )
-
-
-def weekly_count_zeros(df: pd.DataFrame, dates: list, target_folder: str) -> None:
+    if phases is None:
+        phases = aggregate_outcomes(df, dates)
+
+    sheets = {"Sheet1": summary_table(phases)}
+    if all(column in phases for column in WHEN_COLUMNS):
+        sheets[TIME_OF_DAY_SHEET] = time_of_day_table(phases)
+    sheets[TRENDS_SHEET] = phase_trends(df, dates)
+    write_workbook(sheets, artifact_path(target_folder, WEEKLY_SUMMARY, key))
+
+
+def summary_table(phases: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the weekly summary sheet: the average per day of every count and the ratings of every phase.
+
+    Parameters:
+        phases (pd.DataFrame): The phase aggregates, as returned by logics.phases.aggregate_outcomes.
+
+    Returns:
+        pd.DataFrame: The phase dates, the averages per day and the mean, max and mean of daily means of the
+        ratings the phase aggregates have.
+    """
+    result_df = phases[PHASE_COLUMNS].copy()
+    result_df["Average Per Day - Target"] = phases["Average_Count_Target"]
+    result_df["Average Per Day - Nontarget"] = phases["Average_Count_Nontarget"]
+    result_df["Average Per Day - Total"] = phases["Average_Count_Total"]
+    for field in RATING_FIELDS:
+        for statistic, title in [("Mean", "Mean"), ("Max", "Max"), ("Daily_Mean", "Mean Of Daily Means")]:
+            for split in CONTENT_SPLITS:
+                if f"{field}_{statistic}_{split}" in phases:
+                    result_df[f"{title} {field} - {split}"] = phases[f"{field}_{statistic}_{split}"]
+    return result_df
+
+
+def weekly_count_zeros(
+    df: pd.DataFrame, dates: list, target_folder: str, phases: pd.DataFrame = None, key: str = None
+) -> None:
     """
     Count the number of zero values for specific columns over weekly intervals.
 
@@ -149,115 +122,61 @@ def weekly_count_zeros(df: pd.DataFrame, dates: list, target_folder: str) -> Non
         df (pd.DataFrame): The DataFrame containing the data to be analyzed.
         dates (list): A list of date strings in ascending order representing the weekly intervals.
         target_folder (str): The path to the target folder where the results will be saved.
+        phases (pd.DataFrame): The precomputed phase aggregates of df, computed when not given.
+        key (str): The key in the file name (see logics.artifacts), a random one when not given.
 
     Returns:
         None: The function does not return any value, but it writes the results to an Excel file.
 
-    The function counts the occurrences of zero values in specific columns of the DataFrame over each weekly interval.
+    The function reads the number of days with a zero count in every phase from the phase aggregates,
+    next to the days reported and missed: a day without any response is missed, not counted as a zero day.
     The results are stored in a new DataFrame and saved to an Excel file in the specified target folder.
 
     Note: The DataFrame should have columns named 'Date', 'Count_Target', 'Count_Nontarget', and 'Count_Total'.
     """
-    # Convert the first and last dates in the list to Timestamp objects
-    first_date = pd.Timestamp(dates[0])
-    last_date = pd.Timestamp(dates[-1])
-    # Calculate the start and end dates of the desired range
-    start_date = first_date - pd.Timedelta(days=7)
-    end_date = last_date + pd.Timedelta(days=7)
-
-    # Create a new DataFrame to store the results
-    result_df = pd.DataFrame(
-        columns=["Start Date", "End Date", "Gap Between Sessions", "Zero Days_Target", "Zero Days_Nontarget",
-                 "Zero Days_Total"]
-    )
-
-    # Calculate the averages for the week before the first session 
-    filtered_df = df[(df["Date"] >= start_date) & (df["Date"] < first_date)]
-    num_days = (first_date - start_date).days
-
-    result_df = pd.concat(
-        [
-            result_df,
-            pd.DataFrame(
-                {
-                    "Start Date": [start_date],
-                    "End Date": [first_date],
-                    "Gap Between Sessions": [num_days],
-                    "Zero Days_Target": [(filtered_df["Count_Target"] == 0).sum()],
-                    "Zero Days_Nontarget": [(filtered_df["Count_Nontarget"] == 0).sum()],
-                    "Zero Days_Total": [(filtered_df["Count_Total"] == 0).sum()],
-                }
-            ),
-        ]
-    )
-
-    # Iterate over the dates in the list
-    for i in range(len(dates) - 1):
-        # Calculate the start and end dates for each week
-        start_date = pd.Timestamp(dates[i])
-        end_date = pd.Timestamp(dates[i + 1])
-
-        # Filter the DataFrame based on the start and end dates for each week
-        filtered_df = df[(df["Date"] >= start_date) & (df["Date"] < end_date)]
-
-        # Calculate the number of days between the start and end dates for each gap
-        num_days = (end_date - start_date).days
-
-        # Count the number of days with zero values for each variable
-        zero_days_target = (filtered_df["Count_Target"] == 0).sum()
-        zero_days_nontarget = (filtered_df["Count_Nontarget"] == 0).sum()
-        zero_days_total = (filtered_df["Count_Total"] == 0).sum()
-
-        # Create a temporary DataFrame for the current week
-        result_df = pd.concat(
-            [
-                result_df,
-                pd.DataFrame(
-                    {
-                        "Start Date": [start_date],
-                        "End Date": [end_date],
-                        "Gap Between Sessions": [num_days],
-                        "Zero Days_Target": [zero_days_target],
-                        "Zero Days_Nontarget": [zero_days_nontarget],
-                        "Zero Days_Total": [zero_days_total],
-                    }
-                ),
-            ]
-        )
-
-    # Calculate the last week between the last date and the end date
-    last_start_date = pd.Timestamp(dates[-1])
-    last_end_date = end_date
-
-    num_days = (last_end_date - last_start_date).days
-
-    last_filtered_df = df[
-        (df["Date"] >= last_start_date) & (df["Date"] <= last_end_date)
-        ]
-    last_zero_days_target = (last_filtered_df["Count_Target"] == 0).sum()
-    last_zero_days_nontarget = (last_filtered_df["Count_Nontarget"] == 0).sum()
-    last_zero_days_total = (last_filtered_df["Count_Total"] == 0).sum()
-
-    # Create a temporary DataFrame for the last week
-    result_df = pd.concat(
-        [
-            result_df,
-            pd.DataFrame(
-
-                {
-                    "Start Date": [last_start_date],
-                    "End Date": [last_end_date],
-                    "Gap Between Sessions": [num_days],
-                    "Zero Days_Target": [last_zero_days_target],
-                    "Zero Days_Nontarget": [last_zero_days_nontarget],
-                    "Zero Days_Total": [last_zero_days_total],
-                }
-            )
-        ]
-    )
-
-    result_df = result_df.reset_index(drop=True)
-
-    result_df.to_excel(
-        f"{target_folder}/Weekly_Summary_zeros-{get_unique()}.xlsx", index=False
-    )
+    if phases is None:
+        phases = pd.concat([aggregate_phases(df, dates), aggregate_compliance(df, dates)], axis=1)
+
+    write_workbook({"Sheet1": zeros_table(phases)}, artifact_path(target_folder, ZEROS_SUMMARY, key))
+
+
+def zeros_table(phases: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the zero days sheet: the days reported and missed, the compliance and the zero days of every phase.
+
+    Parameters:
+        phases (pd.DataFrame): The phase aggregates with the zeros of logics.phases.aggregate_phases and the
+            compliance of logics.phases.aggregate_compliance.
+
+    Returns:
+        pd.DataFrame: The phase dates, the days reported and missed, the compliance and the zero days per count.
+    """
+    result_df = phases[PHASE_COLUMNS].copy()
+    result_df["Days Reported"] = phases["Days Reported"]
+    result_df["Days Missed"] = phases["Days Missed"]
+    result_df["Compliance"] = phases["Compliance"]
+    result_df["Zero Days_Target"] = phases["Zeros_Count_Target"]
+    result_df["Zero Days_Nontarget"] = phases["Zeros_Count_Nontarget"]
+    result_df["Zero Days_Total"] = phases["Zeros_Count_Total"]
+    return result_df
+
+
+def summary_tables(df: pd.DataFrame, dates: list, phases: pd.DataFrame) -> dict:
+    """
+    Gather the daily counts and the phase sheets of a patient, the sheets of its single summary workbook.
+
+    Parameters:
+        df (pd.DataFrame): The daily counts.
+        dates (list): The treatment dates in ascending order.
+        phases (pd.DataFrame): The phase aggregates of df, as returned by logics.phases.aggregate_outcomes.
+
+    Returns:
+        dict: The DAILY_SHEET, SUMMARY_SHEET, TIME_OF_DAY_SHEET (when the daily counts have the time of day),
+        ZEROS_SHEET and TRENDS_SHEET tables, in that order.
+    """
+    tables = {DAILY_SHEET: df, SUMMARY_SHEET: summary_table(phases)}
+    if all(column in phases for column in WHEN_COLUMNS):
+        tables[TIME_OF_DAY_SHEET] = time_of_day_table(phases)
+    tables[ZEROS_SHEET] = zeros_table(phases)
+    tables[TRENDS_SHEET] = phase_trends(df, dates)
+    return tables
@@ -1,21 +1,254 @@
-from typing import Union
+from typing import Tuple, Union
 
 import numpy as np
 import pandas as pd
 
+from logics import trace
+from logics.output_writer import write_workbook
 
-def count_occurrences(df: pd.DataFrame, value: Union[int, float]) -> pd.Series:
+EVENT_FIELDS = ["When", "Type", "Content", "Distress", "Vividness"]
+IDEA_COLUMN = r"^(\d+)_(%s)$" % "|".join(EVENT_FIELDS)
+EXCLUDED_TYPE = 3
+COUNT_COLUMNS = ["Count_Target", "Count_Nontarget", "Count_Total"]
+RATING_FIELDS = ["Distress", "Vividness"]
+# The answer codes of the '_When' question (the part of the day the memory came up in)
+WHEN_CODES = [1, 2, 3, 4, 5, 6]
+WHEN_COLUMNS = [f"When_{code}" for code in WHEN_CODES]
+# The 'Content' values of every split of the ratings, named as the count columns
+CONTENT_SPLITS = {"Target": [1], "Nontarget": [2], "Total": [1, 2]}
+# The answer codes of the coded event fields, stored as categoricals (one byte per memory)
+EVENT_CODES = {"Type": [1, 2, 3], "Content": [1, 2], "When": WHEN_CODES}
+# The dtypes of the daily counts (memories, rated memories and '_When' counts of a day) and of the ratings
+COUNT_DTYPE = "uint16"
+RATING_DTYPE = "float32"
+
+
+def rating_columns(statistics: Tuple = ("Mean", "Max", "Rated")) -> list:
+    """
+    Name the daily rating columns.
+
+    Parameters:
+        statistics (Tuple): The statistics to name the columns of.
+
+    Returns:
+        list: '<field>_<statistic>_<split>' for every rating field, statistic and content split.
+    """
+    return [
+        f"{field}_{statistic}_{split}"
+        for field in RATING_FIELDS
+        for statistic in statistics
+        for split in CONTENT_SPLITS
+    ]
+
+
+def idea_indexes(df: pd.DataFrame) -> np.ndarray:
     """
-    Count the occurrences of a specific value in each row of the DataFrame.
+    Find the idea indexes present in the wide layout (the N of the 'N_Type' columns).
 
     Parameters:
         df (pd.DataFrame): The DataFrame containing the data.
+
+    Returns:
+        np.ndarray: The sorted idea indexes.
+    """
+    ideas = df.columns.astype(str).str.extract(IDEA_COLUMN)[0].dropna()
+    return np.unique(ideas.astype(int))
+
+
+def response_dates(df: pd.DataFrame) -> pd.Series:
+    """
+    Get the day of every response.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame containing the data, without the metadata rows.
+
+    Returns:
+        pd.Series: The 'StartDate' of every response truncated to midnight, as datetime64.
+    """
+    return pd.to_datetime(df["StartDate"], format="ISO8601").dt.normalize()
+
+
+def to_categorical(values: np.ndarray, codes: list) -> pd.Categorical:
+    """
+    Store coded answers as a categorical of the given codes.
+
+    Parameters:
+        values (np.ndarray): The answers, NaN when missing.
+        codes (list): The sorted answer codes.
+
+    Returns:
+        pd.Categorical: The answers with int8 codes, missing for NaN and for values that are not answer codes.
+    """
+    codes_array = np.asarray(codes, dtype=float)
+    positions = np.searchsorted(codes_array, values)
+    known = positions < len(codes)
+    known[known] = codes_array[positions[known]] == values[known]
+    return pd.Categorical.from_codes(np.where(known, positions, -1).astype("int8"), categories=codes)
+
+
+def to_events(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reshape the wide 'N_When/N_Type/N_Content/N_Distress/N_Vividness' layout into a long memory event table.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame containing the data, without the metadata rows.
+
+    Returns:
+        pd.DataFrame: One row per reported memory with the columns 'Response' (position of the response in df),
+        'Date', 'Idea', 'Type', 'Content', 'Distress', 'Vividness' and 'When'. The EVENT_CODES fields are
+        categoricals and the ratings are float32.
+    """
+    ideas = idea_indexes(df)
+    n_responses = len(df)
+
+    fields = {
+        field: df.reindex(columns=[f"{i}_{field}" for i in ideas])
+        .to_numpy(dtype="float32")
+        .ravel()
+        for field in EVENT_FIELDS
+    }
+    response = np.repeat(np.arange(n_responses, dtype="int32"), len(ideas))
+    reported = ~np.isnan(fields["Type"]) | ~np.isnan(fields["Content"])
+    dates = response_dates(df).to_numpy()
+
+    events = pd.DataFrame(
+        {
+            "Response": response[reported],
+            "Date": dates[response[reported]],
+            "Idea": np.tile(ideas.astype("int16"), n_responses)[reported],
+        }
+    )
+    for field in ["Type", "Content", "Distress", "Vividness", "When"]:
+        values = fields[field][reported]
+        events[field] = to_categorical(values, EVENT_CODES[field]) if field in EVENT_CODES else values
+    return events
+
+
+def restore_event_dtypes(events: pd.DataFrame) -> pd.DataFrame:
+    """
+    Restore the categoricals of an event table read back from a file that stores them as plain codes.
+
+    Parameters:
+        events (pd.DataFrame): The memory event table, as returned by to_events and then stored.
+
+    Returns:
+        pd.DataFrame: The event table with the EVENT_CODES fields as categoricals.
+    """
+    for field, codes in EVENT_CODES.items():
+        if field in events:
+            events[field] = pd.Categorical(events[field], categories=codes)
+    return events
+
+
+def count_occurrences(
+    events: pd.DataFrame, value: Union[int, float], n_responses: int
+) -> np.ndarray:
+    """
+    Count the events with a specific 'Content' value for each response.
+
+    Parameters:
+        events (pd.DataFrame): The memory event table.
         value (Union[int, float]): The value to count occurrences of.
+        n_responses (int): The number of responses in the export.
+
+    Returns:
+        np.ndarray: The count of occurrences of the specified value for each response.
+    """
+    return np.bincount(
+        events["Response"], weights=events["Content"] == value, minlength=n_responses
+    ).astype(int)
+
+
+def rating_sums(events: pd.DataFrame, n_responses: int) -> dict:
+    """
+    Sum, count and take the maximum of the distress and vividness ratings of every response.
+
+    Parameters:
+        events (pd.DataFrame): The memory event table.
+        n_responses (int): The number of responses in the export.
+
+    Returns:
+        dict: '<field>_Sum_<split>', '<field>_Rated_<split>' and '<field>_Max_<split>' arrays with one value per
+        response. Unrated memories are left out, a response without ratings has a NaN maximum.
+    """
+    response = events["Response"].to_numpy()
+    content = events["Content"].to_numpy()
+    columns = {}
+    for field in RATING_FIELDS:
+        ratings = events[field].to_numpy(dtype=float)
+        rated = ~np.isnan(ratings)
+        for split, values in CONTENT_SPLITS.items():
+            selected = rated & np.isin(content, values)
+            columns[f"{field}_Sum_{split}"] = np.bincount(
+                response[selected], weights=ratings[selected], minlength=n_responses
+            )
+            columns[f"{field}_Rated_{split}"] = np.bincount(response[selected], minlength=n_responses)
+            maxima = np.full(n_responses, np.nan)
+            np.fmax.at(maxima, response[selected], ratings[selected])
+            columns[f"{field}_Max_{split}"] = maxima
+    return columns
+
+
+def when_counts(events: pd.DataFrame, n_responses: int) -> dict:
+    """
+    Count the target and nontarget memories of every response by their '_When' answer code.
+
+    Parameters:
+        events (pd.DataFrame): The memory event table.
+        n_responses (int): The number of responses in the export.
+
+    Returns:
+        dict: One 'When_<code>' array per answer code with one count per response. Memories without a valid
+        answer are left out.
+    """
+    when = events["When"].to_numpy(dtype=float)
+    selected = np.isin(events["Content"].to_numpy(), CONTENT_SPLITS["Total"]) & np.isin(when, WHEN_CODES)
+    bins = events["Response"].to_numpy()[selected] * len(WHEN_CODES) + when[selected].astype(int) - WHEN_CODES[0]
+    counts = np.bincount(bins, minlength=n_responses * len(WHEN_CODES)).reshape(n_responses, len(WHEN_CODES))
+    return dict(zip(WHEN_COLUMNS, counts.T))
+
+
+def group_days(new_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Group per response (or partial daily) counts and rating sums into one row per day.
+
+    Parameters:
+        new_df (pd.DataFrame): A 'Date' column, the count columns, the '<field>_Sum_<split>',
+            '<field>_Rated_<split>' and '<field>_Max_<split>' rating columns and the 'When_<code>' columns.
 
     Returns:
-        pd.Series: A Pandas Series containing the count of occurrences of the specified value for each row.
+        pd.DataFrame: One row per day with the counts and, for every rating, the mean over the rated memories,
+        the maximum and the number of rated memories, then the counts by '_When' answer code. The counts are
+        COUNT_DTYPE, the maxima RATING_DTYPE and the means float64.
     """
-    return df.eq(value).sum(axis=1)
+    aggregations = {"Count_Total": "sum", "Count_Target": "sum", "Count_Nontarget": "sum"}
+    aggregations.update({column: "sum" for column in WHEN_COLUMNS})
+    aggregations.update({column: "sum" for column in rating_columns(("Sum", "Rated"))})
+    aggregations.update({column: "max" for column in rating_columns(("Max",))})
+    grouped = new_df.groupby("Date").agg(aggregations).reset_index()
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for field in RATING_FIELDS:
+            for split in CONTENT_SPLITS:
+                rated = grouped[f"{field}_Rated_{split}"]
+                grouped[f"{field}_Mean_{split}"] = grouped.pop(f"{field}_Sum_{split}") / rated.where(rated > 0)
+    dtypes = dict.fromkeys(COUNT_COLUMNS + rating_columns(("Rated",)) + WHEN_COLUMNS, COUNT_DTYPE)
+    dtypes.update(dict.fromkeys(rating_columns(("Max",)), RATING_DTYPE))
+    grouped = grouped.astype(dtypes)
+    return grouped[["Date", "Count_Total", "Count_Target", "Count_Nontarget"] + rating_columns() + WHEN_COLUMNS]
+
+
+def remove_type_3_events(events: pd.DataFrame) -> pd.DataFrame:
+    """
+    Remove the events whose 'Type' is equal to 3.
+
+    Parameters:
+        events (pd.DataFrame): The memory event table.
+
+    Returns:
+        pd.DataFrame: The memory event table without type 3 events.
+    """
+    return events[events["Type"] != EXCLUDED_TYPE].reset_index(drop=True)
 
 
 def remove_type_3(df: pd.DataFrame, max_ideas: int) -> pd.DataFrame:
@@ -29,46 +262,107 @@ def remove_type_3(df: pd.DataFrame, max_ideas: int) -> pd.DataFrame:
     Returns:
         pd.DataFrame: The DataFrame with data removed where 'Type' column is equal to 3.
     """
-    for i in range(1, max_ideas + 1):
-        type_column_name = f"{i}_Type"
-        if type_column_name not in df.columns:
-            continue
-        mask = df[type_column_name] == 3
-        for suffix in ["_When", "_Type", "_Content", "_Distress", "_Vividness"]:
-            column_name = f"{i}{suffix}"
-            if column_name in df.columns:
-                df.loc[mask, column_name] = np.nan
+    ideas = [i for i in range(1, max_ideas + 1) if f"{i}_Type" in df.columns]
+    mask = df[[f"{i}_Type" for i in ideas]].eq(EXCLUDED_TYPE).to_numpy()
+    for field in EVENT_FIELDS:
+        columns = [f"{i}_{field}" for i in ideas]
+        present = [col in df.columns for col in columns]
+        columns = [col for col, keep in zip(columns, present) if keep]
+        df[columns] = df[columns].mask(mask[:, present])
     return df
 
 
-def run_filter_flow(memories_df: pd.DataFrame) -> pd.DataFrame:
+def drop_metadata_rows(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Perform a series of data transformations and calculations on the DataFrame.
+    Drop the Qualtrics metadata rows (question text, ImportId) that sit under the header.
+
+    Exports loaded with logics.loader have already skipped them at parse time and are returned unchanged.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame containing the data.
+
+    Returns:
+        pd.DataFrame: The DataFrame with only the response rows.
+    """
+    if pd.api.types.is_datetime64_any_dtype(df["StartDate"]):
+        return df
+    return df[pd.to_datetime(df["StartDate"], errors="coerce", format="ISO8601").notna()]
+
+
+def daily_counts(events: pd.DataFrame, dates: pd.Series) -> pd.DataFrame:
+    """
+    Count the target and nontarget memories of every day.
+
+    Parameters:
+        events (pd.DataFrame): The memory event table, after the exclusions.
+        dates (pd.Series): The day of every response, as returned by response_dates.
+
+    Returns:
+        pd.DataFrame: One row per reported day with 'Date', 'Count_Total', 'Count_Target', 'Count_Nontarget' and,
+        for the distress and vividness of the target, nontarget and all memories, the mean and maximum rating and
+        the number of rated memories ('<field>_<Mean|Max|Rated>_<split>'), and the number of target and
+        nontarget memories by '_When' answer code ('When_<code>').
+    """
+    with trace.stage("counting", len(events)):
+        new_df = pd.DataFrame()
+        new_df["Count_Target"] = count_occurrences(events, 1, len(dates))
+        new_df["Count_Nontarget"] = count_occurrences(events, 2, len(dates))
+        new_df["Count_Total"] = new_df["Count_Target"] + new_df["Count_Nontarget"]
+        new_df["Date"] = dates.to_numpy()
+        new_df = new_df.assign(**rating_sums(events, len(dates)), **when_counts(events, len(dates)))
+
+    with trace.stage("groupby", len(new_df)):
+        return group_days(new_df)
+
+
+def write_daily_counts(df: pd.DataFrame, counts_path: str):
+    """
+    Write the daily counts to an Excel file, with the days as dates.
+
+    Parameters:
+        df (pd.DataFrame): The daily counts.
+        counts_path (str): The path of the Excel file.
+    """
+    write_workbook({"Sheet1": df}, counts_path)
+
+
+def build_tables(memories_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Build the memory event table and the daily counts of an export.
 
     Parameters:
         memories_df (pd.DataFrame): The DataFrame containing the data.
 
     Returns:
-        pd.DataFrame: The resulting DataFrame after transformations and calculations.
+        Tuple[pd.DataFrame, pd.DataFrame]: The memory event table without type 3 events and the daily counts.
     """
-    memories_df = memories_df.drop(0)
-    max_ideas = max(memories_df["Amount"])
-    memories_df = remove_type_3(memories_df, max_ideas)
+    with trace.stage("drop metadata rows", len(memories_df)):
+        memories_df = drop_metadata_rows(memories_df)
+    with trace.stage("to events", len(memories_df)):
+        events = to_events(memories_df)
+    with trace.stage("remove type 3", len(events)):
+        events = remove_type_3_events(events)
+    return events, daily_counts(events, response_dates(memories_df))
 
-    new_df = pd.DataFrame()
-    new_df["Count_Target"] = count_occurrences(memories_df.filter(like="_Content"), 1)
-    new_df["Count_Nontarget"] = count_occurrences(
-        memories_df.filter(like="_Content"), 2
-    )
-    new_df["Count_Total"] = new_df["Count_Target"] + new_df["Count_Nontarget"]
-    new_df["Date"] = pd.to_datetime(memories_df["StartDate"]).dt.date
 
-    grouped_mat = (
-        new_df.groupby("Date")
-        .agg({"Count_Total": "sum", "Count_Target": "sum", "Count_Nontarget": "sum"})
-        .reset_index()
-    )
+def run_filter_flow(
+    memories_df: pd.DataFrame, counts_path: str = None
+) -> pd.DataFrame:
+    """
+    Perform a series of data transformations and calculations on the DataFrame.
+
+    Parameters:
+        memories_df (pd.DataFrame): The DataFrame containing the data.
+        counts_path (str): The path of the Excel file the daily counts are written to, None (the default) to skip
+            writing it.
+
+    Returns:
+        pd.DataFrame: The resulting DataFrame after transformations and calculations.
+    """
+    _, grouped_mat = build_tables(memories_df)
 
-    grouped_mat.to_excel("memories_count.xlsx", index=False)
+    if counts_path:
+        with trace.stage("write daily counts", len(grouped_mat)):
+            write_daily_counts(grouped_mat, counts_path)
 
     return grouped_mat
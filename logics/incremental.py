@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from logics import artifacts, cache, filter_data, loader, phases, trace
+
+STATE_FILE = "state.json"
+DAILY_FILE = "daily.parquet"
+PHASES_FILE = "phases.parquet"
+EVENTS_FILE = "events.parquet"
+
+
+def state_version() -> str:
+    """
+    Hash the code that produces the stored state.
+
+    Returns:
+        str: A hex digest of the loading, validation and filtering code (cache.code_version), of the code of the
+        phase aggregates (artifacts.pipeline_version) and of this module, which merges the updates.
+    """
+    digest = hashlib.sha256(cache.code_version().encode())
+    digest.update(artifacts.pipeline_version().encode())
+    with open(__file__, "rb") as file:
+        digest.update(file.read())
+    return digest.hexdigest()
+
+
+def read_state(patient_folder: str) -> dict:
+    """
+    Read the stored state of a patient, if it was written by the current code version.
+
+    Parameters:
+        patient_folder (str): The state folder of the patient.
+
+    Returns:
+        dict: The 'watermark', 'dates' and 'code_version' of the last update, or an empty dict if there is no
+        usable state and the patient has to be rebuilt from scratch.
+    """
+    state_path = os.path.join(patient_folder, STATE_FILE)
+    stored = [os.path.join(patient_folder, name) for name in [STATE_FILE, DAILY_FILE, PHASES_FILE, EVENTS_FILE]]
+    if not all(map(os.path.isfile, stored)):
+        return {}
+    with open(state_path) as file:
+        state = json.load(file)
+    if state.get("code_version") != state_version():
+        return {}
+    return state
+
+
+def read_events(patient_folder: str) -> pd.DataFrame:
+    """
+    Read the stored memory event table of a patient.
+
+    Parameters:
+        patient_folder (str): The state folder of the patient.
+
+    Returns:
+        pd.DataFrame: The events of all the processed responses, 'Response' being the position of the response
+        in the export, as returned by filter_data.build_tables.
+    """
+    return filter_data.restore_event_dtypes(pd.read_parquet(os.path.join(patient_folder, EVENTS_FILE)))
+
+
+def write_state(
+    patient_folder: str, state: dict, daily: pd.DataFrame, phase_df: pd.DataFrame, events: pd.DataFrame
+):
+    """
+    Store the daily counts, the phase aggregates, the memory events and the state of a patient.
+
+    The state file is replaced last, so an interrupted update leaves the previous watermark in place and the
+    next update repeats it.
+
+    Parameters:
+        patient_folder (str): The state folder of the patient.
+        state (dict): The 'watermark', 'dates' and 'code_version' of this update.
+        daily (pd.DataFrame): The daily counts.
+        phase_df (pd.DataFrame): The phase aggregates of the daily counts.
+        events (pd.DataFrame): The memory events of all the processed responses.
+    """
+    os.makedirs(patient_folder, exist_ok=True)
+    events.to_parquet(os.path.join(patient_folder, EVENTS_FILE), index=False)
+    daily.to_parquet(os.path.join(patient_folder, DAILY_FILE), index=False)
+    phase_df.to_parquet(os.path.join(patient_folder, PHASES_FILE), index=False)
+    partial = os.path.join(patient_folder, f"{STATE_FILE}.{os.getpid()}.partial")
+    with open(partial, "w") as file:
+        json.dump(state, file)
+    os.replace(partial, os.path.join(patient_folder, STATE_FILE))
+
+
+def new_positions(memories_df: pd.DataFrame, watermark: str = None) -> np.ndarray:
+    """
+    Find the positions in the export of the responses started after the watermark.
+
+    Parameters:
+        memories_df (pd.DataFrame): The loaded export.
+        watermark (str): The ISO 'StartDate' of the last processed response, None to select all responses.
+
+    Returns:
+        np.ndarray: The positions of the new responses.
+    """
+    if watermark is None:
+        return np.arange(len(memories_df))
+    return np.flatnonzero(memories_df["StartDate"] > pd.Timestamp(watermark))
+
+
+def new_responses(memories_df: pd.DataFrame, watermark: str = None) -> pd.DataFrame:
+    """
+    Select the responses started after the watermark.
+
+    Parameters:
+        memories_df (pd.DataFrame): The loaded export.
+        watermark (str): The ISO 'StartDate' of the last processed response, None to select all responses.
+
+    Returns:
+        pd.DataFrame: The new responses.
+    """
+    return memories_df.iloc[new_positions(memories_df, watermark)]
+
+
+def merge_daily(daily: pd.DataFrame, new_daily: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the daily counts of the new responses to the stored daily counts.
+
+    The day of the watermark can get more responses, so the counts of a day found in both are summed and its
+    rating means are recomputed over the rated memories of both.
+
+    Parameters:
+        daily (pd.DataFrame): The stored daily counts.
+        new_daily (pd.DataFrame): The daily counts of the new responses.
+
+    Returns:
+        pd.DataFrame: The merged daily counts, in date order.
+    """
+    merged = pd.concat([daily, new_daily], ignore_index=True)
+    if not merged["Date"].duplicated().any():
+        return merged.sort_values("Date", ignore_index=True)
+    for field in filter_data.RATING_FIELDS:
+        for split in filter_data.CONTENT_SPLITS:
+            sums = merged[f"{field}_Mean_{split}"] * merged[f"{field}_Rated_{split}"]
+            merged[f"{field}_Sum_{split}"] = sums.fillna(0)
+    return filter_data.group_days(merged)
+
+
+def update_phases(
+    phase_df: pd.DataFrame, daily: pd.DataFrame, changed_days: List, treatment_dates: List
+) -> pd.DataFrame:
+    """
+    Recompute only the phase aggregates whose window holds a changed day.
+
+    Parameters:
+        phase_df (pd.DataFrame): The stored phase aggregates.
+        daily (pd.DataFrame): The merged daily counts.
+        changed_days (List): The days that got new responses.
+        treatment_dates (List): Treatment dates in ascending order.
+
+    Returns:
+        pd.DataFrame: The phase aggregates of the merged daily counts.
+    """
+    edges = phases.phase_edges(treatment_dates)
+    changed = np.unique(phases.assign_phase(phases.to_days(changed_days), edges))
+    changed = changed[changed >= 0]
+    if not len(changed):
+        return phase_df
+
+    in_changed = np.isin(phases.assign_phase(phases.to_days(daily["Date"]), edges), changed)
+    fresh = phases.aggregate_outcomes(daily[in_changed], treatment_dates)
+    phase_df = phase_df.copy()
+    phase_df.iloc[changed] = fresh.iloc[changed]
+    return phase_df
+
+
+def update_patient(
+    export_path: str, treatment_dates: List, patient_folder: str
+) -> Tuple[pd.DataFrame, pd.DataFrame, bool]:
+    """
+    Bring the stored daily counts, phase aggregates and memory events of a patient up to date with a new export.
+
+    Only the responses started after the stored 'StartDate' watermark are filtered and counted. Their daily
+    counts are merged into the stored ones and only the phases they fall in are recomputed. The state is
+    rebuilt from scratch when there is none or it was written by another code version, and all the phases
+    are recomputed when the treatment dates changed. Responses backdated before the watermark are not picked up.
+
+    Parameters:
+        export_path (str): The path of the latest export of the patient.
+        treatment_dates (List): Treatment dates in ascending order.
+        patient_folder (str): The state folder of the patient.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame, bool]: The daily counts, the phase aggregates and whether they changed
+        since the last update.
+    """
+    state = read_state(patient_folder)
+    dates = [pd.Timestamp(d).date().isoformat() for d in treatment_dates]
+    memories_df = loader.load_export(export_path)
+    with trace.stage("select new responses", len(memories_df)):
+        positions = new_positions(memories_df, state.get("watermark"))
+        new_df = memories_df.iloc[positions]
+
+    if state:
+        with trace.stage("read state"):
+            daily = pd.read_parquet(os.path.join(patient_folder, DAILY_FILE))
+            phase_df = pd.read_parquet(os.path.join(patient_folder, PHASES_FILE))
+        if not len(new_df) and state["dates"] == dates:
+            return daily, phase_df, False
+
+    new_events, new_daily = filter_data.build_tables(new_df)
+    # The responses are numbered by their position in the export, as in a full rebuild
+    new_events["Response"] = positions[new_events["Response"].to_numpy()]
+    if state:
+        new_events = pd.concat([read_events(patient_folder), new_events], ignore_index=True)
+    with trace.stage("phase aggregation", len(new_daily)):
+        if state:
+            daily = merge_daily(daily, new_daily)
+        else:
+            daily = new_daily
+        if state and state["dates"] == dates:
+            phase_df = update_phases(phase_df, daily, new_daily["Date"], treatment_dates)
+        else:
+            phase_df = phases.aggregate_outcomes(daily, treatment_dates)
+
+    watermark = memories_df["StartDate"].max() if len(memories_df) else None
+    state = {
+        "watermark": watermark.isoformat() if watermark is not None else state.get("watermark"),
+        "dates": dates,
+        "code_version": state_version(),
+    }
+    with trace.stage("write state", len(daily)):
+        write_state(patient_folder, state, daily, phase_df, new_events)
+    return daily, phase_df, True
@@ -0,0 +1,184 @@
+import re
+from typing import List
+
+import pandas as pd
+
+from errors import InvalidExport, MissingColumns
+from logics import trace, validators
+
+REQUIRED_COLUMNS = ["StartDate", "Amount"]
+IDEA_SUFFIXES = ["_Type", "_Content"]
+DETAIL_SUFFIXES = ["_When", "_Distress", "_Vividness"]
+CODE_DTYPE = "float32"
+CHUNK_SIZE = 5000
+METADATA_PEEK_ROWS = 3
+DATE_FORMAT = "ISO8601"
+
+
+def idea_column_pattern(include_details: bool = True) -> re.Pattern:
+    """
+    Build the regular expression matching the idea columns the pipeline uses (e.g. '3_Content').
+
+    Parameters:
+        include_details (bool): Whether to match the '_When', '_Distress' and '_Vividness' columns as well.
+
+    Returns:
+        re.Pattern: The compiled pattern.
+    """
+    suffixes = IDEA_SUFFIXES + (DETAIL_SUFFIXES if include_details else [])
+    return re.compile(r"^\d+(%s)$" % "|".join(suffixes))
+
+
+def used_columns(columns: List, include_details: bool = True) -> List:
+    """
+    Select the columns of an export that the pipeline reads.
+
+    Parameters:
+        columns (List): The header of the export.
+        include_details (bool): Whether to keep the '_When', '_Distress' and '_Vividness' columns.
+
+    Returns:
+        List: The required columns followed by the idea columns, in file order.
+    """
+    pattern = idea_column_pattern(include_details)
+    return [col for col in columns if col in REQUIRED_COLUMNS or pattern.match(str(col))]
+
+
+def metadata_rows(head: pd.DataFrame) -> List:
+    """
+    Find the Qualtrics metadata rows (question text, ImportId) at the top of an export.
+
+    Parameters:
+        head (pd.DataFrame): The first rows of the export, read with only the 'StartDate' column.
+
+    Returns:
+        List: The file line numbers (the header being line 0) of the rows to skip at parse time.
+    """
+    parsed = pd.to_datetime(head["StartDate"], errors="coerce", format=DATE_FORMAT)
+    return [i + 1 for i in range(len(head)) if pd.isna(parsed.iloc[i])]
+
+
+def validate_columns(columns: List):
+    """
+    Validate that the export has the columns the pipeline cannot run without.
+
+    Parameters:
+        columns (List): The used columns of the export.
+
+    Raises:
+        MissingColumns: If 'StartDate' or 'Amount' is missing.
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing:
+        raise MissingColumns(missing)
+
+
+def compact_types(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast the loaded columns to explicit compact dtypes.
+
+    Parameters:
+        df (pd.DataFrame): The loaded export.
+
+    Returns:
+        pd.DataFrame: The export with a datetime64 'StartDate', a uint16 'Amount' and float32 idea columns.
+    """
+    df["StartDate"] = pd.to_datetime(df["StartDate"], format=DATE_FORMAT)
+    df["Amount"] = pd.to_numeric(df["Amount"]).fillna(0).astype("uint16")
+    idea_columns = [col for col in df.columns if col not in REQUIRED_COLUMNS]
+    df[idea_columns] = df[idea_columns].apply(pd.to_numeric).astype(CODE_DTYPE)
+    return df
+
+
+def read_csv(file_path: str, include_details: bool = True, chunksize: int = CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Stream a CSV export in chunks, keeping only the used columns with compact dtypes.
+
+    Every chunk is validated before its types are converted. The whole file is checked, so the report of an
+    invalid export lists all its problems.
+
+    Parameters:
+        file_path (str): The path of the CSV file.
+        include_details (bool): Whether to load the '_When', '_Distress' and '_Vividness' columns.
+        chunksize (int): The number of rows parsed at a time.
+
+    Raises:
+        InvalidExport: If the export fails validation.
+
+    Returns:
+        pd.DataFrame: The loaded export.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    columns = used_columns(header, include_details)
+    validate_columns(columns)
+    head = pd.read_csv(file_path, usecols=["StartDate"], nrows=METADATA_PEEK_ROWS, dtype=str)
+
+    chunks = pd.read_csv(file_path, usecols=columns, skiprows=metadata_rows(head), chunksize=chunksize)
+    compacted, reports = [], []
+    first_response = 1
+    for chunk in chunks:
+        with trace.stage("validate export", len(chunk)):
+            reports.append(validators.check_export(chunk, first_response))
+        first_response += len(chunk)
+        if not any((report["Severity"] == "error").any() for report in reports):
+            compacted.append(compact_types(chunk))
+
+    report = pd.concat(reports, ignore_index=True)
+    errors = report[report["Severity"] == "error"]
+    if len(errors):
+        raise InvalidExport(validators.describe_report(errors), report)
+    df = pd.concat(compacted, ignore_index=True)
+    return df[columns]
+
+
+def read_excel(file_path: str, include_details: bool = True) -> pd.DataFrame:
+    """
+    Read an Excel export, keeping only the used columns with compact dtypes.
+
+    Parameters:
+        file_path (str): The path of the Excel file.
+        include_details (bool): Whether to load the '_When', '_Distress' and '_Vividness' columns.
+
+    Raises:
+        InvalidExport: If the export fails validation.
+
+    Returns:
+        pd.DataFrame: The loaded export.
+    """
+    # The workbook is opened once: the header and the first rows only read the top of the sheet
+    with pd.ExcelFile(file_path) as workbook:
+        header = workbook.parse(nrows=0).columns
+        columns = used_columns(header, include_details)
+        validate_columns(columns)
+        head = workbook.parse(usecols=["StartDate"], nrows=METADATA_PEEK_ROWS, dtype=str)
+        df = workbook.parse(usecols=columns, skiprows=metadata_rows(head))
+    with trace.stage("validate export", len(df)):
+        validators.validate_export(df)
+    return compact_types(df)[columns]
+
+
+def load_export(file_path: str, include_details: bool = True) -> pd.DataFrame:
+    """
+    Load a Qualtrics export (xls, xlsx or csv) for the pipeline.
+
+    Only 'StartDate', 'Amount' and the idea columns are parsed, the metadata rows under the header are
+    skipped at parse time and CSV files are streamed in chunks.
+
+    Parameters:
+        file_path (str): The path of the export.
+        include_details (bool): Whether to load the '_When', '_Distress' and '_Vividness' columns.
+
+    Raises:
+        MissingColumns: If 'StartDate' or 'Amount' is missing.
+        InvalidExport: If the export fails the checks of validators.check_export.
+
+    Returns:
+        pd.DataFrame: The loaded export, one row per response.
+    """
+    with trace.stage("load") as record:
+        if file_path.endswith(".csv"):
+            df = read_csv(file_path, include_details)
+        else:
+            df = read_excel(file_path, include_details)
+        record["rows"] = len(df)
+    return df
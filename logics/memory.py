@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+MEMORY_COLUMNS = ["Column", "Dtype Before", "Dtype After", "Bytes Before", "Bytes After", "Ratio"]
+
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compare the memory held by every column of two representations of the same table.
+
+    Object columns are measured deeply, counting the Python objects they point to.
+
+    Parameters:
+        before (pd.DataFrame): The table in its original representation.
+        after (pd.DataFrame): The same table in its compact representation.
+
+    Returns:
+        pd.DataFrame: One row per column of before with the MEMORY_COLUMNS, the ratio being bytes before over
+        bytes after, then a 'Total' row (index included).
+    """
+    bytes_before = before.memory_usage(deep=True)
+    bytes_after = after.memory_usage(deep=True).reindex(bytes_before.index)
+    report = pd.DataFrame(
+        {
+            "Column": bytes_before.index,
+            "Dtype Before": [str(before[c].dtype) if c in before else "" for c in bytes_before.index],
+            "Dtype After": [str(after[c].dtype) if c in after else "" for c in bytes_before.index],
+            "Bytes Before": bytes_before.to_numpy(),
+            "Bytes After": bytes_after.to_numpy(),
+        }
+    )
+    total = {"Column": "Total", "Dtype Before": "", "Dtype After": ""}
+    total.update(report[["Bytes Before", "Bytes After"]].sum().to_dict())
+    report = pd.concat([report, pd.DataFrame([total])], ignore_index=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        report["Ratio"] = report["Bytes Before"] / report["Bytes After"]
+    return report[MEMORY_COLUMNS]
@@ -0,0 +1,100 @@
+from typing import Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+from logics.artifacts import DIARY_SUMMARY, artifact_path
+from logics.utils import get_unique
+
+TABLE_FORMATS = ["xlsx", "parquet", "csv"]
+DATE_FORMAT = "YYYY-MM-DD"
+
+
+def excel_rows(df: pd.DataFrame, date_cell) -> Iterator[list]:
+    """
+    Convert a DataFrame to worksheet rows, column by column so no value goes through a per-row Series.
+
+    Parameters:
+        df (pd.DataFrame): The table.
+        date_cell: Called with a datetime to build its date formatted cell.
+
+    Returns:
+        Iterator[list]: The header, then one list of Python values per row, missing values as None.
+    """
+    yield [str(column) for column in df.columns]
+    columns = []
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            columns.append([date_cell(value.to_pydatetime()) if pd.notna(value) else None for value in values])
+        else:
+            values = values.astype(object)
+            columns.append(values.where(values.notna(), None).tolist())
+    yield from (list(row) for row in zip(*columns))
+
+
+def write_workbook(sheets: Dict[str, pd.DataFrame], path: str):
+    """
+    Stream DataFrames into one Excel workbook, one sheet each.
+
+    The workbook is written with the write-only mode of openpyxl: the rows are serialized as they are appended
+    instead of building every cell of the workbook in memory first. Dates are formatted as DATE_FORMAT.
+
+    Parameters:
+        sheets (Dict[str, pd.DataFrame]): The tables by sheet name, in sheet order.
+        path (str): The path of the workbook.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    workbook = Workbook(write_only=True)
+    for name, df in sheets.items():
+        sheet = workbook.create_sheet(name)
+
+        def date_cell(value):
+            cell = WriteOnlyCell(sheet, value)
+            cell.number_format = DATE_FORMAT
+            return cell
+
+        for row in excel_rows(df, date_cell):
+            sheet.append(row)
+    workbook.save(path)
+
+
+def table_artifacts(tables: Dict[str, pd.DataFrame], output_format: str) -> List[Tuple[str, str]]:
+    """
+    Get the artifacts the tables are written to: one workbook, or a file per table for Parquet and CSV.
+
+    Parameters:
+        tables (Dict[str, pd.DataFrame]): The tables by name.
+        output_format (str): One of TABLE_FORMATS.
+
+    Returns:
+        List[Tuple[str, str]]: The (prefix, extension) of every artifact (see logics.artifacts).
+    """
+    if output_format == "xlsx":
+        return [DIARY_SUMMARY]
+    return [(name.replace(" ", "_"), f".{output_format}") for name in tables]
+
+
+def write_tables(tables: Dict[str, pd.DataFrame], folder: str, key: str = None, output_format: str = "xlsx"):
+    """
+    Write tables as the sheets of one streamed workbook, or as one Parquet or CSV file per table.
+
+    Parameters:
+        tables (Dict[str, pd.DataFrame]): The tables by name, in sheet order.
+        folder (str): The output folder.
+        key (str): The key in the file names (see logics.artifacts), a random one when not given.
+        output_format (str): One of TABLE_FORMATS.
+    """
+    if output_format not in TABLE_FORMATS:
+        raise ValueError(f"Unknown output format {output_format}, expected one of {TABLE_FORMATS}")
+    key = key or get_unique()
+    if output_format == "xlsx":
+        write_workbook(tables, artifact_path(folder, DIARY_SUMMARY, key))
+        return
+    for artifact, df in zip(table_artifacts(tables, output_format), tables.values()):
+        path = artifact_path(folder, artifact, key)
+        if output_format == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False, date_format="%Y-%m-%d")
@@ -0,0 +1,242 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from logics.daily_index import DailyIndex, to_days
+from logics.filter_data import CONTENT_SPLITS, COUNT_COLUMNS, RATING_FIELDS, WHEN_COLUMNS
+
+PAD_DAYS = 7
+
+
+def phase_edges(dates: List, pad_days: int = PAD_DAYS) -> np.ndarray:
+    """
+    Build the sorted phase boundaries for the given treatment dates.
+
+    Parameters:
+        dates (List): Treatment dates in ascending order.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+
+    Returns:
+        np.ndarray: A datetime64[D] array of len(dates) + 2 edges. Phase i covers [edges[i], edges[i + 1]).
+    """
+    sessions = np.array([np.datetime64(pd.Timestamp(date), "D") for date in dates])
+    pad = np.timedelta64(pad_days, "D")
+    return np.concatenate([[sessions[0] - pad], sessions, [sessions[-1] + pad]])
+
+
+def phase_labels(n_sessions: int) -> List[str]:
+    """
+    Name the phases of n_sessions treatment sessions.
+
+    Parameters:
+        n_sessions (int): The number of treatment sessions.
+
+    Returns:
+        List[str]: 'Baseline', then 'Session i' for the gap starting at session i, then 'Post'.
+    """
+    return ["Baseline"] + [f"Session {i}" for i in range(1, n_sessions)] + ["Post"]
+
+
+def assign_phase(days: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Bin every day into its phase with a single searchsorted call.
+
+    Parameters:
+        days (np.ndarray): A datetime64[D] array of days.
+        edges (np.ndarray): Phase boundaries as returned by phase_edges.
+
+    Returns:
+        np.ndarray: The phase index of every day, -1 for days outside all phases.
+    """
+    phase = np.searchsorted(edges, days, side="right") - 1
+    phase[(phase < 0) | (phase >= len(edges) - 1)] = -1
+    return phase
+
+
+def aggregate_phases(
+    df: pd.DataFrame, dates: List, count_columns: List = None, pad_days: int = PAD_DAYS, index: DailyIndex = None
+) -> pd.DataFrame:
+    """
+    Aggregate the daily counts into treatment phases from the prefix sums of a DailyIndex.
+
+    The phases are the week before the first session, every gap between two consecutive sessions
+    and the week after the last session. Every phase is half-open: it includes its start date and
+    excludes its end date.
+
+    Parameters:
+        df (pd.DataFrame): The daily DataFrame with a 'Date' column and the count columns, one row per day.
+        dates (List): Treatment dates in ascending order.
+        count_columns (List): The count columns to aggregate. Defaults to COUNT_COLUMNS.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+        index (DailyIndex): The index of df over all the phases and the count columns, built when not given.
+
+    Returns:
+        pd.DataFrame: One row per phase with 'Phase', 'Start Date', 'End Date', 'Gap Between Sessions', 'Days Reported'
+        and, for every count column, 'Sum_<col>', 'Average_<col>' (sum per calendar day), 'Zeros_<col>'
+        (days reported with a zero count) and 'Mean_<col>' (mean over the days reported).
+    """
+    count_columns = count_columns or COUNT_COLUMNS
+    edges = phase_edges(dates, pad_days)
+    if index is None:
+        index = DailyIndex(df, columns=count_columns, start=edges[0], end=edges[-1])
+    starts, ends = edges[:-1], edges[1:]
+
+    gaps = index.calendar_days(starts, ends)
+    result = pd.DataFrame(
+        {
+            "Phase": phase_labels(len(dates)),
+            "Start Date": pd.to_datetime(starts),
+            "End Date": pd.to_datetime(ends),
+            "Gap Between Sessions": gaps,
+            "Days Reported": index.days_reported(starts, ends),
+        }
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for column in count_columns:
+            sums = index.sum(column, starts, ends)
+            result[f"Sum_{column}"] = sums
+            result[f"Average_{column}"] = sums / gaps
+            result[f"Zeros_{column}"] = index.zeros(column, starts, ends)
+            result[f"Mean_{column}"] = index.mean(column, starts, ends)
+    return result
+
+
+def aggregate_ratings(df: pd.DataFrame, dates: List, pad_days: int = PAD_DAYS) -> pd.DataFrame:
+    """
+    Aggregate the daily distress and vividness ratings into treatment phases in a single pass.
+
+    Parameters:
+        df (pd.DataFrame): The daily DataFrame with a 'Date' column and the rating columns of
+            filter_data.daily_counts ('<field>_Mean_<split>', '<field>_Max_<split>', '<field>_Rated_<split>').
+        dates (List): Treatment dates in ascending order.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+
+    Returns:
+        pd.DataFrame: One row per phase with, for every rating and split, '<field>_Mean_<split>' (mean over all
+        the rated memories of the phase, so weighted by the daily counts), '<field>_Max_<split>' and
+        '<field>_Daily_Mean_<split>' (mean of the daily means). No columns if df has no ratings.
+    """
+    edges = phase_edges(dates, pad_days)
+    n_phases = len(edges) - 1
+    phase = assign_phase(to_days(df["Date"]), edges)
+    inside = phase >= 0
+    phase = phase[inside]
+
+    result = pd.DataFrame(index=range(n_phases))
+    for field in RATING_FIELDS:
+        for split in CONTENT_SPLITS:
+            if f"{field}_Rated_{split}" not in df:
+                continue
+            means = df[f"{field}_Mean_{split}"].to_numpy(dtype=float)[inside]
+            rated = df[f"{field}_Rated_{split}"].to_numpy(dtype=float)[inside]
+            maxima = np.full(n_phases, np.nan)
+            np.fmax.at(maxima, phase, df[f"{field}_Max_{split}"].to_numpy(dtype=float)[inside])
+            has_mean = ~np.isnan(means)
+            means = np.where(has_mean, means, 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                result[f"{field}_Mean_{split}"] = np.bincount(
+                    phase, weights=means * rated, minlength=n_phases
+                ) / np.bincount(phase, weights=rated, minlength=n_phases)
+                result[f"{field}_Max_{split}"] = maxima
+                result[f"{field}_Daily_Mean_{split}"] = np.bincount(
+                    phase, weights=means, minlength=n_phases
+                ) / np.bincount(phase, weights=has_mean, minlength=n_phases)
+    return result
+
+
+def aggregate_time_of_day(df: pd.DataFrame, dates: List, pad_days: int = PAD_DAYS) -> pd.DataFrame:
+    """
+    Aggregate the daily counts by '_When' answer code into treatment phases with one 2D bincount.
+
+    Parameters:
+        df (pd.DataFrame): The daily DataFrame with the 'When_<code>' columns of filter_data.daily_counts.
+        dates (List): Treatment dates in ascending order.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+
+    Returns:
+        pd.DataFrame: One row per phase with the 'When_<code>' counts and their 'When_Share_<code>' of the phase's
+        memories with an answer. No columns if df has no 'When_<code>' columns.
+    """
+    edges = phase_edges(dates, pad_days)
+    n_phases = len(edges) - 1
+    if not all(column in df for column in WHEN_COLUMNS):
+        return pd.DataFrame(index=range(n_phases))
+
+    phase = assign_phase(to_days(df["Date"]), edges)
+    inside = phase >= 0
+    values = df[WHEN_COLUMNS].to_numpy(dtype=float)[inside]
+    n_codes = len(WHEN_COLUMNS)
+    bins = (phase[inside, None] * n_codes + np.arange(n_codes)).ravel()
+    counts = np.bincount(bins, weights=values.ravel(), minlength=n_phases * n_codes).reshape(n_phases, n_codes)
+
+    result = pd.DataFrame(counts.astype(int), columns=WHEN_COLUMNS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = counts / counts.sum(axis=1, keepdims=True)
+    for j, column in enumerate(WHEN_COLUMNS):
+        result[column.replace("When_", "When_Share_")] = shares[:, j]
+    return result
+
+
+def aggregate_compliance(
+    df: pd.DataFrame, dates: List, pad_days: int = PAD_DAYS, index: DailyIndex = None
+) -> pd.DataFrame:
+    """
+    Measure how regularly the diary was filled in every treatment phase.
+
+    A day without any response is a missed day, not a zero day: the patient did not report, so its counts
+    are unknown. The phase windows are read off a DailyIndex spanning all the phases.
+
+    Parameters:
+        df (pd.DataFrame): The daily DataFrame with a 'Date' column.
+        dates (List): Treatment dates in ascending order.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+        index (DailyIndex): The index of df over all the phases, built when not given.
+
+    Returns:
+        pd.DataFrame: One row per phase with 'Days Missed' (calendar days without a response), 'Compliance'
+        (the share of the calendar days with a response) and 'Longest Missed Run' (consecutive days missed).
+    """
+    edges = phase_edges(dates, pad_days)
+    if index is None:
+        index = DailyIndex(df, columns=[], start=edges[0], end=edges[-1])
+    starts, ends = edges[:-1], edges[1:]
+    reported = index.days_reported(starts, ends)
+    return pd.DataFrame(
+        {
+            "Days Missed": index.calendar_days(starts, ends) - reported,
+            "Compliance": index.compliance(starts, ends),
+            "Longest Missed Run": index.longest_missed_run(starts, ends),
+        }
+    )
+
+
+def aggregate_outcomes(
+    df: pd.DataFrame, dates: List, count_columns: List = None, pad_days: int = PAD_DAYS
+) -> pd.DataFrame:
+    """
+    Aggregate the daily counts, reporting compliance, ratings and time of day into treatment phases.
+
+    The counts and the compliance are read off one DailyIndex spanning all the phases.
+
+    Parameters:
+        df (pd.DataFrame): The daily DataFrame, as returned by filter_data.daily_counts.
+        dates (List): Treatment dates in ascending order.
+        count_columns (List): The count columns to aggregate. Defaults to COUNT_COLUMNS.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+
+    Returns:
+        pd.DataFrame: The columns of aggregate_phases, aggregate_compliance, aggregate_ratings and
+        aggregate_time_of_day.
+    """
+    edges = phase_edges(dates, pad_days)
+    index = DailyIndex(df, columns=count_columns or COUNT_COLUMNS, start=edges[0], end=edges[-1])
+    return pd.concat(
+        [
+            aggregate_phases(df, dates, count_columns, pad_days, index),
+            aggregate_compliance(df, dates, pad_days, index),
+            aggregate_ratings(df, dates, pad_days),
+            aggregate_time_of_day(df, dates, pad_days),
+        ],
+        axis=1,
+    )
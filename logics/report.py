@@ -0,0 +1,154 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+from PIL import Image
+
+from logics.filter_data import COUNT_COLUMNS
+from logics.utils import use_agg_backend
+from logics.visualizations import draw_graphs, graph_rows
+
+# Resolution of the pages rendered in worker processes
+PAGE_DPI = 100
+# Pages per worker task, so the pool stays balanced and the merged pages come back in order
+PAGES_PER_TASK = 8
+TITLE_INCHES = 0.4
+
+
+def reset_axes(ax: plt.Axes):
+    """Remove the drawn artists, the legend, the color cycle and the fixed limits of an axes, keeping its axis."""
+    for artist in [*ax.patches, *ax.lines, *ax.texts, *ax.images, *ax.collections]:
+        artist.remove()
+    if ax.get_legend():
+        ax.get_legend().remove()
+    ax.set_prop_cycle(None)
+    ax.set_autoscale_on(True)
+    ax.relim()
+
+
+class PageRenderer:
+    """
+    Draws the graph page of one patient after the other on one reused figure per page layout.
+
+    Clearing an axes rebuilds all its ticks, so only the drawn artists are removed between two pages. The
+    layout is computed on the first page of a figure and kept for the next pages.
+
+    Args:
+        count_of_interest (List): The count columns to plot. Defaults to COUNT_COLUMNS.
+    """
+
+    def __init__(self, count_of_interest: List = None):
+        self.count_of_interest = count_of_interest or COUNT_COLUMNS
+        # rows of graphs -> (figure, axes)
+        self.figures = {}
+
+    def draw(self, patient: str, df: pd.DataFrame, treatment_dates: List) -> plt.Figure:
+        """
+        Draw the graphs of a patient over the graphs of the previous patient with the same layout.
+
+        Args:
+            patient (str): The patient id, the title of the page.
+            df (pd.DataFrame): The daily counts of the patient.
+            treatment_dates (List): The treatment dates of the patient.
+
+        Returns:
+            plt.Figure: The figure of the page, valid until the next call.
+        """
+        rows = graph_rows(df)
+        first_page = rows not in self.figures
+        if first_page:
+            self.figures[rows] = plt.subplots(rows, 3, figsize=(15, 5 * rows))
+        fig, axes = self.figures[rows]
+        for ax in axes.flat:
+            reset_axes(ax)
+        draw_graphs(axes, df, treatment_dates, self.count_of_interest)
+        fig.suptitle(f"Patient {patient}")
+        if first_page:
+            # Leave room for the title of the page
+            fig.tight_layout(rect=(0, 0, 1, 1 - TITLE_INCHES / fig.get_figheight()))
+        return fig
+
+    def close(self):
+        for fig, _ in self.figures.values():
+            plt.close(fig)
+        self.figures = {}
+
+
+def render_pages(pages: List[Tuple], count_of_interest: List = None, dpi: int = PAGE_DPI) -> List[bytes]:
+    """
+    Render graph pages to PNG images.
+
+    Args:
+        pages (List[Tuple]): The (patient, daily counts, treatment dates) of every page.
+        count_of_interest (List): The count columns to plot. Defaults to COUNT_COLUMNS.
+        dpi (int): The resolution of the images.
+
+    Returns:
+        List[bytes]: The PNG image of every page.
+    """
+    renderer = PageRenderer(count_of_interest)
+    images = []
+    for patient, df, treatment_dates in pages:
+        buffer = io.BytesIO()
+        renderer.draw(patient, df, treatment_dates).savefig(buffer, format="png", dpi=dpi)
+        images.append(buffer.getvalue())
+    renderer.close()
+    return images
+
+
+def write_report(
+    patients: Dict[str, Tuple[pd.DataFrame, List]],
+    pdf_path: str,
+    count_of_interest: List = None,
+    workers: int = None,
+    dpi: int = PAGE_DPI,
+    raster: bool = False,
+) -> None:
+    """
+    Write the graphs of many patients into one multi-page PDF, one page per patient.
+
+    The pages are drawn on a reused figure and saved as vector pages. With raster, they are instead rendered to
+    PNG images in worker processes and merged in patient order into the PDF, which is faster for many patients
+    but gives pages of dpi resolution.
+
+    Args:
+        patients (Dict[str, Tuple[pd.DataFrame, List]]): The daily counts and treatment dates of every patient,
+            by patient id, in page order.
+        pdf_path (str): The path of the PDF.
+        count_of_interest (List): The count columns to plot. Defaults to COUNT_COLUMNS.
+        workers (int): The number of worker processes of raster, defaults to the number of CPUs.
+        dpi (int): The resolution of the pages rendered by the workers.
+        raster (bool): Whether to render the pages to images in worker processes instead of vector pages.
+
+    Returns:
+        None
+    """
+    pages = [(patient, df, dates) for patient, (df, dates) in patients.items()]
+    workers = workers or os.cpu_count()
+    with PdfPages(pdf_path) as pdf:
+        if not raster or workers == 1 or len(pages) <= 1:
+            renderer = PageRenderer(count_of_interest)
+            for page in pages:
+                pdf.savefig(renderer.draw(*page))
+            renderer.close()
+            return
+
+        fig = plt.figure()
+        with ProcessPoolExecutor(max_workers=workers, initializer=use_agg_backend) as executor:
+            futures = [
+                executor.submit(render_pages, pages[i : i + PAGES_PER_TASK], count_of_interest, dpi)
+                for i in range(0, len(pages), PAGES_PER_TASK)
+            ]
+            for future in futures:
+                for image in future.result():
+                    pixels = np.asarray(Image.open(io.BytesIO(image)).convert("RGB"))
+                    fig.clear()
+                    fig.set_size_inches(pixels.shape[1] / dpi, pixels.shape[0] / dpi)
+                    fig.figimage(pixels)
+                    pdf.savefig(fig, dpi=dpi)
+        plt.close(fig)
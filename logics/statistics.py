@@ -0,0 +1,289 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from logics.filter_data import COUNT_COLUMNS
+from logics.phases import PAD_DAYS, assign_phase, phase_edges, phase_labels, to_days
+
+N_RESAMPLES = 10000
+CONFIDENCE = 0.95
+SEED = 0
+# Resamples drawn at once, so the (resamples x days) arrays stay small
+CHUNK_SIZE = 2000
+EFFECT_COLUMNS = [
+    "N Baseline",
+    "N Phase",
+    "Baseline Mean",
+    "Phase Mean",
+    "Difference",
+    "Effect Size",
+    "CI Low",
+    "CI High",
+    "p-value",
+]
+
+
+def chunks(n_resamples: int) -> Iterator[int]:
+    """Split n_resamples into batches of at most CHUNK_SIZE resamples."""
+    for start in range(0, n_resamples, CHUNK_SIZE):
+        yield min(CHUNK_SIZE, n_resamples - start)
+
+
+def cohens_d(baseline: np.ndarray, phase: np.ndarray) -> float:
+    """The difference of the means in units of the pooled SD, NaN if the SD is not defined or zero."""
+    n_baseline, n_phase = len(baseline), len(phase)
+    if n_baseline < 2 or n_phase < 2:
+        return np.nan
+    pooled = ((n_baseline - 1) * baseline.var(ddof=1) + (n_phase - 1) * phase.var(ddof=1)) / (
+        n_baseline + n_phase - 2
+    )
+    return (phase.mean() - baseline.mean()) / np.sqrt(pooled) if pooled > 0 else np.nan
+
+
+def bootstrap_differences(
+    baseline: np.ndarray, phase: np.ndarray, rng: np.random.Generator, n_resamples: int = N_RESAMPLES
+) -> np.ndarray:
+    """
+    Resample both samples with replacement and compute the difference of the means of every resample.
+
+    Parameters:
+        baseline (np.ndarray): The baseline values.
+        phase (np.ndarray): The values of the compared phase.
+        rng (np.random.Generator): The random generator.
+        n_resamples (int): The number of resamples.
+
+    Returns:
+        np.ndarray: The n_resamples differences (phase mean - baseline mean).
+    """
+    differences = []
+    for size in chunks(n_resamples):
+        baseline_means = baseline[rng.integers(0, len(baseline), (size, len(baseline)))].mean(axis=1)
+        phase_means = phase[rng.integers(0, len(phase), (size, len(phase)))].mean(axis=1)
+        differences.append(phase_means - baseline_means)
+    return np.concatenate(differences)
+
+
+def permutation_test(
+    baseline: np.ndarray, phase: np.ndarray, rng: np.random.Generator, n_resamples: int = N_RESAMPLES
+) -> float:
+    """
+    Two-sided permutation test of the difference of the means.
+
+    Every resample shuffles the pooled values between the two samples, all the resamples of a chunk at once.
+
+    Parameters:
+        baseline (np.ndarray): The baseline values.
+        phase (np.ndarray): The values of the compared phase.
+        rng (np.random.Generator): The random generator.
+        n_resamples (int): The number of permutations.
+
+    Returns:
+        float: The p-value, counting the observed split as one of the permutations.
+    """
+    pooled = np.concatenate([baseline, phase])
+    observed = abs(phase.mean() - baseline.mean())
+    # Differences equal to the observed one up to rounding count as extreme
+    tolerance = 1e-9 * max(1.0, observed)
+    extreme = 0
+    for size in chunks(n_resamples):
+        shuffled = pooled[rng.random((size, len(pooled))).argsort(axis=1)]
+        differences = shuffled[:, len(baseline) :].mean(axis=1) - shuffled[:, : len(baseline)].mean(axis=1)
+        extreme += int((np.abs(differences) >= observed - tolerance).sum())
+    return (extreme + 1) / (n_resamples + 1)
+
+
+def sign_flip_test(differences: np.ndarray, rng: np.random.Generator, n_resamples: int = N_RESAMPLES) -> float:
+    """
+    Two-sided permutation test of paired differences: every resample flips the sign of random pairs.
+
+    Parameters:
+        differences (np.ndarray): The paired differences.
+        rng (np.random.Generator): The random generator.
+        n_resamples (int): The number of permutations.
+
+    Returns:
+        float: The p-value, counting the observed signs as one of the permutations.
+    """
+    observed = abs(differences.mean())
+    tolerance = 1e-9 * max(1.0, observed)
+    extreme = 0
+    for size in chunks(n_resamples):
+        signs = rng.choice([-1.0, 1.0], (size, len(differences)))
+        extreme += int((np.abs((signs * differences).mean(axis=1)) >= observed - tolerance).sum())
+    return (extreme + 1) / (n_resamples + 1)
+
+
+def compare(
+    baseline: np.ndarray,
+    phase: np.ndarray,
+    rng: np.random.Generator,
+    n_resamples: int = N_RESAMPLES,
+    confidence: float = CONFIDENCE,
+    paired: bool = False,
+) -> dict:
+    """
+    Compare the values of a phase to the baseline values.
+
+    Unpaired samples (the days of one patient) get Cohen's d, a bootstrap interval resampling both samples and a
+    permutation test. Paired samples (one value per patient) get Cohen's dz of the differences, a bootstrap
+    interval resampling the patients and a sign-flip test.
+
+    Parameters:
+        baseline (np.ndarray): The baseline values.
+        phase (np.ndarray): The values of the compared phase, in the order of baseline if paired.
+        rng (np.random.Generator): The random generator.
+        n_resamples (int): The number of bootstrap resamples and of permutations.
+        confidence (float): The level of the bootstrap interval.
+        paired (bool): Whether the samples are paired.
+
+    Returns:
+        dict: The EFFECT_COLUMNS of the comparison, NaN where a sample is too small.
+    """
+    result = dict.fromkeys(EFFECT_COLUMNS, np.nan)
+    result.update({"N Baseline": len(baseline), "N Phase": len(phase)})
+    if not len(baseline) or not len(phase):
+        return result
+    result.update(
+        {"Baseline Mean": baseline.mean(), "Phase Mean": phase.mean(), "Difference": phase.mean() - baseline.mean()}
+    )
+
+    if paired:
+        differences = phase - baseline
+        sd = differences.std(ddof=1) if len(differences) > 1 else np.nan
+        result["Effect Size"] = differences.mean() / sd if sd > 0 else np.nan
+        resampled = np.concatenate(
+            [
+                differences[rng.integers(0, len(differences), (size, len(differences)))].mean(axis=1)
+                for size in chunks(n_resamples)
+            ]
+        )
+        result["p-value"] = sign_flip_test(differences, rng, n_resamples)
+    else:
+        result["Effect Size"] = cohens_d(baseline, phase)
+        resampled = bootstrap_differences(baseline, phase, rng, n_resamples)
+        result["p-value"] = permutation_test(baseline, phase, rng, n_resamples)
+
+    alpha = (1 - confidence) / 2
+    result["CI Low"], result["CI High"] = np.quantile(resampled, [alpha, 1 - alpha])
+    return result
+
+
+def patient_effects(
+    df: pd.DataFrame,
+    dates: List,
+    count_columns: List = None,
+    n_resamples: int = N_RESAMPLES,
+    confidence: float = CONFIDENCE,
+    seed=SEED,
+    pad_days: int = PAD_DAYS,
+) -> pd.DataFrame:
+    """
+    Compare the daily counts of every phase of a patient to its baseline week.
+
+    Only the days reported are compared: a day without a response has no count.
+
+    Parameters:
+        df (pd.DataFrame): The daily DataFrame with a 'Date' column and the count columns.
+        dates (List): Treatment dates in ascending order.
+        count_columns (List): The count columns to compare. Defaults to COUNT_COLUMNS.
+        n_resamples (int): The number of bootstrap resamples and of permutations.
+        confidence (float): The level of the bootstrap intervals.
+        seed: The seed of the random generator (an int or a np.random.SeedSequence), None for a random one.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+
+    Returns:
+        pd.DataFrame: One row per count column and phase after the baseline with 'Count', 'Phase' and the
+        EFFECT_COLUMNS.
+    """
+    count_columns = count_columns or COUNT_COLUMNS
+    rng = np.random.default_rng(seed)
+    phase = assign_phase(to_days(df["Date"]), phase_edges(dates, pad_days))
+    labels = phase_labels(len(dates))
+
+    rows = []
+    for column in count_columns:
+        values = df[column].to_numpy(dtype=float)
+        for i, label in enumerate(labels[1:], 1):
+            comparison = compare(values[phase == 0], values[phase == i], rng, n_resamples, confidence)
+            rows.append({"Count": column, "Phase": label, **comparison})
+    return pd.DataFrame(rows, columns=["Count", "Phase"] + EFFECT_COLUMNS)
+
+
+def cohort_patient_effects(
+    daily_frames: Dict[str, pd.DataFrame],
+    sessions: Dict[str, List],
+    count_columns: List = None,
+    n_resamples: int = N_RESAMPLES,
+    confidence: float = CONFIDENCE,
+    seed=SEED,
+    workers: int = None,
+) -> pd.DataFrame:
+    """
+    Run patient_effects for every patient of a cohort on a process pool.
+
+    Every patient gets its own random stream spawned from the seed, so the results do not depend on the
+    number of workers.
+
+    Parameters:
+        daily_frames (Dict[str, pd.DataFrame]): The daily counts of every patient, by patient id.
+        sessions (Dict[str, List]): The treatment dates of every patient, in ascending order.
+        count_columns (List): The count columns to compare. Defaults to COUNT_COLUMNS.
+        n_resamples (int): The number of bootstrap resamples and of permutations.
+        confidence (float): The level of the bootstrap intervals.
+        seed: The seed of the random streams, None for random ones.
+        workers (int): The number of worker processes, defaults to the number of CPUs.
+
+    Returns:
+        pd.DataFrame: The rows of patient_effects of every patient with a leading 'Patient' column.
+    """
+    patients = list(daily_frames)
+    seeds = np.random.SeedSequence(seed).spawn(len(patients))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                patient_effects, daily_frames[patient], sessions[patient], count_columns, n_resamples, confidence, s
+            )
+            for patient, s in zip(patients, seeds)
+        ]
+        frames = {patient: future.result() for patient, future in zip(patients, futures)}
+    return pd.concat(frames, names=["Patient", None]).reset_index(0).reset_index(drop=True)
+
+
+def cohort_effects(
+    patient_phases: pd.DataFrame,
+    count_columns: List = None,
+    n_resamples: int = N_RESAMPLES,
+    confidence: float = CONFIDENCE,
+    seed=SEED,
+) -> pd.DataFrame:
+    """
+    Compare the mean daily counts of every phase to the baseline across the patients of a cohort.
+
+    The comparison is paired: every patient reporting in both the baseline and the phase contributes the
+    difference of its two means (over the days reported).
+
+    Parameters:
+        patient_phases (pd.DataFrame): The per patient phase aggregates, as returned by cohort.cohort_phases.
+        count_columns (List): The count columns to compare. Defaults to COUNT_COLUMNS.
+        n_resamples (int): The number of bootstrap resamples and of permutations.
+        confidence (float): The level of the bootstrap intervals.
+        seed: The seed of the random generator, None for a random one.
+
+    Returns:
+        pd.DataFrame: One row per count column and phase after the baseline with 'Count', 'Phase' and the
+        EFFECT_COLUMNS, the N columns being numbers of patients.
+    """
+    count_columns = count_columns or COUNT_COLUMNS
+    rng = np.random.default_rng(seed)
+    labels = list(dict.fromkeys(patient_phases["Phase"]))
+
+    rows = []
+    for column in count_columns:
+        means = patient_phases.pivot(index="Patient", columns="Phase", values=f"Mean_{column}")
+        for label in labels[1:]:
+            pairs = means[[labels[0], label]].dropna().to_numpy()
+            comparison = compare(pairs[:, 0], pairs[:, 1], rng, n_resamples, confidence, paired=True)
+            rows.append({"Count": column, "Phase": label, **comparison})
+    return pd.DataFrame(rows, columns=["Count", "Phase"] + EFFECT_COLUMNS)
@@ -0,0 +1,242 @@
+import sqlite3
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from logics.filter_data import COUNT_DTYPE, EVENT_FIELDS, RATING_DTYPE, WHEN_COLUMNS, rating_columns
+from logics.phases import COUNT_COLUMNS, PAD_DAYS, phase_edges, phase_labels
+
+EVENT_COLUMNS = ["Response", "Idea"] + EVENT_FIELDS
+# Every column of the daily counts after 'Date', in the order of filter_data.daily_counts
+DAILY_COLUMNS = ["Count_Total", "Count_Target", "Count_Nontarget"] + rating_columns() + WHEN_COLUMNS
+# The counts of memories, stored as integers; the rating means and maxima are NULL on days without ratings
+INTEGER_COLUMNS = COUNT_COLUMNS + rating_columns(("Rated",)) + WHEN_COLUMNS
+
+
+def column_definition(column: str) -> str:
+    """The SQL definition of a column of the daily table."""
+    return f'"{column}" INTEGER NOT NULL DEFAULT 0' if column in INTEGER_COLUMNS else f'"{column}" REAL'
+
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS events (
+    Patient TEXT NOT NULL,
+    Date TEXT NOT NULL,
+    {", ".join(f'"{column}" REAL' for column in EVENT_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS events_patient_date ON events (Patient, Date);
+CREATE TABLE IF NOT EXISTS daily (
+    Patient TEXT NOT NULL,
+    Date TEXT NOT NULL,
+    {", ".join(column_definition(column) for column in DAILY_COLUMNS)},
+    PRIMARY KEY (Patient, Date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sessions (
+    Patient TEXT NOT NULL,
+    Session INTEGER NOT NULL,
+    Date TEXT NOT NULL,
+    PRIMARY KEY (Patient, Session)
+) WITHOUT ROWID;
+"""
+# Writers of other processes wait for the lock up to this long
+TIMEOUT_SECONDS = 60
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """
+    Open the event store, creating its tables and indexes if needed.
+
+    Parameters:
+        db_path (str): The path of the SQLite database file.
+
+    Returns:
+        sqlite3.Connection: The connection, in WAL mode so readers do not block the batch writers.
+    """
+    connection = sqlite3.connect(db_path, timeout=TIMEOUT_SECONDS)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    # Stores created before the ratings and time of day columns get them added
+    existing = {row[1] for row in connection.execute("PRAGMA table_info(daily)")}
+    with connection:
+        for column in DAILY_COLUMNS:
+            if column not in existing:
+                connection.execute(f"ALTER TABLE daily ADD COLUMN {column_definition(column)}")
+    return connection
+
+
+def iso_dates(dates) -> np.ndarray:
+    """Format a column of dates as 'YYYY-MM-DD' strings, the way they are stored."""
+    return pd.to_datetime(pd.Series(dates)).dt.strftime("%Y-%m-%d").to_numpy()
+
+
+def put_patient(
+    connection: sqlite3.Connection,
+    patient: str,
+    daily: pd.DataFrame,
+    events: pd.DataFrame = None,
+    treatment_dates: List = None,
+):
+    """
+    Replace the stored rows of a patient in one transaction.
+
+    Parameters:
+        connection (sqlite3.Connection): The store.
+        patient (str): The patient id.
+        daily (pd.DataFrame): The daily counts, with all the columns of filter_data.daily_counts.
+        events (pd.DataFrame): The memory event table, None to keep the stored events.
+        treatment_dates (List): The treatment dates in ascending order, None to keep the stored sessions.
+    """
+    with connection:
+        connection.execute("DELETE FROM daily WHERE Patient = ?", (patient,))
+        values = daily[DAILY_COLUMNS].astype(float)
+        connection.executemany(
+            f"INSERT INTO daily (Patient, Date, {', '.join(DAILY_COLUMNS)}) "
+            f"VALUES (?, ?{', ?' * len(DAILY_COLUMNS)})",
+            zip(
+                [patient] * len(daily),
+                iso_dates(daily["Date"]),
+                *(
+                    values[column].astype(int).tolist()
+                    if column in INTEGER_COLUMNS
+                    else values[column].where(values[column].notna(), None).tolist()
+                    for column in DAILY_COLUMNS
+                ),
+            ),
+        )
+        if events is not None:
+            connection.execute("DELETE FROM events WHERE Patient = ?", (patient,))
+            values = events[EVENT_COLUMNS].astype(float)
+            connection.executemany(
+                f"INSERT INTO events VALUES (?, ?{', ?' * len(EVENT_COLUMNS)})",
+                zip(
+                    [patient] * len(events),
+                    iso_dates(events["Date"]),
+                    *(values[column].where(values[column].notna(), None).tolist() for column in EVENT_COLUMNS),
+                ),
+            )
+        if treatment_dates is not None:
+            connection.execute("DELETE FROM sessions WHERE Patient = ?", (patient,))
+            connection.executemany(
+                "INSERT INTO sessions VALUES (?, ?, ?)",
+                [(patient, i, date) for i, date in enumerate(iso_dates(treatment_dates), 1)],
+            )
+
+
+def read_daily(connection: sqlite3.Connection, patient: str, start=None, end=None) -> pd.DataFrame:
+    """
+    Read the daily counts of a patient, optionally in [start, end), with an index range scan.
+
+    Parameters:
+        connection (sqlite3.Connection): The store.
+        patient (str): The patient id.
+        start: The first day to read, None for no bound.
+        end: The day after the last day to read, None for no bound.
+
+    Returns:
+        pd.DataFrame: The daily counts with 'Date' as datetime64, as returned by filter_data.daily_counts.
+    """
+    start = iso_dates([start])[0] if start is not None else "0000-00-00"
+    end = iso_dates([end])[0] if end is not None else "9999-99-99"
+    df = pd.read_sql_query(
+        f"SELECT Date, {', '.join(DAILY_COLUMNS)} FROM daily "
+        f"WHERE Patient = ? AND Date >= ? AND Date < ? ORDER BY Date",
+        connection,
+        params=(patient, start, end),
+    )
+    df["Date"] = pd.to_datetime(df["Date"])
+    dtypes = dict.fromkeys(INTEGER_COLUMNS, COUNT_DTYPE)
+    dtypes.update(dict.fromkeys(rating_columns(("Max",)), RATING_DTYPE))
+    dtypes.update(dict.fromkeys(rating_columns(("Mean",)), "float64"))
+    return df.astype(dtypes)
+
+
+def read_sessions(connection: sqlite3.Connection) -> Dict[str, List]:
+    """
+    Read the stored treatment dates of every patient.
+
+    Parameters:
+        connection (sqlite3.Connection): The store.
+
+    Returns:
+        Dict[str, List]: The treatment dates (datetime.date) of every patient, in session order.
+    """
+    sessions = {}
+    for patient, date in connection.execute("SELECT Patient, Date FROM sessions ORDER BY Patient, Session"):
+        sessions.setdefault(patient, []).append(pd.Timestamp(date).date())
+    return sessions
+
+
+def query_phases(
+    connection: sqlite3.Connection, sessions: Dict[str, List], pad_days: int = PAD_DAYS
+) -> pd.DataFrame:
+    """
+    Aggregate the stored daily counts of the given patients into their treatment phases in one SQL query.
+
+    The phase boundaries are loaded into a temporary table and joined to the daily counts on the
+    (Patient, Date) key, so every phase is an index range scan.
+
+    Parameters:
+        connection (sqlite3.Connection): The store.
+        sessions (Dict[str, List]): The treatment dates of every patient, in ascending order.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+
+    Returns:
+        pd.DataFrame: One row per patient and phase with 'Patient' and the columns of phases.aggregate_phases.
+    """
+    rows = []
+    for patient, dates in sessions.items():
+        edges = phase_edges(dates, pad_days)
+        labels = phase_labels(len(dates))
+        starts, ends = iso_dates(edges[:-1]), iso_dates(edges[1:])
+        rows += [(patient, i, labels[i], starts[i], ends[i]) for i in range(len(labels))]
+
+    sums = ", ".join(f"COALESCE(SUM(d.{column}), 0) AS Sum_{column}" for column in COUNT_COLUMNS)
+    zeros = ", ".join(f"COALESCE(SUM(d.{column} = 0), 0) AS Zeros_{column}" for column in COUNT_COLUMNS)
+    with connection:
+        connection.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS phases "
+            "(Patient TEXT, Number INTEGER, Phase TEXT, Start TEXT, End TEXT)"
+        )
+        connection.execute("DELETE FROM phases")
+        connection.executemany("INSERT INTO phases VALUES (?, ?, ?, ?, ?)", rows)
+        result = pd.read_sql_query(
+            f"""
+            SELECT p.Patient, p.Phase, p.Start AS "Start Date", p.End AS "End Date",
+                COUNT(d.Date) AS "Days Reported", {sums}, {zeros}
+            FROM phases p LEFT JOIN daily d
+                ON d.Patient = p.Patient AND d.Date >= p.Start AND d.Date < p.End
+            GROUP BY p.Patient, p.Number
+            ORDER BY p.rowid
+            """,
+            connection,
+        )
+
+    result["Start Date"] = pd.to_datetime(result["Start Date"])
+    result["End Date"] = pd.to_datetime(result["End Date"])
+    result.insert(4, "Gap Between Sessions", (result["End Date"] - result["Start Date"]).dt.days)
+    reported = result["Days Reported"]
+    columns = ["Patient", "Phase", "Start Date", "End Date", "Gap Between Sessions", "Days Reported"]
+    for column in COUNT_COLUMNS:
+        result[f"Average_{column}"] = result[f"Sum_{column}"] / result["Gap Between Sessions"]
+        result[f"Mean_{column}"] = (result[f"Sum_{column}"] / reported).where(reported > 0)
+        columns += [f"Sum_{column}", f"Average_{column}", f"Zeros_{column}", f"Mean_{column}"]
+    return result[columns]
+
+
+def patient_phases(
+    connection: sqlite3.Connection, patient: str, treatment_dates: List, pad_days: int = PAD_DAYS
+) -> pd.DataFrame:
+    """
+    Aggregate the stored daily counts of one patient into its treatment phases.
+
+    Parameters:
+        connection (sqlite3.Connection): The store.
+        patient (str): The patient id.
+        treatment_dates (List): Treatment dates in ascending order.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+
+    Returns:
+        pd.DataFrame: The phase aggregates, as returned by phases.aggregate_phases.
+    """
+    return query_phases(connection, {patient: treatment_dates}, pad_days).drop(columns="Patient")
@@ -0,0 +1,179 @@
+import cProfile
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_current: ContextVar = ContextVar("trace", default=None)
+
+
+def peak_rss_mb() -> float:
+    """
+    Get the peak resident set size of the process so far, over its whole lifetime.
+
+    Returns:
+        float: The peak RSS in megabytes, None where the platform does not report it.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def rss_growth_mb(start_peak: float) -> float:
+    """
+    Get how much the peak resident set size of the process grew since an earlier peak.
+
+    Parameters:
+        start_peak (float): The peak RSS returned by peak_rss_mb at the start of a block.
+
+    Returns:
+        float: The growth in megabytes, 0 when the block stayed under the earlier peak, None where the platform
+        does not report it.
+    """
+    if start_peak is None:
+        return None
+    return round(peak_rss_mb() - start_peak, 1)
+
+
+def suffixed_path(path: str, suffix) -> str:
+    """Insert a suffix before the extension of a path, e.g. 'profile-load.prof' -> 'profile-load-2.prof'."""
+    root, extension = os.path.splitext(path)
+    return f"{root}-{suffix}{extension}"
+
+
+@contextmanager
+def recording(trace_path: str = None, profile_stage: str = None, profile_path: str = None):
+    """
+    Record the stages run inside the block and optionally write them as a JSON trace.
+
+    Stages are recorded per context, so concurrent runs on other threads or processes keep their own trace.
+
+    Args:
+        trace_path (str): The path of the JSON trace, None to only return it.
+        profile_stage (str): The name of a stage to profile with cProfile.
+        profile_path (str): The path of the cProfile dumps of profile_stage. Every run of the stage gets its own
+            dump, numbered before the extension (see suffixed_path) and listed in trace["profiles"].
+
+    Yields:
+        dict: The trace, filled with the stages once the block ends. 'process_peak_rss_mb' is the peak RSS of
+        the process over its whole lifetime and 'peak_rss_growth_mb' how much it grew during the block.
+    """
+    trace = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "profile_stage": profile_stage,
+        "profile_path": profile_path,
+        "profiles": [],
+        "stages": [],
+    }
+    token = _current.set(trace)
+    wall, cpu, rss = time.perf_counter(), time.process_time(), peak_rss_mb()
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace["wall_seconds"] = round(time.perf_counter() - wall, 4)
+        trace["cpu_seconds"] = round(time.process_time() - cpu, 4)
+        trace["process_peak_rss_mb"] = peak_rss_mb()
+        trace["peak_rss_growth_mb"] = rss_growth_mb(rss)
+        if trace_path:
+            with open(trace_path, "w") as file:
+                json.dump(trace, file, indent=2)
+
+
+@contextmanager
+def stage(name: str, rows: int = None):
+    """
+    Measure the wall time, CPU time and peak RSS of a pipeline stage. A no-op outside of recording.
+
+    The process only reports its lifetime peak RSS, so the record holds that peak ('process_peak_rss_mb') and how
+    much the stage raised it ('peak_rss_growth_mb'), which is 0 for a stage staying under an earlier peak.
+
+    Args:
+        name (str): The name of the stage.
+        rows (int): The number of input rows of the stage. The block may set record["rows"] instead.
+
+    Yields:
+        dict: The record of the stage.
+    """
+    trace = _current.get()
+    record = {"stage": name, "rows": rows}
+    if trace is None:
+        yield record
+        return
+
+    profiler = cProfile.Profile() if trace["profile_stage"] == name else None
+    wall, cpu, rss = time.perf_counter(), time.process_time(), peak_rss_mb()
+    if profiler:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler:
+            profiler.disable()
+            profile_path = suffixed_path(trace["profile_path"], len(trace["profiles"]) + 1)
+            profiler.dump_stats(profile_path)
+            trace["profiles"].append(profile_path)
+        record["wall_seconds"] = round(time.perf_counter() - wall, 4)
+        record["cpu_seconds"] = round(time.process_time() - cpu, 4)
+        record["process_peak_rss_mb"] = peak_rss_mb()
+        record["peak_rss_growth_mb"] = rss_growth_mb(rss)
+        trace["stages"].append(record)
+
+
+def settings() -> Tuple:
+    """
+    Get the profiling settings of the current trace, to hand them over to a worker process.
+
+    Returns:
+        Tuple: (profile_stage, profile_path), None when nothing is recorded.
+    """
+    trace = _current.get()
+    return None if trace is None else (trace["profile_stage"], trace["profile_path"])
+
+
+def call_in_stage(trace_settings: Tuple, name: str, func: Callable, *args):
+    """
+    Run a function as a stage in a worker process, where the parent's trace is not visible.
+
+    The profile dumps of the worker are named after the stage, so they do not overwrite the dumps of the parent
+    or of the other workers.
+
+    Args:
+        trace_settings (Tuple): The settings of the parent's trace as returned by settings(), None to not record.
+        name (str): The name of the stage.
+        func (Callable): The function to run.
+        *args: The arguments of the function.
+
+    Returns:
+        Tuple: The result of the function and the list of the recorded stages.
+    """
+    if trace_settings is None:
+        return func(*args), []
+    profile_stage, profile_path = trace_settings
+    with recording(None, profile_stage, profile_path and suffixed_path(profile_path, name)) as trace:
+        with stage(name):
+            result = func(*args)
+    return result, trace["stages"]
+
+
+def extend(stages: List):
+    """
+    Add stages recorded in a worker process to the current trace.
+
+    Args:
+        stages (List): The stages returned by call_in_stage.
+    """
+    trace = _current.get()
+    if trace is not None:
+        trace["stages"].extend(stages)
@@ -0,0 +1,188 @@
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from logics.daily_index import DailyIndex, to_days
+from logics.filter_data import COUNT_COLUMNS
+from logics.phases import PAD_DAYS, assign_phase, phase_edges, phase_labels
+
+TREND_COLUMNS = ["Count", "Slope", "Intercept", "Days"]
+WINDOW_DAYS = 7
+HALFLIFE_DAYS = 7
+
+
+def fit_lines(
+    x: np.ndarray, y: np.ndarray, groups: np.ndarray = None, n_groups: int = 1
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fit the least squares line y = intercept + slope * x of every column of y in every group at once.
+
+    The lines come in closed form from per group sums of x, y, x * x and x * y, every sum being one bincount
+    over the (group, column) pairs. Missing values of a column are left out of its line only. A line over a
+    single x has a zero slope and the mean as intercept.
+
+    Parameters:
+        x (np.ndarray): The x of every row, e.g. day offsets.
+        y (np.ndarray): The values, one column per line, NaN when missing.
+        groups (np.ndarray): The group index of every row, in [0, n_groups), negative to leave the row out.
+            All rows are one group when not given.
+        n_groups (int): The number of groups.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The slopes, the intercepts and the number of values of every
+        line, each of shape (n_groups, columns). Lines without values have NaN slope and intercept.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float).reshape(len(x), -1)
+    groups = np.zeros(len(x), dtype=int) if groups is None else np.asarray(groups)
+    keep = groups >= 0
+    x, y, groups = x[keep], y[keep], groups[keep]
+
+    n_columns = y.shape[1]
+    index = (groups[:, None] * n_columns + np.arange(n_columns)).ravel()
+    valid = ~np.isnan(y)
+    xs = np.where(valid, x[:, None], 0.0)
+    ys = np.where(valid, y, 0.0)
+
+    def sums(values: np.ndarray) -> np.ndarray:
+        totals = np.bincount(index, weights=values.ravel(), minlength=n_groups * n_columns)
+        return totals.reshape(n_groups, n_columns)
+
+    n, sx, sy, sxx, sxy = sums(valid.astype(float)), sums(xs), sums(ys), sums(xs * xs), sums(xs * ys)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread = n * sxx - sx * sx
+        slopes = np.where(spread > 0, (n * sxy - sx * sy) / spread, 0.0)
+        slopes[n == 0] = np.nan
+        intercepts = (sy - slopes * sx) / n
+    return slopes, intercepts, n.astype(int)
+
+
+def day_offsets(dates) -> np.ndarray:
+    """The days since the first of the dates, so days without a response keep their place."""
+    days = to_days(dates)
+    return (days - days.min()).astype(int) if len(days) else np.zeros(0, dtype=int)
+
+
+def trend_table(
+    slopes: np.ndarray, intercepts: np.ndarray, n: np.ndarray, columns: List, by: str = None, labels: List = None
+) -> pd.DataFrame:
+    """Lay the lines of fit_lines out as one row per group and column."""
+    table = pd.DataFrame(
+        {
+            "Count": np.tile(columns, len(slopes)),
+            "Slope": slopes.ravel(),
+            "Intercept": intercepts.ravel(),
+            "Days": n.ravel(),
+        }
+    )
+    if by:
+        table.insert(0, by, np.repeat(labels, len(columns)))
+    return table
+
+
+def fit_trends(df: pd.DataFrame, columns: List = None) -> pd.DataFrame:
+    """
+    Fit the trend of every count of a patient over its day offsets.
+
+    Parameters:
+        df (pd.DataFrame): The daily DataFrame with a 'Date' column and the count columns.
+        columns (List): The columns to fit. Defaults to COUNT_COLUMNS.
+
+    Returns:
+        pd.DataFrame: One row per column with the TREND_COLUMNS, the slope per day and the intercept at the first
+        day.
+    """
+    columns = COUNT_COLUMNS if columns is None else columns
+    return trend_table(*fit_lines(day_offsets(df["Date"]), df[columns].to_numpy(dtype=float)), columns)
+
+
+def phase_trends(df: pd.DataFrame, dates: List, columns: List = None, pad_days: int = PAD_DAYS) -> pd.DataFrame:
+    """
+    Fit the trend of every count over the whole diary and, segmented, within every treatment phase.
+
+    All the lines share the day offsets of the whole diary, so every intercept is at the first day.
+
+    Parameters:
+        df (pd.DataFrame): The daily DataFrame with a 'Date' column and the count columns.
+        dates (List): Treatment dates in ascending order.
+        columns (List): The columns to fit. Defaults to COUNT_COLUMNS.
+        pad_days (int): Length in days of the baseline week and the post-treatment week.
+
+    Returns:
+        pd.DataFrame: 'Phase' ('All', then the phase labels) and the TREND_COLUMNS, one row per phase and column.
+    """
+    columns = COUNT_COLUMNS if columns is None else columns
+    labels = phase_labels(len(dates))
+    x = day_offsets(df["Date"])
+    y = df[columns].to_numpy(dtype=float)
+    phase = assign_phase(to_days(df["Date"]), phase_edges(dates, pad_days))
+    return pd.concat(
+        [
+            trend_table(*fit_lines(x, y), columns, "Phase", ["All"]),
+            trend_table(*fit_lines(x, y, phase, len(labels)), columns, "Phase", labels),
+        ],
+        ignore_index=True,
+    )
+
+
+def cohort_trends(cohort_df: pd.DataFrame, columns: List = None) -> pd.DataFrame:
+    """
+    Fit the trend of every count of every patient of a cohort at once.
+
+    Parameters:
+        cohort_df (pd.DataFrame): The stacked daily counts, as returned by cohort.build_cohort.
+        columns (List): The columns to fit. Defaults to COUNT_COLUMNS.
+
+    Returns:
+        pd.DataFrame: 'Patient' and the TREND_COLUMNS, one row per patient and column, every intercept at the
+        first day of its patient.
+    """
+    columns = COUNT_COLUMNS if columns is None else columns
+    patients = pd.Categorical(cohort_df["Patient"])
+    codes = patients.codes.astype(int)
+    days = to_days(cohort_df["Date"]).astype(int)
+    first = np.full(len(patients.categories), np.iinfo(int).max)
+    np.minimum.at(first, codes, days)
+    lines = fit_lines(days - first[codes], cohort_df[columns].to_numpy(dtype=float), codes, len(first))
+    return trend_table(*lines, columns, "Patient", list(patients.categories))
+
+
+def rolling_mean(df: pd.DataFrame, columns: List = None, window: int = WINDOW_DAYS) -> pd.DataFrame:
+    """
+    Smooth the counts with a trailing mean over the reported days of the last window calendar days.
+
+    Parameters:
+        df (pd.DataFrame): The daily DataFrame with a 'Date' column and the count columns.
+        columns (List): The columns to smooth. Defaults to COUNT_COLUMNS.
+        window (int): The length of the window in calendar days.
+
+    Returns:
+        pd.DataFrame: 'Date' and the smoothed columns, one row per reported day.
+    """
+    columns = COUNT_COLUMNS if columns is None else columns
+    index = DailyIndex(df, columns)
+    ends = to_days(df["Date"]) + np.timedelta64(1, "D")
+    smoothed = pd.DataFrame({"Date": df["Date"].to_numpy()})
+    for column in columns:
+        smoothed[column] = index.mean(column, ends - np.timedelta64(window, "D"), ends)
+    return smoothed
+
+
+def ewma(df: pd.DataFrame, columns: List = None, halflife: float = HALFLIFE_DAYS) -> pd.DataFrame:
+    """
+    Smooth the counts with an exponentially weighted mean whose weights halve every halflife calendar days.
+
+    Parameters:
+        df (pd.DataFrame): The daily DataFrame with a 'Date' column and the count columns.
+        columns (List): The columns to smooth. Defaults to COUNT_COLUMNS.
+        halflife (float): The half-life of the weights in days.
+
+    Returns:
+        pd.DataFrame: 'Date' and the smoothed columns, one row per reported day.
+    """
+    columns = COUNT_COLUMNS if columns is None else columns
+    times = pd.to_datetime(df["Date"])
+    smoothed = df[columns].astype(float).ewm(halflife=pd.Timedelta(days=halflife), times=times).mean()
+    smoothed.insert(0, "Date", df["Date"].to_numpy())
+    return smoothed.reset_index(drop=True)
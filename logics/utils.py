@@ -1,3 +1,5 @@
+import os
+import sys
 from uuid import uuid4
 
 
@@ -10,3 +12,16 @@ def get_unique():
 
     """
     return str(uuid4()).split("-")[-1]
+
+
+def use_agg_backend():
+    """
+    Select the non-interactive matplotlib backend, without importing matplotlib if it is not loaded yet.
+
+    A process that never draws then never pays for the matplotlib import; one that does picks the backend up
+    from the environment when it first imports matplotlib.
+    """
+    if "matplotlib" in sys.modules:
+        sys.modules["matplotlib"].use("Agg")
+    else:
+        os.environ["MPLBACKEND"] = "Agg"
@@ -1,7 +1,22 @@
 from datetime import datetime
 from typing import List
 
-from errors import DateBeforeDataDates
+import numpy as np
+import pandas as pd
+
+from errors import DateBeforeDataDates, DatesNotInOrder, InvalidExport
+from logics.filter_data import WHEN_CODES
+
+# The valid answer codes of every idea field. Distress is a 0-10 scale that Qualtrics may export as codes 1-11.
+EXPORT_DOMAINS = {
+    "Type": [1, 2, 3],
+    "Content": [1, 2],
+    "When": WHEN_CODES,
+    "Distress": list(range(0, 12)),
+    "Vividness": [1, 2, 3, 4, 5],
+}
+REPORT_COLUMNS = ["Check", "Column", "Severity", "Rows", "Example Responses"]
+EXAMPLE_ROWS = 5
 
 
 def validate_range(dates: List, smallest_date: datetime.date):
@@ -10,7 +25,7 @@ def validate_range(dates: List, smallest_date: datetime.date):
 
     Parameters:
         dates (List[datetime.date]): A list of datetime.date objects to be validated - dates of the treatment.
-        smallest_date (datetime.date): The reference date to compare against.
+        smallest_date (datetime.date): The reference date to compare against, a datetime.date or a timestamp.
 
     Raises:
         DateBeforeDataDates: If any date in the 'dates' list is not after 'smallest_date'.
@@ -18,5 +33,128 @@ def validate_range(dates: List, smallest_date: datetime.date):
     Returns:
         None: This function does not return anything. It raises an exception if the validation fails.
     """
-    if not all(date > smallest_date for date in dates):
+    smallest_date = pd.Timestamp(smallest_date)
+    if not all(pd.Timestamp(date) > smallest_date for date in dates):
         raise DateBeforeDataDates
+
+
+def validate_order(dates: List):
+    """
+    Validate that the dates are in strictly ascending order.
+
+    Parameters:
+        dates (List[datetime.date]): A list of datetime.date objects to be validated - dates of the treatment.
+
+    Raises:
+        DatesNotInOrder: If a date is not strictly after the date before it.
+
+    Returns:
+        None: This function does not return anything. It raises an exception if the validation fails.
+    """
+    if not all(dates[i] < dates[i + 1] for i in range(len(dates) - 1)):
+        raise DatesNotInOrder
+
+
+def to_numbers(block: pd.DataFrame) -> np.ndarray:
+    """
+    Convert a block of columns to a float array, unparseable values becoming NaN.
+
+    Parameters:
+        block (pd.DataFrame): The columns to convert.
+
+    Returns:
+        np.ndarray: The values as a 2D float array.
+    """
+    if all(pd.api.types.is_numeric_dtype(dtype) for dtype in block.dtypes):
+        return block.to_numpy(dtype=float)
+    return block.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+
+def check_export(df: pd.DataFrame, first_response: int = 1) -> pd.DataFrame:
+    """
+    Check the schema, types, value domains and row consistency of a loaded export in one vectorized pass.
+
+    Parameters:
+        df (pd.DataFrame): The export as parsed, before any type conversion, without the metadata rows.
+        first_response (int): The number of the first response of df, for chunks of a larger export.
+
+    Returns:
+        pd.DataFrame: One row per failed check with the 'Check', the 'Column' it failed on, its 'Severity'
+        ('error' or 'warning'), the number of 'Rows' failing it and the numbers of the first failing responses.
+    """
+    responses = np.arange(len(df)) + first_response
+    issues = []
+
+    def add(check: str, column: str, failed: np.ndarray, severity: str = "error"):
+        if failed.any():
+            examples = ", ".join(str(number) for number in responses[failed][:EXAMPLE_ROWS])
+            issues.append([check, column, severity, int(failed.sum()), examples])
+
+    dates = pd.to_datetime(df["StartDate"], errors="coerce", format="ISO8601")
+    add("unparseable date", "StartDate", dates.isna().to_numpy())
+    add("dates not in order", "StartDate", (dates.diff() < pd.Timedelta(0)).to_numpy(), "warning")
+
+    raw_amount = df["Amount"].to_numpy()
+    amount = to_numbers(df[["Amount"]])[:, 0]
+    add("not a number", "Amount", np.isnan(amount) & pd.notna(raw_amount))
+    add("invalid amount", "Amount", (amount < 0) | (amount % 1 > 0))
+
+    fields = df.columns.astype(str).str.extract(r"^(\d+)_(\w+)$").dropna()
+    ideas = sorted(fields[0].astype(int).unique())
+    values = {}
+    for field, domain in EXPORT_DOMAINS.items():
+        columns = [f"{i}_{field}" for i in ideas]
+        present = [column for column in columns if column in df.columns]
+        if not present:
+            continue
+        if field in ["Type", "Content"]:
+            for column in sorted(set(columns) - set(present)):
+                add("missing idea column", column, np.ones(len(df), bool))
+        block = df.reindex(columns=columns)
+        numbers = to_numbers(block)
+        add("not a number", f"N_{field}", (np.isnan(numbers) & block.notna().to_numpy()).any(axis=1))
+        add("out of domain", f"N_{field}", (~np.isnan(numbers) & ~np.isin(numbers, domain)).any(axis=1))
+        values[field] = numbers
+
+    if "Type" in values and "Content" in values:
+        filled = ~np.isnan(values["Type"]) | ~np.isnan(values["Content"])
+        add("amount mismatch", "Amount", filled.sum(axis=1) != np.nan_to_num(amount))
+    return pd.DataFrame(issues, columns=REPORT_COLUMNS)
+
+
+def describe_report(report: pd.DataFrame) -> str:
+    """
+    Summarize a validation report in one line per failed check.
+
+    Parameters:
+        report (pd.DataFrame): The report, as returned by check_export.
+
+    Returns:
+        str: The description of the checks.
+    """
+    return "\n".join(
+        f"{row['Column']}: {row['Check']} in {row['Rows']} responses (e.g. {row['Example Responses']})"
+        for _, row in report.iterrows()
+    )
+
+
+def validate_export(df: pd.DataFrame, first_response: int = 1) -> pd.DataFrame:
+    """
+    Validate a loaded export before any filtering, plotting or writing.
+
+    Parameters:
+        df (pd.DataFrame): The export as parsed, before any type conversion, without the metadata rows.
+        first_response (int): The number of the first response of df, for chunks of a larger export.
+
+    Raises:
+        InvalidExport: If a check with the 'error' severity fails. Its args are the description of the failed
+        checks and the report.
+
+    Returns:
+        pd.DataFrame: The report, with warnings only.
+    """
+    report = check_export(df, first_response)
+    errors = report[report["Severity"] == "error"]
+    if len(errors):
+        raise InvalidExport(describe_report(errors), report)
+    return report
@@ -1,39 +1,74 @@
 from typing import List
 
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
+from matplotlib.collections import PolyCollection
 
-from logics.utils import get_unique
+from logics import trace
+from logics.artifacts import GRAPHS, artifact_path
+from logics.filter_data import CONTENT_SPLITS, RATING_FIELDS, WHEN_CODES, WHEN_COLUMNS
+from logics.phases import aggregate_outcomes, aggregate_phases, to_days
+from logics.trends import WINDOW_DAYS, day_offsets, fit_trends, rolling_mean
 
 
-def plot_graph(df: pd.DataFrame, treatment_dates: List, count_of_interest: str):
-    colors = ["green" if date in treatment_dates else "blue" for date in df["Date"]]
+def bars(dates, heights, colors, width: float = 0.8):
+    """
+    Draw a bar per day on the current axes as a single collection, instead of an artist per bar.
 
-    plt.bar(df["Date"], df[count_of_interest], color=colors)
-    i = 1
-    for date, treatment in zip(df["Date"], df[count_of_interest]):
-        if date in treatment_dates:
-            plt.text(date, treatment, i, ha="center", va="bottom")
-            i += 1
+    Args:
+        dates: The days of the bars.
+        heights: The heights of the bars.
+        colors: The color of every bar.
+        width (float): The width of the bars in days.
+    """
+    x = mdates.date2num(pd.to_datetime(pd.Series(dates)))
+    y = np.asarray(heights, dtype=float)
+    left, right, bottom = x - width / 2, x + width / 2, np.zeros_like(y)
+    corners = [np.column_stack(corner) for corner in [(left, bottom), (left, y), (right, y), (right, bottom)]]
+    ax = plt.gca()
+    ax.xaxis_date()
+    ax.add_collection(PolyCollection(np.stack(corners, axis=1), facecolors=colors))
+    ax.autoscale_view()
 
-    # Convert the date column to numeric values for regression
-    date_values = np.arange(len(df["Date"]))
 
-    # Reshape the date values to fit the input requirements of LinearRegression
-    x1 = date_values.reshape(-1, 1)
-    y1 = df[count_of_interest]
+def plot_graph(
+    df: pd.DataFrame,
+    treatment_dates: List,
+    count_of_interest: str,
+    trend: pd.Series = None,
+    smoothed: pd.Series = None,
+):
+    """
+    Plot the daily bars of a count with its trend line and its trailing mean.
 
-    # Perform linear regression
-    regressor = LinearRegression()
-    regressor.fit(x1, y1)
+    Args:
+        df (pd.DataFrame): The daily counts.
+        treatment_dates (List): List of treatment dates.
+        count_of_interest (str): The count column to plot.
+        trend (pd.Series): The 'Slope' and 'Intercept' of the count, as a row of trends.fit_trends, fitted when
+            not given.
+        smoothed (pd.Series): The trailing mean of the count, as a column of trends.rolling_mean, computed when
+            not given.
+    """
+    days = to_days(df["Date"])
+    is_treatment = np.isin(days, to_days(treatment_dates))
+    colors = np.where(is_treatment, "green", "blue")
+
+    bars(df["Date"], df[count_of_interest], colors)
+    treatments = df.loc[is_treatment, ["Date", count_of_interest]]
+    for i, (date, treatment) in enumerate(treatments.itertuples(index=False), 1):
+        plt.text(date, treatment, i, ha="center", va="bottom")
 
-    # Predict the trend line values
-    trend_y1 = regressor.predict(x1)
+    if trend is None:
+        trend = fit_trends(df, [count_of_interest]).iloc[0]
+    if smoothed is None:
+        smoothed = rolling_mean(df, [count_of_interest])[count_of_interest]
 
-    # Plot the trend line
-    plt.plot(df["Date"], trend_y1, color="red", label="Trend Line")
+    # The trend is fitted over the days since the first day, so days without a response keep their place
+    plt.plot(df["Date"], trend["Intercept"] + trend["Slope"] * day_offsets(df["Date"]), color="red", label="Trend Line")
+    plt.plot(df["Date"], smoothed, color="orange", label=f"{WINDOW_DAYS} Day Mean")
 
     plt.ylim(0, None)
     plt.xticks(rotation=90)
@@ -47,50 +82,31 @@ def plot_graph(df: pd.DataFrame, treatment_dates: List, count_of_interest: str):
     return plt
 
 
-def average_per_week(df: pd.DataFrame, treatment_dates: List, count_of_interest: str):
+def average_per_week(
+    df: pd.DataFrame,
+    treatment_dates: List,
+    count_of_interest: str,
+    phases: pd.DataFrame = None,
+):
     """
     Plot a bar graph showing the average value for each period defined by the treatment_dates list.
 
+    The periods and their averages (mean over the days reported) come from logics.phases.aggregate_phases.
+
     Args:
         df (pd.DataFrame): The input DataFrame containing the data.
         treatment_dates (List): List of treatment dates.
         count_of_interest (str): The column in the DataFrame to plot.
+        phases (pd.DataFrame): The precomputed phase aggregates of df, computed when not given.
 
     Returns:
         plt.figure: The matplotlib figure object with the plot.
     """
-    df["Date"] = pd.to_datetime(df["Date"])
-    df.set_index(df["Date"], inplace=True)
-
-    # Calculate averages for each period defined by treatment_dates
-    averages = []
-    labels = []
-
-    # Week before the first treatment date
-    start_date = min(treatment_dates) - pd.Timedelta(days=7)
-    end_date = treatment_dates[0]
-    filtered_df = df.loc[start_date:end_date]
-    average = filtered_df[count_of_interest].mean()
-    averages.append(average)
-    labels.append(start_date.strftime('%Y-%m-%d'))
-
-    # Between each pair of consecutive treatment dates
-    for i in range(len(treatment_dates) - 1):
-        start_date = treatment_dates[i]
-        end_date = treatment_dates[i + 1] - pd.Timedelta(days=1)  # Exclude the last date
-        filtered_df = df.loc[start_date:end_date]
-        average = filtered_df[count_of_interest].mean()
-        averages.append(average)
-
-    # Week after the last treatment date
-    start_date = treatment_dates[-1]
-    end_date = max(treatment_dates) + pd.Timedelta(days=7)
-    filtered_df = df.loc[start_date:end_date]
-    average = filtered_df[count_of_interest].mean()
-    averages.append(average)
-
-    for date in treatment_dates:
-        labels.append(date)
+    if phases is None:
+        phases = aggregate_phases(df, treatment_dates, [count_of_interest])
+    averages = phases[f"Mean_{count_of_interest}"]
+    labels = phases["Start Date"].dt.strftime("%Y-%m-%d")
+
     # Create the bar plot
     plt.bar(range(1, len(averages) + 1), averages)
     plt.xticks(range(1, len(averages) + 1), labels, rotation=45)
@@ -100,33 +116,215 @@ def average_per_week(df: pd.DataFrame, treatment_dates: List, count_of_interest:
     return plt
 
 
+def ratings_per_phase(phases: pd.DataFrame, field: str):
+    """
+    Plot the mean rating of every phase (over all its rated memories) for the target, nontarget and all memories.
+
+    Args:
+        phases (pd.DataFrame): The phase aggregates with the rating columns of logics.phases.aggregate_ratings.
+        field (str): 'Distress' or 'Vividness'.
+
+    Returns:
+        plt: The pyplot module with the plot on the current axes.
+    """
+    positions = range(1, len(phases) + 1)
+    for split in CONTENT_SPLITS:
+        plt.plot(positions, phases[f"{field}_Mean_{split}"], marker="o", label=split)
+    plt.xticks(positions, phases["Start Date"].dt.strftime("%Y-%m-%d"), rotation=45)
+    plt.xlabel("Period")
+    plt.ylabel(f"Mean {field}")
+    plt.title(f"Weekly Mean {field}")
+    plt.legend()
+    return plt
+
+
+def daily_ratings(df: pd.DataFrame):
+    """
+    Plot the daily mean distress and vividness of all the memories.
+
+    Args:
+        df (pd.DataFrame): The daily DataFrame with the rating columns of logics.filter_data.daily_counts.
+
+    Returns:
+        plt: The pyplot module with the plot on the current axes.
+    """
+    for field in RATING_FIELDS:
+        plt.plot(df["Date"], df[f"{field}_Mean_Total"], marker=".", label=field)
+    plt.xticks(rotation=90)
+    plt.xlabel("Date")
+    plt.ylabel("Mean Rating")
+    plt.title("Distress and Vividness Per day")
+    plt.legend()
+    return plt
+
+
+def time_of_day_per_phase(phases: pd.DataFrame):
+    """
+    Plot a heatmap of the share of every '_When' answer code in every phase, annotated with the counts.
+
+    Args:
+        phases (pd.DataFrame): The phase aggregates with the columns of logics.phases.aggregate_time_of_day.
+
+    Returns:
+        plt: The pyplot module with the plot on the current axes.
+    """
+    shares = phases[[column.replace("When_", "When_Share_") for column in WHEN_COLUMNS]].to_numpy(dtype=float)
+    counts = phases[WHEN_COLUMNS].to_numpy()
+    plt.imshow(np.nan_to_num(shares), cmap="Reds", vmin=0, vmax=1, aspect="auto")
+    for (i, j), count in np.ndenumerate(counts):
+        plt.text(j, i, count, ha="center", va="center")
+    plt.xticks(range(len(WHEN_CODES)), WHEN_CODES)
+    plt.yticks(range(len(phases)), phases["Start Date"].dt.strftime("%Y-%m-%d"))
+    plt.xlabel("When (answer code)")
+    plt.ylabel("Period")
+    plt.title("Weekly Time Of Day")
+    return plt
+
+
+def time_of_day_per_day(df: pd.DataFrame):
+    """
+    Plot a heatmap of the memories of every day by '_When' answer code.
+
+    Args:
+        df (pd.DataFrame): The daily DataFrame with the 'When_<code>' columns of logics.filter_data.daily_counts.
+
+    Returns:
+        plt: The pyplot module with the plot on the current axes.
+    """
+    plt.imshow(df[WHEN_COLUMNS].to_numpy().T, cmap="Reds", aspect="auto", interpolation="nearest")
+    step = max(1, len(df) // 15)
+    plt.xticks(range(0, len(df), step), pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d").iloc[::step], rotation=90)
+    plt.yticks(range(len(WHEN_CODES)), WHEN_CODES)
+    plt.xlabel("Date")
+    plt.ylabel("When (answer code)")
+    plt.title("Time Of Day Per day")
+    return plt
+
+
+def time_of_day_totals(df: pd.DataFrame):
+    """
+    Plot the number of memories of the whole diary by '_When' answer code.
+
+    Args:
+        df (pd.DataFrame): The daily DataFrame with the 'When_<code>' columns of logics.filter_data.daily_counts.
+
+    Returns:
+        plt: The pyplot module with the plot on the current axes.
+    """
+    plt.bar(WHEN_CODES, df[WHEN_COLUMNS].sum())
+    plt.xticks(WHEN_CODES)
+    plt.xlabel("When (answer code)")
+    plt.ylabel("Memories")
+    plt.title("Time Of Day")
+    return plt
+
+
+def graph_rows(df: pd.DataFrame) -> int:
+    """
+    Count the rows of graphs of a daily DataFrame.
+
+    Args:
+        df (pd.DataFrame): The daily DataFrame.
+
+    Returns:
+        int: 2 (the counts per day and per phase), plus a row when df has the distress and vividness ratings and
+        a row when it has the time of day of the memories.
+    """
+    with_ratings = all(f"{field}_Mean_Total" in df for field in RATING_FIELDS)
+    with_time_of_day = all(column in df for column in WHEN_COLUMNS)
+    return 2 + with_ratings + with_time_of_day
+
+
+def draw_graphs(
+    axes: np.ndarray,
+    df: pd.DataFrame,
+    treatment_dates: List,
+    count_of_interest: List,
+    phases: pd.DataFrame = None,
+):
+    """
+    Draw all the graphs of a patient on a grid of axes of graph_rows(df) rows and 3 columns.
+
+    Args:
+        axes (np.ndarray): The grid of axes, empty or cleared.
+        df (pd.DataFrame): The input DataFrame containing the data.
+        treatment_dates (List): List of treatment dates.
+        count_of_interest (List): List of columns in the DataFrame to plot.
+        phases (pd.DataFrame): The precomputed phase aggregates of df, computed when not given.
+    """
+    rows = len(axes)
+    with_ratings = all(f"{field}_Mean_Total" in df for field in RATING_FIELDS)
+    with_time_of_day = all(column in df for column in WHEN_COLUMNS)
+    if phases is None:
+        phases = aggregate_outcomes(df, treatment_dates, count_of_interest)
+
+    # Fit the trends and smooth the counts of all the columns at once
+    with trace.stage("trends", len(df)):
+        trends = fit_trends(df, count_of_interest).set_index("Count")
+        smoothed = rolling_mean(df, count_of_interest)
+
+    # Call each function and plot the graphs
+    for j, coi in enumerate(count_of_interest):
+        with trace.stage(f"plot_graph {coi}", len(df)):
+            plt.sca(axes[0, j])
+            plot_graph(df, treatment_dates, coi, trends.loc[coi], smoothed[coi])
+        with trace.stage(f"average_per_week {coi}", len(phases)):
+            plt.sca(axes[1, j])
+            average_per_week(df, treatment_dates, coi, phases)
+    if with_ratings:
+        with trace.stage("plot ratings", len(df)):
+            for j, field in enumerate(RATING_FIELDS):
+                plt.sca(axes[2, j])
+                ratings_per_phase(phases, field)
+            plt.sca(axes[2, len(RATING_FIELDS)])
+            daily_ratings(df)
+    if with_time_of_day:
+        with trace.stage("plot time of day", len(df)):
+            plt.sca(axes[rows - 1, 0])
+            time_of_day_per_phase(phases)
+            plt.sca(axes[rows - 1, 1])
+            time_of_day_per_day(df)
+            plt.sca(axes[rows - 1, 2])
+            time_of_day_totals(df)
+
+
 def plot_all_graphs(
-    df: pd.DataFrame, treatment_dates: List, count_of_interest: List, saving_folder
+    df: pd.DataFrame,
+    treatment_dates: List,
+    count_of_interest: List,
+    saving_folder,
+    show: bool = True,
+    phases: pd.DataFrame = None,
+    key: str = None,
 ):
     """
     Plot all graphs in a 2x3 grid of subplots and save them to a specific folder.
 
+    When the daily DataFrame has the distress and vividness ratings, a row plots them per phase and per day,
+    and when it has the time of day of the memories, a last row of heatmaps plots it per phase and per day.
+
     Args:
         df (pd.DataFrame): The input DataFrame containing the data.
         treatment_dates (List): List of treatment dates.
         count_of_interest (List): List of columns in the DataFrame to plot.
         saving_folder (str): The path of the folder where the graphs will be saved.
+        show (bool): Whether to display the graphs in a window after saving them.
+        phases (pd.DataFrame): The precomputed phase aggregates of df, computed when not given.
+        key (str): The key in the file name (see logics.artifacts), a random one when not given.
 
     Returns:
-        None
+        plt.Figure: The figure of the graphs, detached from pyplot so it can be embedded in another window.
     """
-    # Create a 2x3 grid of subplots
-    fig, axes = plt.subplots(2, 3, figsize=(15, 10))
-
-    # Call each function and plot the graphs
-    graph_funcs = [plot_graph, average_per_week]
-
-    for i, func in enumerate(graph_funcs):
-        for j, coi in enumerate(count_of_interest):
-            plt.sca(axes[i, j])
-            func(df, treatment_dates, coi)
+    # Create a 2x3 grid of subplots, with a row more for the ratings and for the time of day
+    rows = graph_rows(df)
+    fig, axes = plt.subplots(rows, 3, figsize=(15, 5 * rows))
+    draw_graphs(axes, df, treatment_dates, count_of_interest, phases)
 
     # Display the plot
     plt.tight_layout()
-    plt.savefig(f"{saving_folder}/visualizations-{get_unique()}.pdf")
-    plt.show()
\ No newline at end of file
+    with trace.stage("save pdf"):
+        plt.savefig(artifact_path(saving_folder, GRAPHS, key))
+    if show:
+        plt.show()
+    plt.close(fig)
+    return fig
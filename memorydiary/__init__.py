@@ -0,0 +1,6 @@
+"""
+Package entry point of the MemoryDiary: python -m memorydiary <command> [arguments].
+
+Only the module of the command is imported, and every command leaves the plotting library (matplotlib)
+and the Excel engines unloaded until a stage actually draws or reads a workbook.
+"""
@@ -0,0 +1,38 @@
+"""
+Usage:
+    python -m memorydiary batch <exports_folder> <manifest.csv> <output_folder> [options of batch.py]
+    python -m memorydiary watch <exports_folder> <manifest.csv> <output_folder> [options of watcher.py]
+    python -m memorydiary serve <jobs_folder> [options of server.py]
+    python -m memorydiary ui
+    python -m memorydiary imports [--budget SECONDS] [--top N] [command ...]
+"""
+import argparse
+import importlib
+import sys
+from typing import List
+
+# command -> module holding its main(argv)
+COMMANDS = {
+    "batch": "batch",
+    "watch": "watcher",
+    "serve": "server",
+    "ui": "ui",
+    "imports": "memorydiary.startup",
+}
+
+
+def main(argv: List = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m memorydiary", description="Run a MemoryDiary command.")
+    parser.add_argument("command", choices=list(COMMANDS))
+    parser.add_argument("arguments", nargs=argparse.REMAINDER, help="the arguments of the command")
+    args = parser.parse_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.command])
+    # The GUI runs its window on import
+    if args.command == "ui":
+        return 0
+    return module.main(args.arguments) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
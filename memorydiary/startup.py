@@ -0,0 +1,129 @@
+"""
+Import-time report of the MemoryDiary commands, checked against a startup budget.
+
+Usage:
+    python -m memorydiary imports [--budget SECONDS] [--top N] [--repeats N] [command ...]
+
+Every command module is imported in a fresh interpreter: its wall time (the fastest of the repeats) is compared
+with the budget, the heavy libraries it loaded are listed and the slowest imports are shown from
+python -X importtime. The run fails when a command is over budget or loads a heavy library at startup.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The headless commands, the GUI loading tkinter by design
+HEADLESS_COMMANDS = ["batch", "watch", "serve"]
+# Libraries that only the stages drawing graphs or reading workbooks need
+HEAVY_MODULES = ["matplotlib", "scipy", "PIL", "openpyxl", "xlrd", "tkinter"]
+# Wall seconds of an interpreter importing a command module, pandas and numpy taking most of it
+STARTUP_BUDGET_SECONDS = 1.5
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    """Run code in a fresh interpreter from the project folder."""
+    return subprocess.run(
+        [sys.executable, *options, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+def startup_seconds(module: str, repeats: int = 3) -> float:
+    """
+    Measure the wall time of a fresh interpreter importing a module.
+
+    Args:
+        module (str): The module to import.
+        repeats (int): The number of runs, the fastest one being kept.
+
+    Returns:
+        float: The seconds of the fastest run.
+    """
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run_python(f"import {module}")
+        seconds.append(time.perf_counter() - start)
+    return min(seconds)
+
+
+def loaded_heavy_modules(module: str) -> List[str]:
+    """
+    List the HEAVY_MODULES a fresh interpreter has loaded after importing a module.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        List[str]: The loaded heavy libraries.
+    """
+    code = f"import sys, {module}; print(' '.join(sorted({{name.split('.')[0] for name in sys.modules}})))"
+    loaded = set(run_python(code).stdout.split())
+    return [name for name in HEAVY_MODULES if name in loaded]
+
+
+def import_times(module: str) -> List[dict]:
+    """
+    Collect the import times of a module and of everything it imports, with python -X importtime.
+
+    Args:
+        module (str): The module to import.
+
+    Returns:
+        List[dict]: One dict per imported module with its 'module' name, its nesting 'level' (0 for module) and
+        its 'self_ms' and 'cumulative_ms' import times.
+    """
+    rows = []
+    for line in run_python(f"import {module}", "-X", "importtime").stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append(
+                {
+                    "module": name,
+                    "level": (len(indent) - 1) // 2,
+                    "self_ms": int(self_us) / 1000,
+                    "cumulative_ms": int(cumulative_us) / 1000,
+                }
+            )
+    return rows
+
+
+def slowest_imports(module: str, top: int = 10) -> List[dict]:
+    """The direct imports of a module, slowest first."""
+    times = import_times(module)
+    direct = [row for row in times if row["level"] == 1]
+    return sorted(direct, key=lambda row: row["cumulative_ms"], reverse=True)[:top]
+
+
+def main(argv: List = None) -> int:
+    from memorydiary.__main__ import COMMANDS
+
+    parser = argparse.ArgumentParser(description="Report the import time of the MemoryDiary commands.")
+    parser.add_argument("commands", nargs="*", help=f"the commands to measure, by default {HEADLESS_COMMANDS}")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+    commands = args.commands or HEADLESS_COMMANDS
+    unknown = [command for command in commands if command not in COMMANDS or command == "imports"]
+    if unknown:
+        parser.error(f"unknown commands {unknown}")
+
+    failed = False
+    for command in commands:
+        module = COMMANDS[command]
+        seconds = startup_seconds(module, args.repeats)
+        heavy = loaded_heavy_modules(module)
+        over_budget = seconds > args.budget
+        failed = failed or over_budget or bool(heavy)
+        print(f"{command} ({module}): {seconds:.2f}s, budget {args.budget:.2f}s{' OVER BUDGET' if over_budget else ''}")
+        print(f"  heavy libraries loaded: {', '.join(heavy) or 'none'}")
+        for row in slowest_imports(module, args.top):
+            print(f"  {row['cumulative_ms']:9.1f} ms  {row['module']}")
+    return 1 if failed else 0
@@ -0,0 +1,317 @@
+"""
+Local HTTP service running the MemoryDiary analysis for several clients on a shared process pool.
+
+Usage:
+    python server.py <jobs_folder> [--host 127.0.0.1] [--port 8765] [--workers N] [--max-queued N]
+                     [--max-body-mb N] [--cache-folder FOLDER] [--no-cache]
+
+Endpoints:
+    POST /jobs?dates=YYYY-MM-DD,...&format=xlsx   body: the export file. Returns the job id and status.
+    GET  /jobs/<id>                                the status of a job, its error and its output files.
+    GET  /jobs/<id>/aggregates                     the daily counts and ratings and their phase aggregates as JSON.
+    GET  /jobs/<id>/files/<name>                   an output file (Excel workbooks, graphs PDF).
+
+An export larger than the body limit is refused with 413 before it is read. Every job runs in its own worker
+process and folder. Parsed exports are shared through the Parquet cache
+and a request with the same export content and dates as a finished job returns that job.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+import batch
+import flow_control
+from errors import DatesNotInOrder
+from logics import artifacts, cache, filter_data, loader, phases, utils, validators
+
+utils.use_agg_backend()
+
+AGGREGATES_FILE = "aggregates.json"
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_QUEUED = 32
+MAX_BODY_BYTES = 50 * 1024 * 1024
+
+
+def run_job(export_path: str, treatment_dates: List, job_folder: str, cache_folder: str = None) -> List[str]:
+    """
+    Analyze one export into its job folder.
+
+    Args:
+        export_path (str): The path of the uploaded export.
+        treatment_dates (List): A list of treatment dates in datetime.Date format.
+        job_folder (str): The folder of the job outputs.
+        cache_folder (str): The cache folder of the parsed and filtered tables, None to disable the cache.
+
+    Returns:
+        List[str]: The names of the output files, without the export and the outputs manifest.
+    """
+    if cache_folder:
+        _, df = cache.load_filtered(export_path, cache_folder)
+    else:
+        df = filter_data.run_filter_flow(loader.load_export(export_path), None)
+    validators.validate_range(treatment_dates, df["Date"].min())
+    phase_df = phases.aggregate_outcomes(df, treatment_dates, flow_control.COUNT_OF_INTEREST)
+    aggregates = {
+        "daily": json.loads(df.to_json(orient="records", date_format="iso")),
+        "phases": json.loads(phase_df.to_json(orient="records", date_format="iso")),
+    }
+    with open(os.path.join(job_folder, AGGREGATES_FILE), "w") as file:
+        json.dump(aggregates, file)
+    flow_control.run_reports(
+        df, treatment_dates, job_folder, show_graphs=False, parallel=False, phase_df=phase_df
+    )
+    internal = {os.path.basename(export_path), artifacts.MANIFEST_FILE}
+    return sorted(name for name in os.listdir(job_folder) if name not in internal)
+
+
+class AnalysisService:
+    """
+    Queues the analysis jobs on a process pool and keeps their status and results.
+
+    Args:
+        jobs_folder (str): The folder holding one subfolder per job.
+        workers (int): The number of worker processes.
+        max_queued (int): The maximum number of unfinished jobs, further submissions are refused.
+        max_body_bytes (int): The maximum size of an uploaded export, larger ones are refused.
+        cache_folder (str): The cache folder of the parsed and filtered tables, None to disable the cache.
+    """
+
+    def __init__(
+        self,
+        jobs_folder: str,
+        workers: int = None,
+        max_queued: int = MAX_QUEUED,
+        cache_folder: str = cache.CACHE_FOLDER,
+        max_body_bytes: int = MAX_BODY_BYTES,
+    ):
+        self.jobs_folder = jobs_folder
+        self.max_queued = max_queued
+        self.max_body_bytes = max_body_bytes
+        self.cache_folder = cache_folder
+        self.executor = ProcessPoolExecutor(workers)
+        self.jobs: Dict[str, dict] = {}
+        # request key -> job id, for the requests already submitted
+        self.results: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        os.makedirs(jobs_folder, exist_ok=True)
+
+    def submit(self, content: bytes, treatment_dates: List, file_format: str) -> dict:
+        """
+        Queue the analysis of an export, or return the job of an identical earlier request.
+
+        Args:
+            content (bytes): The export file.
+            treatment_dates (List): A list of treatment dates in datetime.Date format.
+            file_format (str): The extension of the export ('xlsx', 'xls' or 'csv').
+
+        Raises:
+            DatesNotInOrder: If the treatment dates are not in ascending order.
+            OverflowError: If max_queued jobs are still unfinished.
+
+        Returns:
+            dict: The job.
+        """
+        validators.validate_order(treatment_dates)
+        digest = hashlib.sha256(content)
+        digest.update(json.dumps([d.isoformat() for d in treatment_dates]).encode())
+        # The parsing code and the code of the outputs, so a change to either is not served old results
+        digest.update(cache.code_version().encode())
+        digest.update(artifacts.pipeline_version().encode())
+        key = digest.hexdigest()
+
+        with self.lock:
+            job_id = self.results.get(key)
+            if job_id and self.jobs[job_id]["status"] != "failed":
+                return dict(self.jobs[job_id])
+            unfinished = sum(job["status"] == "queued" for job in self.jobs.values())
+            if unfinished >= self.max_queued:
+                raise OverflowError(f"{unfinished} jobs are still running")
+
+            job_id = utils.get_unique()
+            job_folder = os.path.join(self.jobs_folder, job_id)
+            os.makedirs(job_folder)
+            export_path = os.path.join(job_folder, f"export.{file_format}")
+            with open(export_path, "wb") as file:
+                file.write(content)
+
+            job = {"job": job_id, "status": "queued", "error": "", "files": []}
+            self.jobs[job_id] = job
+            self.results[key] = job_id
+            future = self.executor.submit(
+                run_job, export_path, treatment_dates, job_folder, self.cache_folder
+            )
+        future.add_done_callback(lambda done: self.finish(job_id, done))
+        return self.job(job_id)
+
+    def finish(self, job_id: str, future: Future):
+        """Record the result of a job."""
+        with self.lock:
+            job = self.jobs[job_id]
+            try:
+                job["files"] = future.result()
+                job["status"] = "done"
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = f"{type(e).__name__}: {e}"
+
+    def job(self, job_id: str) -> dict:
+        """Get a copy of a job, None if there is no such job."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def path(self, job_id: str, name: str) -> str:
+        """Get the path of an output file of a finished job, None if there is no such file."""
+        job = self.job(job_id)
+        if not job or (name not in job["files"] and name != AGGREGATES_FILE):
+            return None
+        return os.path.join(self.jobs_folder, job_id, name)
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Maps the HTTP endpoints to the AnalysisService of the server."""
+
+    CONTENT_TYPES = {
+        ".json": "application/json",
+        ".pdf": "application/pdf",
+        ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+
+    @property
+    def service(self) -> AnalysisService:
+        return self.server.service
+
+    def send_json(self, status: HTTPStatus, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_file(self, file_path: str):
+        with open(file_path, "rb") as file:
+            data = file.read()
+        content_type = self.CONTENT_TYPES.get(os.path.splitext(file_path)[1], "application/octet-stream")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/jobs":
+            return self.send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+        query = parse_qs(url.query)
+        file_format = query.get("format", ["xlsx"])[0]
+        if f".{file_format}" not in batch.EXPORT_EXTENSIONS:
+            return self.send_json(HTTPStatus.BAD_REQUEST, {"error": f"Unsupported format {file_format}"})
+        try:
+            dates = [pd.Timestamp(d).date() for d in query["dates"][0].split(",")]
+        except (KeyError, ValueError):
+            return self.send_json(HTTPStatus.BAD_REQUEST, {"error": "dates=YYYY-MM-DD,... is required"})
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            return self.send_json(HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"})
+        if length > self.service.max_body_bytes:
+            # The body is not read, so the connection cannot be reused
+            self.close_connection = True
+            return self.send_json(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                {"error": f"The export is over {self.service.max_body_bytes} bytes"},
+            )
+        content = self.rfile.read(length)
+        try:
+            job = self.service.submit(content, dates, file_format)
+        except DatesNotInOrder:
+            return self.send_json(HTTPStatus.BAD_REQUEST, {"error": "The dates are not in order"})
+        except OverflowError as e:
+            return self.send_json(HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)})
+        self.send_json(HTTPStatus.ACCEPTED, job)
+
+    def do_GET(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) < 2 or parts[0] != "jobs":
+            return self.send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+        job = self.service.job(parts[1])
+        if job is None:
+            return self.send_json(HTTPStatus.NOT_FOUND, {"error": "No such job"})
+
+        if len(parts) == 2:
+            return self.send_json(HTTPStatus.OK, job)
+        if job["status"] != "done":
+            return self.send_json(HTTPStatus.CONFLICT, job)
+        if parts[2:] == ["aggregates"]:
+            return self.send_file(self.service.path(job["job"], AGGREGATES_FILE))
+        if len(parts) == 4 and parts[2] == "files" and self.service.path(job["job"], parts[3]):
+            return self.send_file(self.service.path(job["job"], parts[3]))
+        self.send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+
+
+def make_server(service: AnalysisService, host: str = HOST, port: int = PORT) -> ThreadingHTTPServer:
+    """
+    Create the HTTP server of a service.
+
+    Args:
+        service (AnalysisService): The service handling the jobs.
+        host (str): The interface to listen on, the local one by default.
+        port (int): The port to listen on, 0 for any free port.
+
+    Returns:
+        ThreadingHTTPServer: The server, not started yet.
+    """
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.service = service
+    return server
+
+
+def main(argv: List = None):
+    parser = argparse.ArgumentParser(description="Serve the MemoryDiary analysis over HTTP.")
+    parser.add_argument("jobs_folder")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED)
+    parser.add_argument(
+        "--max-body-mb", type=float, default=MAX_BODY_BYTES / (1024 * 1024), help="largest export accepted, in MB"
+    )
+    parser.add_argument("--cache-folder", default=cache.CACHE_FOLDER)
+    parser.add_argument("--no-cache", action="store_true", help="always parse and filter the exports")
+    args = parser.parse_args(argv)
+
+    service = AnalysisService(
+        args.jobs_folder,
+        args.workers,
+        args.max_queued,
+        None if args.no_cache else args.cache_folder,
+        int(args.max_body_mb * 1024 * 1024),
+    )
+    server = make_server(service, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import json
+import os
+from datetime import date
+
+import matplotlib
+import pandas as pd
+
+matplotlib.use("Agg")
+
+from flow_control import run_reports  # noqa: E402
+from logics.artifacts import MANIFEST_FILE, output_key  # noqa: E402
+from logics.filter_data import run_filter_flow  # noqa: E402
+
+DATES = [date(2023, 5, 8), date(2023, 5, 15), date(2023, 5, 22), date(2023, 5, 29), date(2023, 6, 5)]
+
+
+def test_output_key_depends_on_the_inputs():
+    df = pd.DataFrame({"Count_Total": [1, 2, 3]})
+
+    assert output_key(df, ["2023-05-08"]) == output_key(df.copy(), ["2023-05-08"])
+    assert output_key(df, ["2023-05-08"]) != output_key(df, ["2023-05-09"])
+    assert output_key(df, ["2023-05-08"]) != output_key(df.assign(Count_Total=[1, 2, 4]), ["2023-05-08"])
+
+
+def test_rerun_skips_the_written_outputs(tmp_path):
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)
+    run_reports(df, DATES, str(tmp_path), show_graphs=False, parallel=False)
+    written = {name: os.stat(tmp_path / name).st_mtime_ns for name in os.listdir(tmp_path)}
+
+    fig = run_reports(df, DATES, str(tmp_path), show_graphs=False, parallel=False)
+
+    assert fig is None
+    assert {name: os.stat(tmp_path / name).st_mtime_ns for name in os.listdir(tmp_path) if name != MANIFEST_FILE} == {
+        name: mtime for name, mtime in written.items() if name != MANIFEST_FILE
+    }
+    with open(tmp_path / MANIFEST_FILE) as file:
+        manifest = json.load(file)
+    assert sorted(manifest) == sorted(set(written) - {MANIFEST_FILE})
+
+
+def test_new_dates_replace_the_recorded_outputs_of_the_source(tmp_path):
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)
+    # Not recorded in the manifest, so never removed
+    (tmp_path / "Weekly_Summary_zeros-0123456789ab.xlsx").write_bytes(b"")
+    run_reports(df, DATES, str(tmp_path), show_graphs=False, parallel=False, graphs=False, source="a")
+    first = set(os.listdir(tmp_path)) - {MANIFEST_FILE, "Weekly_Summary_zeros-0123456789ab.xlsx"}
+
+    run_reports(df, DATES[:4], str(tmp_path), show_graphs=False, parallel=False, graphs=False, source="a")
+
+    outputs = set(os.listdir(tmp_path))
+    assert len(outputs) == 4 and "Weekly_Summary_zeros-0123456789ab.xlsx" in outputs and not outputs & first
+    with open(tmp_path / MANIFEST_FILE) as file:
+        assert sorted(json.load(file)) == sorted(outputs - {MANIFEST_FILE, "Weekly_Summary_zeros-0123456789ab.xlsx"})
+
+
+def test_patients_sharing_a_folder_keep_their_outputs(tmp_path):
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)
+    other = df.assign(Count_Total=df["Count_Total"] + 1)
+    run_reports(df, DATES, str(tmp_path), show_graphs=False, parallel=False, source="a")
+    first = set(os.listdir(tmp_path)) - {MANIFEST_FILE}
+
+    run_reports(other, DATES, str(tmp_path), show_graphs=False, parallel=False, source="b")
+    # Without a source, as from the GUI, no output is removed either
+    run_reports(df, DATES[:4], str(tmp_path), show_graphs=False, parallel=False)
+
+    outputs = set(os.listdir(tmp_path)) - {MANIFEST_FILE}
+    assert len(first) == 3 and len(outputs) == 9 and first <= outputs
@@ -0,0 +1,155 @@
+import os
+import shutil
+
+import pandas as pd
+
+from batch import run_batch
+from logics import store
+
+SESSIONS = "2023-05-08,2023-05-15,2023-05-22,2023-05-29,2023-06-05"
+
+
+def test_run_batch(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    shutil.copy("Intrusions.xlsx", exports / "139.xlsx")
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(
+        "patient,session_1,session_2,session_3,session_4,session_5\n"
+        f"139,{SESSIONS}\n"
+        f"140,{SESSIONS}\n"
+    )
+
+    summary = run_batch(
+        str(exports), str(manifest), str(tmp_path / "out"), 2, str(tmp_path / "cache")
+    )
+
+    assert list(summary["status"]) == ["ok", "failed"]
+    assert "FileNotFoundError" in summary["error"].iloc[1]
+    outputs = os.listdir(tmp_path / "out" / "139")
+    assert len(outputs) == 5
+    assert pd.read_csv(tmp_path / "out" / "run_summary.csv")["patient"].tolist() == [139, 140]
+
+    # The daily counts are keyed like the other outputs, so a rerun finds them up to date
+    counts = next(name for name in outputs if name.startswith("memories_count-"))
+    written = os.stat(tmp_path / "out" / "139" / counts).st_mtime_ns
+    run_batch(str(exports), str(manifest), str(tmp_path / "out"), 2, str(tmp_path / "cache"))
+    assert os.stat(tmp_path / "out" / "139" / counts).st_mtime_ns == written
+
+
+def test_run_batch_cohort(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    shutil.copy("Intrusions.xlsx", exports / "139.xlsx")
+    shutil.copy("Intrusions.xlsx", exports / "140.xlsx")
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(
+        "patient,session_1,session_2,session_3,session_4,session_5\n"
+        f"139,{SESSIONS}\n"
+        f"140,{SESSIONS}\n"
+    )
+
+    run_batch(str(exports), str(manifest), str(tmp_path / "out"), 2, None, cohort_report=True)
+
+    outputs = sorted(os.listdir(tmp_path / "out"))
+    workbook = [name for name in outputs if name.startswith("Cohort_Summary-")]
+    assert len(workbook) == 1
+    assert any(name.startswith("cohort-") for name in outputs)
+    summary = pd.read_excel(tmp_path / "out" / workbook[0], sheet_name="Cohort")
+    assert list(summary["Patients Reporting"]) == [2] * 6
+    effects = pd.read_excel(tmp_path / "out" / workbook[0], sheet_name="Patient Effects")
+    assert list(effects["Patient"].unique()) == [139, 140]
+    assert (effects["Phase"] != "Baseline").all()
+
+
+def test_run_batch_incremental(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    shutil.copy("Intrusions.xlsx", exports / "139.xlsx")
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(f"patient,session_1,session_2,session_3,session_4,session_5\n139,{SESSIONS}\n")
+    state = str(tmp_path / "state")
+
+    first = run_batch(str(exports), str(manifest), str(tmp_path / "out"), 1, None, state_folder=state)
+    second = run_batch(str(exports), str(manifest), str(tmp_path / "out"), 1, None, state_folder=state)
+
+    assert list(first["status"]) == ["ok"]
+    assert list(second["status"]) == ["unchanged"]
+    assert len(os.listdir(tmp_path / "out" / "139")) == 5
+
+
+def test_run_batch_store(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    shutil.copy("Intrusions.xlsx", exports / "139.xlsx")
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(f"patient,session_1,session_2,session_3,session_4,session_5\n139,{SESSIONS}\n")
+    db_path = str(tmp_path / "store.db")
+
+    run_batch(
+        str(exports), str(manifest), str(tmp_path / "out"), 1, None, cohort_report=True, store_path=db_path
+    )
+
+    connection = store.connect(db_path)
+    counts_file = next(name for name in os.listdir(tmp_path / "out" / "139") if name.startswith("memories_count-"))
+    counts = pd.read_excel(tmp_path / "out" / "139" / counts_file)
+    assert len(store.read_daily(connection, "139")) == len(counts)
+    cohort_files = sorted(name for name in os.listdir(tmp_path / "out") if name.startswith("Cohort_Summary-"))
+    assert len(cohort_files) == 1
+
+    # The stored daily counts give the same cohort outputs as the counts of the workers
+    run_batch(str(exports), str(manifest), str(tmp_path / "memory"), 1, None, cohort_report=True)
+    assert cohort_files == sorted(name for name in os.listdir(tmp_path / "memory") if name.startswith("Cohort_"))
+
+
+def test_run_batch_store_incremental(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    shutil.copy("Intrusions.xlsx", exports / "139.xlsx")
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(f"patient,session_1,session_2,session_3,session_4,session_5\n139,{SESSIONS}\n")
+    db_path = str(tmp_path / "store.db")
+
+    state = str(tmp_path / "state")
+    run_batch(str(exports), str(manifest), str(tmp_path / "out"), 1, None, state_folder=state, store_path=db_path)
+
+    connection = store.connect(db_path)
+    stored = connection.execute("SELECT COUNT(*) FROM events WHERE Patient = '139'").fetchone()[0]
+    assert stored == store.read_daily(connection, "139")["Count_Total"].sum()
+
+
+def test_run_batch_graphs_report(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    shutil.copy("Intrusions.xlsx", exports / "139.xlsx")
+    shutil.copy("Intrusions.xlsx", exports / "140.xlsx")
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(
+        "patient,session_1,session_2,session_3,session_4,session_5\n"
+        f"139,{SESSIONS}\n"
+        f"140,{SESSIONS}\n"
+    )
+
+    run_batch(str(exports), str(manifest), str(tmp_path / "out"), 1, None, graphs_report=True)
+
+    outputs = os.listdir(tmp_path / "out")
+    assert len([name for name in outputs if name.startswith("Graphs_Report-")]) == 1
+    for patient in ["139", "140"]:
+        assert not any(name.startswith("visualizations-") for name in os.listdir(tmp_path / "out" / patient))
+
+
+def test_run_batch_single_workbook(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    shutil.copy("Intrusions.xlsx", exports / "139.xlsx")
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(f"patient,session_1,session_2,session_3,session_4,session_5\n139,{SESSIONS}\n")
+
+    run_batch(str(exports), str(manifest), str(tmp_path / "out"), 1, None, output_format="xlsx")
+
+    outputs = os.listdir(tmp_path / "out" / "139")
+    assert not any(name.startswith("memories_count") for name in outputs)
+    workbook = next(name for name in outputs if name.startswith("Diary_Summary-"))
+    sheets = pd.read_excel(tmp_path / "out" / "139" / workbook, sheet_name=None)
+    assert list(sheets) == ["Daily Counts", "Weekly Summary", "Time Of Day", "Zero Days", "Trends"]
+    assert len(sheets["Zero Days"]) == 6
@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import pandas as pd
+
+from logics import validators
+from logics.cache import cache_key, code_version, folder_size, load_filtered
+from logics.filter_data import run_filter_flow
+
+
+def test_cached_tables(tmp_path):
+    cache_folder = str(tmp_path / "cache")
+    events, daily = load_filtered("Intrusions.xlsx", cache_folder)
+    cached_events, cached_daily = load_filtered("Intrusions.xlsx", cache_folder)
+
+    assert len(os.listdir(cache_folder)) == 1
+    pd.testing.assert_frame_equal(events, cached_events)
+    pd.testing.assert_frame_equal(daily, cached_daily)
+    assert list(cached_daily["Date"]) == list(run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)["Date"])
+
+
+def test_eviction(tmp_path):
+    cache_folder = str(tmp_path / "cache")
+    shutil.copy("Intrusions.xlsx", tmp_path / "a.xlsx")
+    pd.read_excel("Intrusions.xlsx").drop(5).to_excel(tmp_path / "b.xlsx", index=False)
+
+    load_filtered(str(tmp_path / "a.xlsx"), cache_folder)
+    entry_size = folder_size(os.path.join(cache_folder, os.listdir(cache_folder)[0]))
+    load_filtered(str(tmp_path / "b.xlsx"), cache_folder, max_bytes=entry_size + 100)
+
+    assert os.listdir(cache_folder) == [cache_key(str(tmp_path / "b.xlsx"))]
+
+
+def test_code_version_covers_the_validation(tmp_path, monkeypatch):
+    version = code_version()
+    changed = tmp_path / "validators.py"
+    changed.write_text(open(validators.__file__).read() + "\n# changed\n")
+    monkeypatch.setattr(validators, "__file__", str(changed))
+
+    assert code_version() != version
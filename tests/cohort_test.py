@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_export, session_dates
+from logics.cohort import build_cohort, cohort_phases, summarize_phases
+from logics.filter_data import build_tables
+from logics.phases import aggregate_phases
+
+
+def make_cohort():
+    frames, sessions = {}, {}
+    for i in range(3):
+        start = date(2023, 1, 1) + timedelta(days=i)
+        frames[f"P{i}"] = build_tables(generate_export(50, 4, seed=i, start=start))[1]
+        sessions[f"P{i}"] = session_dates(start)
+    return frames, sessions
+
+
+def test_matches_single_patient_phases():
+    frames, sessions = make_cohort()
+    patient_phases = cohort_phases(build_cohort(frames), sessions)
+
+    for patient, df in frames.items():
+        expected = aggregate_phases(df, sessions[patient])
+        result = patient_phases[patient_phases["Patient"] == patient].drop(columns="Patient")
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), expected, check_dtype=False)
+
+
+def test_summary():
+    frames, sessions = make_cohort()
+    patient_phases = cohort_phases(build_cohort(frames), sessions)
+    summary = summarize_phases(patient_phases)
+
+    assert list(summary["Phase"]) == ["Baseline", "Session 1", "Session 2", "Session 3", "Session 4", "Post"]
+    assert list(summary["Patients Reporting"]) == [3] * 6
+    baseline = patient_phases[patient_phases["Phase"] == "Baseline"]["Average_Count_Total"]
+    assert summary["Mean_Count_Total"].iloc[0] == pytest.approx(baseline.mean())
+
+
+def test_unaligned_sessions():
+    frames, sessions = make_cohort()
+    sessions["P0"] = sessions["P0"][:4]
+    with pytest.raises(ValueError):
+        cohort_phases(build_cohort(frames), sessions)
@@ -0,0 +1,57 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from logics.daily_index import DailyIndex
+
+SKIPPED = [date(2023, 5, 3), date(2023, 5, 10), date(2023, 5, 11), date(2023, 5, 12)]
+
+
+def make_daily_df():
+    days = [d for d in pd.date_range("2023-05-01", "2023-05-20").date if d not in SKIPPED]
+    df = pd.DataFrame({"Date": days})
+    df["Count_Target"] = [i % 3 for i in range(len(days))]
+    df["Count_Nontarget"] = [i % 2 for i in range(len(days))]
+    df["Count_Total"] = df["Count_Target"] + df["Count_Nontarget"]
+    return df
+
+
+def test_dense_calendar_marks_missed_days():
+    dense = DailyIndex(make_daily_df()).dense()
+
+    assert len(dense) == 20
+    assert list(dense.loc[~dense["Reported"], "Date"]) == list(pd.to_datetime(SKIPPED))
+    assert dense.loc[~dense["Reported"], "Count_Total"].isna().all()
+
+
+def test_windows_match_masked_sums():
+    df = make_daily_df()
+    index = DailyIndex(df)
+    dates = pd.to_datetime(df["Date"])
+    starts = pd.to_datetime(["2023-04-25", "2023-05-01", "2023-05-09", "2023-05-10"])
+    ends = pd.to_datetime(["2023-05-05", "2023-05-09", "2023-05-21", "2023-05-13"])
+
+    for column in ["Count_Target", "Count_Nontarget", "Count_Total"]:
+        for start, end, total, zeros, mean in zip(
+            starts,
+            ends,
+            index.sum(column, starts, ends),
+            index.zeros(column, starts, ends),
+            index.mean(column, starts, ends),
+        ):
+            window = df.loc[(dates >= start) & (dates < end), column]
+            assert total == window.sum()
+            assert zeros == (window == 0).sum()
+            np.testing.assert_equal(mean, window.mean())
+
+
+def test_compliance():
+    index = DailyIndex(make_daily_df(), start=date(2023, 4, 29))
+    starts = pd.to_datetime(["2023-04-29", "2023-05-08", "2023-05-10"])
+    ends = pd.to_datetime(["2023-05-08", "2023-05-15", "2023-05-13"])
+
+    assert list(index.days_reported(starts, ends)) == [6, 4, 0]
+    assert list(index.calendar_days(starts, ends)) == [9, 7, 3]
+    assert list(index.longest_missed_run(starts, ends)) == [2, 3, 3]
+    np.testing.assert_allclose(index.compliance(starts, ends), [6 / 9, 4 / 7, 0])
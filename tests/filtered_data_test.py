@@ -1,22 +1,44 @@
+from collections import defaultdict
+
+import numpy as np
 import pandas as pd
 
-from logics.filter_data import remove_type_3, run_filter_flow
+from logics.filter_data import (
+    COUNT_COLUMNS,
+    COUNT_DTYPE,
+    WHEN_COLUMNS,
+    build_tables,
+    rating_columns,
+    remove_type_3,
+    remove_type_3_events,
+    response_dates,
+    run_filter_flow,
+    to_events,
+)
 
 
 def test_identical_keys():
+    # The reference daily counts hold the count columns, the ratings and time of day columns follow them
     test_df = pd.read_excel("memories_count.xlsx")
     df = run_filter_flow(pd.read_excel("Intrusions.xlsx"))
 
-    assert list(df) == list(test_df)
+    assert list(df) == list(test_df) + rating_columns() + WHEN_COLUMNS
 
 
 def test_df_values():
     test_df = pd.read_excel("memories_count.xlsx")
     df = run_filter_flow(pd.read_excel("Intrusions.xlsx"))
-    test_df["Date"] = pd.to_datetime(test_df["Date"]).dt.date
 
     for key in list(test_df):
-        assert list(df[key]) == list(test_df[key])
+        pd.testing.assert_series_equal(df[key], test_df[key], check_dtype=False)
+
+
+def test_run_filter_flow_writes_the_counts_to_the_given_path(tmp_path):
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"), str(tmp_path / "counts.xlsx"))
+
+    written = pd.read_excel(tmp_path / "counts.xlsx")
+    assert list(written) == list(df)
+    pd.testing.assert_series_equal(written["Count_Total"], df["Count_Total"], check_dtype=False)
 
 
 def test_remove_type_3():
@@ -27,3 +49,82 @@ def test_remove_type_3():
 
     for i in range(1, max_ideas + 1):
         assert not (df[f"{i}_Type"] == 3).any()
+
+
+def test_events_without_type_3():
+    original_df = pd.read_excel("Intrusions.xlsx").drop(0)
+    events = remove_type_3_events(to_events(original_df))
+    wide_df = remove_type_3(original_df.copy(), max(original_df["Amount"]))
+
+    assert not (events["Type"] == 3).any()
+    assert len(events) == wide_df.filter(like="_Content").notna().sum().sum()
+    assert list(events)[:3] == ["Response", "Date", "Idea"]
+
+
+def test_daily_ratings():
+    memories_df = pd.read_excel("Intrusions.xlsx")
+    events, daily = build_tables(memories_df)
+    events = events[events["Content"].isin([1, 2])].copy()
+    events["Day"] = response_dates(memories_df.drop(0)).to_numpy()[events["Response"]]
+    expected = events.groupby("Day")["Distress"].agg(["mean", "max", "count"])
+
+    rated = daily.set_index("Date").loc[expected.index]
+    assert list(rated["Distress_Rated_Total"]) == list(expected["count"])
+    assert list(rated["Distress_Max_Total"]) == list(expected["max"])
+    assert rated["Distress_Mean_Total"].round(5).tolist() == expected["mean"].astype(float).round(5).tolist()
+
+
+def expected_ratings_and_time_of_day() -> pd.DataFrame:
+    """Compute the daily ratings and time of day columns row by row from the wide export."""
+    export = pd.read_excel("Intrusions.xlsx").drop(0)
+    ideas = sorted({int(column.split("_")[0]) for column in export if column.endswith("_Content")})
+    ratings = defaultdict(list)
+    when = defaultdict(int)
+    days = set()
+    for _, row in export.iterrows():
+        day = pd.Timestamp(row["StartDate"]).normalize()
+        days.add(day)
+        for i in ideas:
+            content = pd.to_numeric(row[f"{i}_Content"], errors="coerce")
+            if pd.to_numeric(row[f"{i}_Type"], errors="coerce") == 3 or content not in (1, 2):
+                continue
+            splits = ["Total", "Target" if content == 1 else "Nontarget"]
+            for field in ["Distress", "Vividness"]:
+                rating = pd.to_numeric(row[f"{i}_{field}"], errors="coerce")
+                if not np.isnan(rating):
+                    for split in splits:
+                        ratings[day, field, split].append(rating)
+            code = pd.to_numeric(row[f"{i}_When"], errors="coerce")
+            if code in range(1, 7):
+                when[day, f"When_{int(code)}"] += 1
+
+    rows = []
+    for day in sorted(days):
+        row = {"Date": day}
+        for field in ["Distress", "Vividness"]:
+            for split in ["Target", "Nontarget", "Total"]:
+                values = ratings[day, field, split]
+                row[f"{field}_Mean_{split}"] = np.mean(values) if values else np.nan
+                row[f"{field}_Max_{split}"] = max(values) if values else np.nan
+                row[f"{field}_Rated_{split}"] = len(values)
+        row.update({column: when[day, column] for column in WHEN_COLUMNS})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def test_ratings_and_time_of_day_match_the_export():
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"))
+    expected = expected_ratings_and_time_of_day()
+
+    assert list(df["Date"]) == list(expected["Date"])
+    for column in rating_columns() + WHEN_COLUMNS:
+        np.testing.assert_allclose(df[column].to_numpy(float), expected[column].to_numpy(float), rtol=1e-6)
+
+
+def test_compact_dtypes():
+    events, daily = build_tables(pd.read_excel("Intrusions.xlsx"))
+
+    assert events["Type"].dtype == "category" and events["Type"].cat.codes.dtype == "int8"
+    assert events["Distress"].dtype == "float32"
+    assert daily["Date"].dtype == "datetime64[ns]"
+    assert (daily[COUNT_COLUMNS + WHEN_COLUMNS].dtypes == COUNT_DTYPE).all()
@@ -0,0 +1,70 @@
+import os
+import threading
+from datetime import date
+
+import matplotlib
+import pandas as pd
+import pytest
+
+matplotlib.use("Agg")
+
+import flow_control  # noqa: E402
+from errors import AnalysisCancelled  # noqa: E402
+from flow_control import run_reports  # noqa: E402
+from logics.filter_data import run_filter_flow  # noqa: E402
+
+DATES = [date(2023, 5, 8), date(2023, 5, 15), date(2023, 5, 22), date(2023, 5, 29), date(2023, 6, 5)]
+
+
+def test_parallel_outputs(tmp_path):
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)
+    fig = run_reports(df, DATES, str(tmp_path), show_graphs=False, parallel=True)
+
+    # Counts per day and per phase, then the distress and vividness row and the time of day row
+    assert len(fig.axes) == 12
+    outputs = sorted(name.split("-")[0] for name in os.listdir(tmp_path))
+    assert outputs == ["Weekly_Diary_Summary", "Weekly_Summary_zeros", "outputs_manifest.json", "visualizations"]
+
+
+def test_time_of_day_sheet(tmp_path):
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)
+    run_reports(df, DATES, str(tmp_path), show_graphs=False, parallel=False)
+
+    summary = next(name for name in os.listdir(tmp_path) if name.startswith("Weekly_Diary_Summary"))
+    sheet = pd.read_excel(tmp_path / summary, sheet_name="Time Of Day")
+    assert sheet["Phase"].iloc[-1] == "All"
+    assert sheet["When_1"].iloc[-1] == sheet["When_1"].iloc[:-1].sum()
+
+
+def test_statistics_flow_writes_the_counts_to_the_folder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = run_filter_flow(pd.read_excel(os.path.join(os.path.dirname(__file__), "Intrusions.xlsx")), None)
+    monkeypatch.setattr(flow_control, "daily_df", df)
+    (tmp_path / "out").mkdir()
+    flow_control.run_statistics_flow(DATES, str(tmp_path / "out"), show_graphs=False)
+
+    assert os.listdir(tmp_path) == ["out"]
+    counts = next(name for name in os.listdir(tmp_path / "out") if name.startswith("memories_count-"))
+    pd.testing.assert_series_equal(
+        pd.read_excel(tmp_path / "out" / counts)["Count_Total"], df["Count_Total"], check_dtype=False
+    )
+
+
+def test_cancel_stops_the_writers(tmp_path):
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(AnalysisCancelled):
+        run_reports(df, DATES, str(tmp_path), show_graphs=False, parallel=True, cancel=cancel)
+    assert "outputs_manifest.json" not in os.listdir(tmp_path)
+
+
+def test_progress_reaches_the_end(tmp_path):
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)
+    calls = []
+    run_reports(
+        df, DATES, str(tmp_path), show_graphs=False, parallel=False, graphs=False, progress=lambda *c: calls.append(c)
+    )
+
+    assert [index for index, _ in calls] == list(range(len(flow_control.STAGES) + 1))
@@ -0,0 +1,56 @@
+import pandas as pd
+
+from benchmarks.synthetic import generate_export, session_dates, write_export
+from logics import artifacts, incremental
+from logics.filter_data import build_tables
+from logics.loader import load_export
+from logics.phases import aggregate_outcomes
+
+
+def test_update_matches_rebuild(tmp_path):
+    export = generate_export(n_days=50, max_ideas=4, seed=3)
+    export_path = str(tmp_path / "export.csv")
+    state_folder = str(tmp_path / "state")
+    dates = session_dates()
+
+    # The first 30 days and a half of day 31, then the whole export
+    write_export(export.iloc[: 1 + 61], export_path)
+    daily, _, changed = incremental.update_patient(export_path, dates, state_folder)
+    assert changed
+    assert len(daily) == 31
+
+    write_export(export, export_path)
+    daily, phase_df, changed = incremental.update_patient(export_path, dates, state_folder)
+    assert changed
+
+    expected_daily = build_tables(load_export(export_path))[1]
+    pd.testing.assert_frame_equal(daily, expected_daily, check_dtype=False)
+    pd.testing.assert_frame_equal(phase_df, aggregate_outcomes(expected_daily, dates), check_dtype=False)
+
+    _, _, changed = incremental.update_patient(export_path, dates, state_folder)
+    assert not changed
+
+
+def test_changed_dates(tmp_path):
+    export_path = str(tmp_path / "export.csv")
+    write_export(generate_export(n_days=50, max_ideas=4, seed=3), export_path)
+    state_folder = str(tmp_path / "state")
+    incremental.update_patient(export_path, session_dates(), state_folder)
+
+    dates = [date + pd.Timedelta(days=1) for date in session_dates()]
+    daily, phase_df, changed = incremental.update_patient(export_path, dates, state_folder)
+
+    assert changed
+    pd.testing.assert_frame_equal(phase_df, aggregate_outcomes(daily, dates), check_dtype=False)
+
+
+def test_new_phase_code_rebuilds_the_state(tmp_path, monkeypatch):
+    export_path = str(tmp_path / "export.csv")
+    write_export(generate_export(n_days=50, max_ideas=4, seed=3), export_path)
+    state_folder = str(tmp_path / "state")
+    incremental.update_patient(export_path, session_dates(), state_folder)
+
+    monkeypatch.setattr(artifacts, "pipeline_version", lambda: "changed")
+    _, _, changed = incremental.update_patient(export_path, session_dates(), state_folder)
+
+    assert changed
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from logics.filter_data import run_filter_flow
+from logics.loader import load_export
+
+
+def test_used_columns_only():
+    df = load_export("Intrusions.xlsx", include_details=False)
+
+    assert list(df)[:2] == ["StartDate", "Amount"]
+    assert all(col.endswith(("_Type", "_Content")) for col in list(df)[2:])
+    assert df["Amount"].dtype == "uint16"
+    assert df["1_Content"].dtype == "float32"
+
+
+def test_metadata_row_skipped():
+    df = load_export("Intrusions.xlsx")
+
+    assert len(df) == len(pd.read_excel("Intrusions.xlsx")) - 1
+    assert pd.api.types.is_datetime64_any_dtype(df["StartDate"])
+
+
+def test_same_counts_as_raw_export(tmp_path):
+    expected = run_filter_flow(pd.read_excel("Intrusions.xlsx"))
+    csv_path = str(tmp_path / "Intrusions.csv")
+    pd.read_excel("Intrusions.xlsx").to_csv(csv_path, index=False)
+
+    for path in ["Intrusions.xlsx", csv_path]:
+        df = run_filter_flow(load_export(path))
+        for key in list(expected):
+            pd.testing.assert_series_equal(df[key], expected[key], check_dtype=False)
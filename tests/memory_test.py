@@ -0,0 +1,14 @@
+import pandas as pd
+
+from logics.memory import memory_report
+
+
+def test_memory_report_per_column_and_total():
+    before = pd.DataFrame({"Count": [1, 2, 3, 4], "Code": [1.0, 2.0, 1.0, None]})
+    after = before.astype({"Count": "uint16", "Code": "float32"})
+    report = memory_report(before, after).set_index("Column")
+
+    assert report.loc["Count", "Bytes Before"] == 4 * report.loc["Count", "Bytes After"]
+    assert report.loc["Code", "Dtype After"] == "float32"
+    assert report.loc["Total", "Bytes Before"] == before.memory_usage(deep=True).sum()
+    assert report.loc["Total", "Ratio"] > 1
@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from logics.output_writer import write_tables, write_workbook
+
+
+def make_table():
+    return pd.DataFrame(
+        {
+            "Date": pd.to_datetime(["2023-05-01", "2023-05-02", "2023-05-04"]),
+            "Count_Total": np.array([1, 0, 3], dtype="uint16"),
+            "Distress_Mean_Total": [2.5, np.nan, 4.0],
+            "Phase": ["Baseline", "Session 1", "Session 1"],
+        }
+    )
+
+
+def test_workbook_sheets_round_trip(tmp_path):
+    df = make_table()
+    write_workbook({"Daily Counts": df, "Phases": df[["Phase"]]}, str(tmp_path / "out.xlsx"))
+
+    sheets = pd.read_excel(tmp_path / "out.xlsx", sheet_name=None)
+    assert list(sheets) == ["Daily Counts", "Phases"]
+    pd.testing.assert_frame_equal(sheets["Daily Counts"], df, check_dtype=False)
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "csv"])
+def test_tables_one_file_each(tmp_path, output_format):
+    df = make_table()
+    write_tables({"Daily Counts": df, "Zero Days": df.head(1)}, str(tmp_path), "0123456789ab", output_format)
+
+    assert sorted(os.listdir(tmp_path)) == [
+        f"Daily_Counts-0123456789ab.{output_format}",
+        f"Zero_Days-0123456789ab.{output_format}",
+    ]
+    path = tmp_path / f"Daily_Counts-0123456789ab.{output_format}"
+    read = pd.read_parquet(path) if output_format == "parquet" else pd.read_csv(path, parse_dates=["Date"])
+    pd.testing.assert_frame_equal(read, df, check_dtype=False)
@@ -0,0 +1,88 @@
+from datetime import date
+
+import pandas as pd
+
+from logics.phases import aggregate_compliance, aggregate_phases, aggregate_ratings, aggregate_time_of_day
+
+DATES = [date(2023, 5, 8), date(2023, 5, 15), date(2023, 5, 22)]
+
+
+def make_daily_df():
+    days = pd.date_range("2023-04-28", "2023-06-01").date
+    df = pd.DataFrame({"Date": days})
+    df["Count_Target"] = [i % 3 for i in range(len(days))]
+    df["Count_Nontarget"] = [i % 2 for i in range(len(days))]
+    df["Count_Total"] = df["Count_Target"] + df["Count_Nontarget"]
+    return df
+
+
+def test_phase_boundaries():
+    phases = aggregate_phases(make_daily_df(), DATES)
+
+    assert len(phases) == len(DATES) + 1
+    assert list(phases["Gap Between Sessions"]) == [7, 7, 7, 7]
+    assert phases["Start Date"].iloc[0] == pd.Timestamp("2023-05-01")
+    assert phases["End Date"].iloc[-1] == pd.Timestamp("2023-05-29")
+
+
+def test_matches_masked_sums():
+    df = make_daily_df()
+    phases = aggregate_phases(df, DATES)
+    dates = pd.to_datetime(df["Date"])
+
+    for _, row in phases.iterrows():
+        window = df[(dates >= row["Start Date"]) & (dates < row["End Date"])]
+        for column in ["Count_Target", "Count_Nontarget", "Count_Total"]:
+            assert row[f"Sum_{column}"] == window[column].sum()
+            assert row[f"Zeros_{column}"] == (window[column] == 0).sum()
+            assert row[f"Mean_{column}"] == window[column].mean()
+            assert row[f"Average_{column}"] == window[column].sum() / row["Gap Between Sessions"]
+
+
+def test_missing_days():
+    df = make_daily_df()
+    df = df[pd.to_datetime(df["Date"]) >= pd.Timestamp("2023-05-15")]
+    phases = aggregate_phases(df, DATES)
+
+    assert list(phases["Days Reported"]) == [0, 0, 7, 7]
+    assert phases["Sum_Count_Total"].iloc[0] == 0
+
+
+def test_ratings_weighted_by_counts():
+    df = make_daily_df()
+    df["Distress_Mean_Total"] = [float(i % 5) if i % 4 else float("nan") for i in range(len(df))]
+    df["Distress_Max_Total"] = df["Distress_Mean_Total"] + 1
+    df["Distress_Rated_Total"] = [i % 3 + 1 if i % 4 else 0 for i in range(len(df))]
+    phases = aggregate_ratings(df, DATES)
+
+    days = pd.to_datetime(df["Date"])
+    in_phase = df[(days >= "2023-05-08") & (days < "2023-05-15")]
+    weighted = (in_phase["Distress_Mean_Total"] * in_phase["Distress_Rated_Total"]).sum()
+    assert phases["Distress_Mean_Total"].iloc[1] == weighted / in_phase["Distress_Rated_Total"].sum()
+    assert phases["Distress_Max_Total"].iloc[1] == in_phase["Distress_Max_Total"].max()
+    assert phases["Distress_Daily_Mean_Total"].iloc[1] == in_phase["Distress_Mean_Total"].mean()
+    assert "Vividness_Mean_Total" not in phases
+
+
+def test_time_of_day():
+    df = make_daily_df()
+    for code in range(1, 7):
+        df[f"When_{code}"] = [(i + code) % 3 for i in range(len(df))]
+    phases = aggregate_time_of_day(df, DATES)
+
+    days = pd.to_datetime(df["Date"])
+    in_phase = df[(days >= "2023-05-15") & (days < "2023-05-22")]
+    assert phases["When_4"].iloc[2] == in_phase["When_4"].sum()
+    shares = phases.filter(like="When_Share_")
+    assert shares.sum(axis=1).round(9).tolist() == [1.0] * (len(DATES) + 1)
+
+
+def test_compliance_counts_skipped_days_as_missed():
+    df = make_daily_df()
+    skipped = df[df["Date"].isin([date(2023, 5, 2), date(2023, 5, 3), date(2023, 5, 16)])].index
+    df = df.drop(skipped)
+    phases = aggregate_compliance(df, DATES)
+
+    assert list(phases["Days Missed"]) == [2, 0, 1, 0]
+    assert list(phases["Longest Missed Run"]) == [2, 0, 1, 0]
+    assert list(phases["Compliance"]) == [5 / 7, 1, 6 / 7, 1]
@@ -0,0 +1,59 @@
+import io
+import re
+from datetime import date
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+from logics.filter_data import run_filter_flow  # noqa: E402
+from logics.report import PageRenderer, write_report  # noqa: E402
+
+DATES = [date(2023, 5, 8), date(2023, 5, 15), date(2023, 5, 22), date(2023, 5, 29), date(2023, 6, 5)]
+
+
+def count_pages(pdf_path) -> int:
+    with open(pdf_path, "rb") as file:
+        return len(re.findall(rb"/Type /Page\b", file.read()))
+
+
+def to_pixels(fig) -> np.ndarray:
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=40)
+    return plt.imread(io.BytesIO(buffer.getvalue()))
+
+
+def test_reused_page_matches_first_draw():
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)
+    other = df.iloc[::2].copy()
+    other["Count_Total"] *= 5
+
+    renderer = PageRenderer()
+    expected = to_pixels(renderer.draw("139", other, DATES))
+    renderer.draw("140", df, DATES)
+    result = to_pixels(renderer.draw("139", other, DATES))
+    renderer.close()
+
+    # Nothing of the previous patient is left on the reused axes
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_write_report(tmp_path):
+    df = run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)
+    counts_only = df[["Date", "Count_Target", "Count_Nontarget", "Count_Total"]]
+    patients = {"139": (df, DATES), "140": (counts_only, DATES), "141": (df, DATES)}
+
+    write_report(patients, str(tmp_path / "vector.pdf"), workers=2)
+    write_report(patients, str(tmp_path / "merged.pdf"), workers=2, raster=True)
+
+    assert count_pages(tmp_path / "vector.pdf") == 3
+    assert count_pages(tmp_path / "merged.pdf") == 3
+    # The vector pages keep their text, the merged pages are images
+    with open(tmp_path / "vector.pdf", "rb") as file:
+        assert b"/Type /Font" in file.read()
+    with open(tmp_path / "merged.pdf", "rb") as file:
+        assert b"/Type /Font" not in file.read()
@@ -0,0 +1,100 @@
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date
+
+import pytest
+
+import server
+from server import AnalysisService, make_server
+
+SESSIONS = "2023-05-08,2023-05-15,2023-05-22,2023-05-29,2023-06-05"
+
+
+@pytest.fixture
+def base_url(tmp_path):
+    service = AnalysisService(str(tmp_path / "jobs"), workers=1, cache_folder=str(tmp_path / "cache"))
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def submit(base_url, dates):
+    with open("Intrusions.xlsx", "rb") as file:
+        request = urllib.request.Request(f"{base_url}/jobs?dates={dates}&format=xlsx", data=file.read())
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def test_job(base_url):
+    job = submit(base_url, SESSIONS)
+    for _ in range(120):
+        with urllib.request.urlopen(f"{base_url}/jobs/{job['job']}") as response:
+            status = json.load(response)
+        if status["status"] != "queued":
+            break
+        time.sleep(0.5)
+    assert status["status"] == "done", status["error"]
+    assert len(status["files"]) == 4
+    assert "outputs_manifest.json" not in status["files"]
+
+    with urllib.request.urlopen(f"{base_url}/jobs/{job['job']}/aggregates") as response:
+        aggregates = json.load(response)
+    assert [phase["Phase"] for phase in aggregates["phases"]][0] == "Baseline"
+
+    pdf = next(name for name in status["files"] if name.endswith(".pdf"))
+    with urllib.request.urlopen(f"{base_url}/jobs/{job['job']}/files/{pdf}") as response:
+        assert response.read(4) == b"%PDF"
+
+    # The same export and dates give the same job
+    assert submit(base_url, SESSIONS)["job"] == job["job"]
+
+
+def test_dates_not_in_order(base_url):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        submit(base_url, "2023-05-15,2023-05-08")
+    assert error.value.code == 400
+
+
+def test_body_over_the_limit(tmp_path):
+    service = AnalysisService(str(tmp_path / "jobs"), workers=1, cache_folder=None, max_body_bytes=1024)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    try:
+        # Refused from the header alone, before the body is sent
+        connection.putrequest("POST", f"/jobs?dates={SESSIONS}&format=xlsx")
+        connection.putheader("Content-Length", str(10**9))
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 413
+        assert not os.listdir(tmp_path / "jobs")
+    finally:
+        connection.close()
+        server.shutdown()
+        server.server_close()
+        service.shutdown()
+
+
+def test_new_output_code_gives_a_new_job(tmp_path, monkeypatch):
+    service = AnalysisService(str(tmp_path / "jobs"), workers=1, cache_folder=None)
+    with open("Intrusions.xlsx", "rb") as file:
+        content = file.read()
+    dates = [date.fromisoformat(d) for d in SESSIONS.split(",")]
+    try:
+        first = service.submit(content, dates, "xlsx")
+        assert service.submit(content, dates, "xlsx")["job"] == first["job"]
+
+        monkeypatch.setattr(server.artifacts, "pipeline_version", lambda: "changed")
+        assert service.submit(content, dates, "xlsx")["job"] != first["job"]
+    finally:
+        service.shutdown()
@@ -0,0 +1,16 @@
+from memorydiary.__main__ import COMMANDS
+from memorydiary.startup import HEADLESS_COMMANDS, import_times, loaded_heavy_modules
+
+
+def test_headless_commands_do_not_load_plotting_libraries():
+    for command in HEADLESS_COMMANDS:
+        assert loaded_heavy_modules(COMMANDS[command]) == []
+
+
+def test_import_times_nest_under_the_module():
+    times = import_times("batch")
+
+    assert times[-1]["module"] == "batch" and times[-1]["level"] == 0
+    pandas = next(row for row in times if row["module"] == "pandas")
+    assert pandas["level"] == 1
+    assert 0 < pandas["self_ms"] <= pandas["cumulative_ms"] <= times[-1]["cumulative_ms"]
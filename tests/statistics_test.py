@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_export, session_dates
+from logics.cohort import build_cohort, cohort_phases
+from logics.filter_data import build_tables
+from logics.statistics import (
+    cohens_d,
+    cohort_effects,
+    cohort_patient_effects,
+    compare,
+    patient_effects,
+)
+
+N_RESAMPLES = 2000
+
+
+def test_compare_separated_samples():
+    rng = np.random.default_rng(1)
+    baseline = rng.normal(10, 1, 14)
+    phase = rng.normal(5, 1, 14)
+    result = compare(baseline, phase, rng, N_RESAMPLES)
+
+    assert result["Difference"] == pytest.approx(phase.mean() - baseline.mean())
+    assert result["CI Low"] < result["Difference"] < result["CI High"] < 0
+    assert result["p-value"] == pytest.approx(1 / (N_RESAMPLES + 1))
+    assert result["Effect Size"] == pytest.approx(cohens_d(baseline, phase))
+
+
+def test_compare_same_distribution():
+    rng = np.random.default_rng(2)
+    baseline = rng.poisson(3, 200).astype(float)
+    p_values = [compare(baseline, rng.permutation(baseline), rng, N_RESAMPLES)["p-value"] for _ in range(3)]
+
+    assert min(p_values) > 0.9
+
+
+def test_compare_paired():
+    rng = np.random.default_rng(3)
+    baseline = rng.normal(10, 3, 12)
+    result = compare(baseline, baseline - 2 + rng.normal(0, 0.1, 12), rng, N_RESAMPLES, paired=True)
+
+    assert result["CI Low"] < -1.8 and result["CI High"] > -2.2 and result["CI High"] < 0
+    assert result["p-value"] < 0.01
+    assert result["Effect Size"] < -5
+
+
+def test_compare_empty_phase():
+    result = compare(np.array([1.0, 2.0]), np.array([]), np.random.default_rng(), N_RESAMPLES)
+
+    assert result["N Phase"] == 0
+    assert np.isnan(result["Difference"]) and np.isnan(result["p-value"])
+
+
+def make_cohort():
+    frames, sessions = {}, {}
+    for i in range(3):
+        start = date(2023, 1, 1) + timedelta(days=i)
+        frames[f"P{i}"] = build_tables(generate_export(50, 4, seed=i, start=start))[1]
+        sessions[f"P{i}"] = session_dates(start)
+    return frames, sessions
+
+
+def test_patient_effects():
+    frames, sessions = make_cohort()
+    df = frames["P0"]
+    effects = patient_effects(df, sessions["P0"], ["Count_Total"], N_RESAMPLES)
+    dates = pd.to_datetime(df["Date"])
+    first = pd.Timestamp(sessions["P0"][0])
+    baseline = df.loc[(dates >= first - pd.Timedelta(days=7)) & (dates < first), "Count_Total"]
+
+    assert list(effects["Phase"]) == ["Session 1", "Session 2", "Session 3", "Session 4", "Post"]
+    assert (effects["Baseline Mean"] == baseline.mean()).all()
+    assert ((effects["p-value"] > 0) & (effects["p-value"] <= 1)).all()
+    pd.testing.assert_frame_equal(effects, patient_effects(df, sessions["P0"], ["Count_Total"], N_RESAMPLES))
+
+
+def test_cohort_effects():
+    frames, sessions = make_cohort()
+    patient_phases = cohort_phases(build_cohort(frames), sessions)
+    effects = cohort_effects(patient_phases, n_resamples=N_RESAMPLES)
+    means = patient_phases.pivot(index="Patient", columns="Phase", values="Mean_Count_Total")
+    post = effects[(effects["Count"] == "Count_Total") & (effects["Phase"] == "Post")].iloc[0]
+
+    assert len(effects) == 3 * 5
+    assert post["N Phase"] == 3
+    assert post["Difference"] == pytest.approx((means["Post"] - means["Baseline"]).mean())
+
+
+def test_patient_effects_do_not_depend_on_workers():
+    frames, sessions = make_cohort()
+    one = cohort_patient_effects(frames, sessions, n_resamples=N_RESAMPLES, workers=1)
+    two = cohort_patient_effects(frames, sessions, n_resamples=N_RESAMPLES, workers=2)
+
+    assert list(one["Patient"].unique()) == ["P0", "P1", "P2"]
+    pd.testing.assert_frame_equal(one, two)
@@ -0,0 +1,67 @@
+import sqlite3
+from datetime import date, timedelta
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_export, session_dates
+from logics import store
+from logics.cohort import build_cohort, cohort_phases
+from logics.filter_data import build_tables
+from logics.phases import aggregate_phases
+
+
+def fill_store(db_path):
+    connection = store.connect(db_path)
+    frames, sessions = {}, {}
+    for i in range(3):
+        start = date(2023, 1, 1) + timedelta(days=i)
+        events, daily = build_tables(generate_export(50, 4, seed=i, start=start))
+        frames[f"P{i}"], sessions[f"P{i}"] = daily, session_dates(start)
+        store.put_patient(connection, f"P{i}", daily, events, sessions[f"P{i}"])
+    return connection, frames, sessions
+
+
+def test_round_trip(tmp_path):
+    connection, frames, sessions = fill_store(str(tmp_path / "store.db"))
+
+    # Every column of the daily counts, the ratings and time of day included, comes back with its dtype
+    pd.testing.assert_frame_equal(store.read_daily(connection, "P1"), frames["P1"])
+    assert store.read_sessions(connection) == sessions
+    window = store.read_daily(connection, "P1", date(2023, 1, 10), date(2023, 1, 20))
+    assert len(window) == 10
+
+    # Replacing a patient does not duplicate its rows
+    store.put_patient(connection, "P1", frames["P1"])
+    assert connection.execute("SELECT COUNT(*) FROM daily WHERE Patient = 'P1'").fetchone()[0] == 50
+    events = connection.execute("SELECT COUNT(*) FROM events WHERE Patient = 'P1'").fetchone()[0]
+    assert events == frames["P1"]["Count_Total"].sum()
+
+
+def test_phases(tmp_path):
+    connection, frames, sessions = fill_store(str(tmp_path / "store.db"))
+
+    expected = aggregate_phases(frames["P2"], sessions["P2"])
+    pd.testing.assert_frame_equal(
+        store.patient_phases(connection, "P2", sessions["P2"]), expected, check_dtype=False
+    )
+    pd.testing.assert_frame_equal(
+        store.query_phases(connection, sessions),
+        cohort_phases(build_cohort(frames), sessions),
+        check_dtype=False,
+    )
+
+
+def test_old_store_gets_the_new_columns(tmp_path):
+    db_path = str(tmp_path / "store.db")
+    old = sqlite3.connect(db_path)
+    old.execute(
+        "CREATE TABLE daily (Patient TEXT NOT NULL, Date TEXT NOT NULL, Count_Target INTEGER NOT NULL, "
+        "Count_Nontarget INTEGER NOT NULL, Count_Total INTEGER NOT NULL, PRIMARY KEY (Patient, Date)) WITHOUT ROWID"
+    )
+    old.close()
+    _, daily = build_tables(generate_export(20, 4, seed=0))
+
+    connection = store.connect(db_path)
+    store.put_patient(connection, "P0", daily)
+
+    pd.testing.assert_frame_equal(store.read_daily(connection, "P0"), daily)
@@ -0,0 +1,21 @@
+import pandas as pd
+
+from benchmarks.synthetic import generate_export, write_export
+from logics.filter_data import run_filter_flow
+from logics.loader import load_export
+
+
+def test_generated_export(tmp_path):
+    df = generate_export(n_days=30, max_ideas=4, seed=1)
+    file_path = str(tmp_path / "export.csv")
+    write_export(df, file_path)
+
+    loaded = load_export(file_path)
+    assert len(loaded) == len(df) - 1
+    assert loaded["Amount"].max() <= 4
+
+    daily = run_filter_flow(loaded, None)
+    assert len(daily) == 30
+    types = pd.concat([loaded[f"{i}_Type"] for i in range(1, 5)])
+    contents = pd.concat([loaded[f"{i}_Content"] for i in range(1, 5)])
+    assert daily["Count_Target"].sum() == ((types != 3) & (contents == 1)).sum()
@@ -0,0 +1,41 @@
+import json
+import os
+
+import pandas as pd
+
+from logics import trace
+from logics.filter_data import run_filter_flow
+
+
+def test_stages_recorded(tmp_path):
+    trace_path = str(tmp_path / "trace.json")
+    profile_path = str(tmp_path / "groupby.prof")
+    with trace.recording(trace_path, "groupby", profile_path):
+        run_filter_flow(pd.read_excel("Intrusions.xlsx"), None)
+
+    with open(trace_path) as file:
+        recorded = json.load(file)
+    stages = [record["stage"] for record in recorded["stages"]]
+    assert stages == ["drop metadata rows", "to events", "remove type 3", "counting", "groupby"]
+    assert recorded["stages"][0]["rows"] == 105
+    assert all(record["wall_seconds"] >= 0 for record in recorded["stages"])
+    assert recorded["profiles"] == [str(tmp_path / "groupby-1.prof")]
+    assert os.path.isfile(recorded["profiles"][0])
+    assert all(record["peak_rss_growth_mb"] >= 0 for record in recorded["stages"])
+
+
+def test_repeated_stage_keeps_every_profile(tmp_path):
+    with trace.recording(None, "load", str(tmp_path / "load.prof")) as recorded:
+        for _ in range(2):
+            with trace.stage("load"):
+                pass
+        trace.call_in_stage(trace.settings(), "load", sum, [1, 2])
+
+    assert recorded["profiles"] == [str(tmp_path / "load-1.prof"), str(tmp_path / "load-2.prof")]
+    assert sorted(os.listdir(tmp_path)) == ["load-1.prof", "load-2.prof", "load-load-1.prof"]
+
+
+def test_no_recording():
+    with trace.stage("load") as record:
+        record["rows"] = 1
+    assert trace.settings() is None
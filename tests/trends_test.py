@@ -0,0 +1,102 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from logics.cohort import build_cohort
+from logics.phases import phase_labels
+from logics.trends import TREND_COLUMNS, cohort_trends, ewma, fit_lines, fit_trends, phase_trends, rolling_mean
+
+COLUMNS = ["Count_Target", "Count_Nontarget", "Count_Total"]
+SKIPPED = [date(2023, 5, 3), date(2023, 5, 10), date(2023, 5, 11)]
+TREATMENT_DATES = [date(2023, 5, 8), date(2023, 5, 15)]
+
+
+def make_daily_df(start="2023-05-01", days=24, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = [d for d in pd.date_range(start, periods=days).date if d not in SKIPPED]
+    df = pd.DataFrame({"Date": dates})
+    df["Count_Target"] = rng.integers(0, 5, len(dates))
+    df["Count_Nontarget"] = rng.integers(0, 3, len(dates))
+    df["Count_Total"] = df["Count_Target"] + df["Count_Nontarget"]
+    return df
+
+
+def offsets(dates) -> np.ndarray:
+    dates = pd.to_datetime(pd.Series(dates))
+    return (dates - dates.min()).dt.days.to_numpy()
+
+
+def test_fit_trends_matches_polyfit():
+    df = make_daily_df()
+    trends = fit_trends(df, COLUMNS).set_index("Count")
+
+    assert list(trends.reset_index().columns) == TREND_COLUMNS
+    for column in COLUMNS:
+        slope, intercept = np.polyfit(offsets(df["Date"]), df[column], 1)
+        assert np.isclose(trends.loc[column, "Slope"], slope)
+        assert np.isclose(trends.loc[column, "Intercept"], intercept)
+        assert trends.loc[column, "Days"] == len(df)
+
+
+def test_fit_lines_edge_cases():
+    y = np.array([[1.0, np.nan], [3.0, np.nan], [5.0, 2.0], [7.0, np.nan]])
+    slopes, intercepts, n = fit_lines(np.array([0, 1, 2, 3]), y, np.array([0, 0, 0, -1]), 3)
+
+    assert np.allclose(slopes[0], [2.0, 0.0])
+    assert np.allclose(intercepts[0], [1.0, 2.0])
+    assert n[0].tolist() == [3, 1]
+    # A group without rows has no line
+    assert np.isnan(slopes[1:]).all() and np.isnan(intercepts[1:]).all()
+    assert n[1:].sum() == 0
+
+
+def test_phase_trends_fit_every_phase_separately():
+    df = make_daily_df()
+    trends = phase_trends(df, TREATMENT_DATES, COLUMNS)
+    labels = phase_labels(len(TREATMENT_DATES))
+
+    assert list(trends.columns) == ["Phase"] + TREND_COLUMNS
+    assert list(dict.fromkeys(trends["Phase"])) == ["All"] + labels
+    x = offsets(df["Date"])
+    edges = pd.to_datetime(["2023-05-01", "2023-05-08", "2023-05-15", "2023-05-22"])
+    dates = pd.to_datetime(df["Date"])
+    for label, start, end in zip(labels, edges[:-1], edges[1:]):
+        mask = ((dates >= start) & (dates < end)).to_numpy()
+        row = trends[(trends["Phase"] == label) & (trends["Count"] == "Count_Total")].iloc[0]
+        slope, intercept = np.polyfit(x[mask], df.loc[mask, "Count_Total"], 1)
+        assert row["Days"] == mask.sum()
+        assert np.isclose(row["Slope"], slope)
+        assert np.isclose(row["Intercept"], intercept)
+
+
+def test_cohort_trends_match_every_patient():
+    frames = {"a": make_daily_df(seed=1), "b": make_daily_df("2023-06-01", 30, seed=2), "c": make_daily_df(seed=3)}
+    trends = cohort_trends(build_cohort(frames), COLUMNS)
+
+    assert list(trends.columns) == ["Patient"] + TREND_COLUMNS
+    assert len(trends) == len(frames) * len(COLUMNS)
+    for patient, df in frames.items():
+        expected = fit_trends(df, COLUMNS)
+        actual = trends[trends["Patient"] == patient].drop(columns="Patient").reset_index(drop=True)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_rolling_mean_skips_missed_days():
+    df = make_daily_df()
+    smoothed = rolling_mean(df, COLUMNS, window=3)
+    dates = pd.to_datetime(df["Date"])
+
+    assert len(smoothed) == len(df)
+    for i, day in enumerate(dates):
+        window = df.loc[((dates > day - pd.Timedelta(days=3)) & (dates <= day)).to_numpy(), "Count_Target"]
+        assert np.isclose(smoothed["Count_Target"].iloc[i], window.mean())
+
+
+def test_ewma_of_constant_counts():
+    df = make_daily_df()
+    df[COLUMNS] = 2
+    smoothed = ewma(df, COLUMNS)
+
+    assert list(smoothed.columns) == ["Date"] + COLUMNS
+    assert np.allclose(smoothed[COLUMNS], 2.0)
@@ -2,8 +2,10 @@ from datetime import datetime
 
 import pytest
 
-from errors import DateBeforeDataDates
-from logics.validators import validate_range
+from benchmarks.synthetic import generate_export, write_export
+from errors import DateBeforeDataDates, DatesNotInOrder, InvalidExport
+from logics.loader import load_export
+from logics.validators import check_export, validate_export, validate_order, validate_range
 
 DATES = [
     datetime.strptime("2023/07/02", "%Y/%m/%d").date(),
@@ -20,3 +22,51 @@ def test_invalid_dates():
     smallest_date = datetime.strptime("2023/07/03", "%Y/%m/%d").date()
     with pytest.raises(DateBeforeDataDates):
         validate_range(DATES, smallest_date)
+
+
+def test_dates_not_in_order():
+    assert validate_order(DATES) is None
+    with pytest.raises(DatesNotInOrder):
+        validate_order(DATES[::-1])
+
+
+def make_export():
+    return generate_export(n_days=10, max_ideas=4, seed=2).iloc[1:].reset_index(drop=True)
+
+
+def test_valid_export():
+    report = check_export(make_export())
+    assert list(report.columns) == ["Check", "Column", "Severity", "Rows", "Example Responses"]
+    assert report.empty
+
+
+def test_invalid_export():
+    df = make_export()
+    reported = df.index[df["Amount"] > 0]
+    df.loc[reported[0], "1_Content"] = 7
+    df.loc[reported[1], "Amount"] = df.loc[reported[1], "Amount"] + 1
+    df.loc[3, "StartDate"] = "yesterday"
+    df = df.drop(columns="2_Type")
+
+    report = check_export(df).set_index("Check")
+    assert report.loc["out of domain", "Column"] == "N_Content"
+    assert report.loc["out of domain", "Example Responses"] == str(reported[0] + 1)
+    assert report.loc["amount mismatch", "Rows"] >= 1
+    assert report.loc["unparseable date", "Rows"] == 1
+    assert report.loc["missing idea column", "Column"] == "2_Type"
+
+    with pytest.raises(InvalidExport):
+        validate_export(df)
+
+
+def test_invalid_csv_export(tmp_path):
+    df = generate_export(n_days=10, max_ideas=4, seed=2)
+    df.loc[5, "Amount"] = "many"
+    file_path = str(tmp_path / "export.csv")
+    write_export(df, file_path)
+
+    with pytest.raises(InvalidExport) as error:
+        load_export(file_path)
+    report = error.value.args[1].set_index("Check")
+    assert report.loc["not a number", "Column"] == "Amount"
+    assert report.loc["not a number", "Example Responses"] == "5"
@@ -0,0 +1,77 @@
+import os
+import shutil
+
+import pandas as pd
+
+from watcher import LOG_FILE, ExportWatcher
+
+SESSIONS = "2023-05-08,2023-05-15,2023-05-22,2023-05-29,2023-06-05"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_watcher(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(f"patient,session_1,session_2,session_3,session_4,session_5\n139,{SESSIONS}\n")
+    out = tmp_path / "out"
+    clock = FakeClock()
+
+    with ExportWatcher(str(exports), str(manifest), str(out), settle=10, cache_folder=None, clock=clock) as watcher:
+        shutil.copy("Intrusions.xlsx", exports / "139.xlsx")
+        shutil.copy("Intrusions.xlsx", exports / "140.xlsx")
+        watcher.poll()
+        # Not settled yet
+        assert not watcher.pending and not watcher.queue
+
+        clock.now = 11
+        watcher.poll()
+        assert len(watcher.pending) == 1
+        watcher.drain()
+
+        # Same content rewritten: skipped by hash
+        shutil.copy("Intrusions.xlsx", exports / "139.xlsx")
+        os.utime(exports / "139.xlsx", ns=(1, 1))
+        watcher.poll()
+        clock.now = 22
+        watcher.poll()
+        assert not watcher.pending and not watcher.queue
+
+        # New treatment dates in the manifest: the same content is analyzed again
+        moved = SESSIONS.replace("2023-05-08", "2023-05-09")
+        manifest.write_text(f"patient,session_1,session_2,session_3,session_4,session_5\n139,{moved}\n")
+        os.utime(manifest, ns=(2, 2))
+        watcher.poll()
+        assert len(watcher.pending) == 1
+        watcher.drain()
+
+    log = pd.read_csv(out / LOG_FILE)
+    assert log["patient"].tolist() == [139, 139]
+    assert log["status"].tolist() == ["ok", "ok"]
+    assert len(os.listdir(out / "139")) == 5
+
+
+def test_queue_keeps_one_entry_per_export(tmp_path):
+    exports = tmp_path / "exports"
+    exports.mkdir()
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(f"patient,session_1,session_2,session_3,session_4,session_5\n139,{SESSIONS}\n")
+    clock = FakeClock()
+
+    watcher = ExportWatcher(str(exports), str(manifest), str(tmp_path / "out"), cache_folder=None, clock=clock)
+    watcher.reload_manifest()
+    path = str(exports / "139.xlsx")
+    for size in [1, 2, 3]:
+        (exports / "139.xlsx").write_bytes(b"x" * size)
+        watcher.seen = {path: ((size, size), 0)}
+        watcher.enqueue([path])
+
+    assert list(watcher.queue) == [path]
+    assert watcher.queue[path] == watcher.job_digest(path, "139")
@@ -1,13 +1,192 @@
-from tkinter import Button, Label, Tk, filedialog, messagebox
+import queue
+import threading
+from tkinter import Button, Label, Tk, Toplevel, filedialog, messagebox
+from tkinter.ttk import Progressbar
 
-import pandas as pd
-from tkcalendar import DateEntry
+import matplotlib
 
-import flow_control
-from errors import DateBeforeDataDates
+matplotlib.use("Agg")
+
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg  # noqa: E402
+from tkcalendar import DateEntry  # noqa: E402
+
+import flow_control  # noqa: E402
+from errors import AnalysisCancelled, DateBeforeDataDates, InvalidExport, MissingColumns  # noqa: E402
+from logics import cache  # noqa: E402
+
+POLL_INTERVAL_MS = 100
 
 file_selected = False
 folder_path = None
+busy = False
+results = queue.Queue()
+cancel_event = threading.Event()
+
+
+def run_in_background(target, *args, cancellable: bool = False):
+    """
+    Run a function on a worker thread and put its outcome on the results queue.
+
+    The queue is read on the UI thread by poll_results, so the worker never touches Tk widgets.
+
+    Args:
+        target: The function to run. Its name tags the outcome.
+        *args: The arguments of the function.
+        cancellable (bool): Whether the function checks the cancel event, so 'Cancel' is enabled while it runs.
+
+    Returns:
+        None
+    """
+    global busy
+
+    def work():
+        try:
+            results.put((target.__name__, target(*args), None))
+        except Exception as e:
+            results.put((target.__name__, None, e))
+
+    busy = True
+    cancel_event.clear()
+    set_buttons_state("disabled", cancellable)
+    threading.Thread(target=work, daemon=True).start()
+
+
+def report_progress(index: int, stage: str):
+    """
+    Progress callback of the analysis, called on the worker thread before every stage and once it is done.
+
+    Args:
+        index (int): The index of the stage, len(flow_control.STAGES) when the analysis is done.
+        stage (str): The name of the stage.
+
+    Raises:
+        AnalysisCancelled: If the user pressed 'Cancel', so no output is left half written.
+
+    Returns:
+        None
+    """
+    if cancel_event.is_set():
+        raise AnalysisCancelled
+    results.put(("progress", (index, stage), None))
+
+
+def analyze(dates, target_folder):
+    """Run the statistics flow on the worker thread, reporting every stage."""
+    return flow_control.run_statistics_flow(
+        dates, target_folder, show_graphs=False, progress=report_progress, cancel=cancel_event
+    )
+
+
+def load(file_path):
+    """Load the daily counts of a file on the worker thread."""
+    return cache.load_filtered(file_path)[1]
+
+
+def poll_results():
+    """
+    Handle the messages of the worker thread on the UI thread, then schedule the next poll.
+
+    Returns:
+        None
+    """
+    global busy, file_selected
+
+    while not results.empty():
+        kind, value, error = results.get()
+        if kind == "progress":
+            index, stage = value
+            progress_bar["value"] = index
+            status_label.config(text=f"{stage}..." if index < len(flow_control.STAGES) else stage)
+            continue
+
+        busy = False
+        set_buttons_state("normal")
+        progress_bar["value"] = 0
+        status_label.config(text="")
+        if kind == "analyze" and error is None and cancel_event.is_set():
+            # Cancelled once the last output was written: the results are not shown
+            error = AnalysisCancelled()
+        if error is not None:
+            show_error(error)
+        elif kind == "load":
+            file_selected = True
+            flow_control.daily_df = value
+            messagebox.showinfo("Success", "File loaded successfully.")
+        elif kind == "analyze":
+            show_figure(value)
+
+    window.after(POLL_INTERVAL_MS, poll_results)
+
+
+def show_error(error: Exception):
+    """
+    Show the error raised by a worker thread.
+
+    Args:
+        error (Exception): The error.
+
+    Returns:
+        None
+    """
+    if isinstance(error, AnalysisCancelled):
+        messagebox.showinfo("Info", "The analysis was cancelled.")
+    elif isinstance(error, MissingColumns):
+        messagebox.showerror(
+            "Error", f"The file does not contain the columns: {', '.join(error.args[0])}."
+        )
+    elif isinstance(error, InvalidExport):
+        messagebox.showerror("Error", f"The file is not a valid diary export:\n{error.args[0]}")
+    elif isinstance(error, DateBeforeDataDates):
+        messagebox.showerror(
+            "Error", "The provided dates are before the dates provided in the file"
+        )
+    elif isinstance(error, PermissionError):
+        messagebox.showerror(
+            "Error", "No permission to folder, please choose different one"
+        )
+    else:
+        messagebox.showerror("Error", f"Something went wrong: {error}")
+
+
+def show_figure(fig):
+    """
+    Display the figure of the graphs in a new window without blocking the main window.
+
+    Args:
+        fig (matplotlib.figure.Figure): The figure returned by the analysis.
+
+    Returns:
+        None
+    """
+    graphs_window = Toplevel(window)
+    graphs_window.title("Graphs")
+    canvas = FigureCanvasTkAgg(fig, master=graphs_window)
+    canvas.draw()
+    canvas.get_tk_widget().pack(fill="both", expand=True)
+
+
+def set_buttons_state(state: str, cancellable: bool = False):
+    """
+    Enable or disable the buttons while a worker runs.
+
+    'Cancel' is only enabled while a cancellable worker (the analysis, checking the cancel event between its
+    stages) runs: loading an export cannot be stopped, so the button stays disabled meanwhile.
+    """
+    for button in [select_file_button, select_folder_button, get_dates_button]:
+        button.config(state=state)
+    cancel_button.config(state="normal" if state == "disabled" and cancellable else "disabled")
+
+
+def on_cancel():
+    """
+    Event handler for the 'Cancel' button click. The analysis stops before its next stage, or while its outputs
+    are written: the writers not started yet are cancelled and its result is not shown.
+
+    Returns:
+        None
+    """
+    cancel_event.set()
+    status_label.config(text="Cancelling...")
 
 
 def on_click():
@@ -15,11 +194,14 @@ def on_click():
     Event handler for the 'Analyze' button click.
 
     This function is called when the 'Analyze' button is clicked. It reads the selected dates from the date entries,
-    validates the dates, and runs the statistics flow to generate statistics and save them to the selected folder.
+    validates the dates, and starts the statistics flow on a worker thread to generate statistics and save them to
+    the selected folder.
 
     Returns:
         None
     """
+    if busy:
+        return
     if not file_selected:
         messagebox.showinfo("Info", "Please select a file first.")
         return
@@ -44,18 +226,7 @@ def on_click():
             messagebox.showerror("Error", "Dates are not in the correct order.")
             return []
 
-    try:
-        graphs = flow_control.run_statistics_flow(dates, folder_path)
-    except DateBeforeDataDates:
-        messagebox.showerror(
-            "Error", "The provided dates are before the dates provided in the file"
-        )
-    except PermissionError:
-        messagebox.showerror(
-            "Error", "No permission to folder, please choose different one"
-        )
-    # except:
-    #     messagebox.showerror("Error", "Something went wrong")
+    run_in_background(analyze, dates, folder_path, cancellable=True)
 
 
 def open_file():
@@ -63,30 +234,21 @@ def open_file():
     Event handler for the 'Browse' button click to open a data file.
 
     This function is called when the 'Browse' button is clicked. It opens a file dialog to select a data file (Excel or CSV).
-    If the file contains a 'StartDate' column, it loads the data and sets the 'file_selected' flag to True.
+    The daily counts are loaded on a worker thread (from the cache when the same file was analyzed before); the
+    'file_selected' flag is set to True once they are loaded.
 
     Returns:
         None
     """
-    global file_selected
+    if busy:
+        return
 
     file_path = filedialog.askopenfilename(
         filetypes=[("Excel files", "*.xls *.xlsx"), ("CSV files", "*.csv")]
     )
     if file_path:
-        if file_path.endswith(".csv"):
-            df = pd.read_csv(file_path)
-        elif file_path.endswith(".xls") or file_path.endswith(".xlsx"):
-            df = pd.read_excel(file_path)
-
-        if "StartDate" in df.columns:
-            messagebox.showinfo("Success", "File loaded successfully.")
-            file_selected = True
-            flow_control.memories_df = df
-        else:
-            messagebox.showerror(
-                "Error", "The file does not contain a 'StartDate' column."
-            )
+        status_label.config(text="Loading file...")
+        run_in_background(load, file_path)
 
 
 def select_folder():
@@ -110,7 +272,7 @@ def select_folder():
 # Create the main window
 window = Tk()
 window.title("Inputs")
-window.geometry("600x400")  # Set the size of the window
+window.geometry("600x480")  # Set the size of the window
 
 # Customize the appearance
 window.configure(bg="white")  # Set the background color
@@ -142,6 +304,15 @@ for i in range(1, 6):
 get_dates_button = Button(window, text="Analyze", command=on_click)
 get_dates_button.pack()
 
-# Start the GUI event loop
-window.mainloop()
+progress_bar = Progressbar(window, maximum=len(flow_control.STAGES), length=300)
+progress_bar.pack()
+
+status_label = Label(window, text="")
+status_label.pack()
 
+cancel_button = Button(window, text="Cancel", command=on_cancel, state="disabled")
+cancel_button.pack()
+
+# Start polling the worker results and the GUI event loop
+window.after(POLL_INTERVAL_MS, poll_results)
+window.mainloop()
@@ -0,0 +1,282 @@
+"""
+Watch-folder service that runs the MemoryDiary analysis on every new or changed patient export.
+
+Usage:
+    python watcher.py <exports_folder> <manifest.csv> <output_folder> [--workers N] [--interval SECONDS]
+                      [--settle SECONDS] [--max-pending N] [--state-folder FOLDER] [--no-cache]
+
+The exports folder is polled every interval. An export is queued once its size and modification time have
+not changed for the settle time, so files still being copied are never read half written, and it is skipped
+when its content was already processed with the same treatment dates. At most max-pending exports are in the
+worker pool at once, the others stay queued (once per export) until a worker is free. The manifest is the one
+of batch.py and is re-read when it changes, so patients can be added or their dates corrected without
+restarting. Every processed export is logged to watch_log.csv in the output folder.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+import batch
+from logics import cache
+
+STATE_FILE = "watch_state.json"
+LOG_FILE = "watch_log.csv"
+INTERVAL_SECONDS = 5.0
+SETTLE_SECONDS = 10.0
+
+
+class ExportWatcher:
+    """
+    Polls an exports folder and processes the settled new or changed exports on a bounded process pool.
+
+    Args:
+        exports_folder (str): The folder the exports land in, named after the patient id.
+        manifest_path (str): The path of the manifest CSV file of the treatment dates.
+        output_folder (str): The folder of the outputs, one subfolder per patient.
+        workers (int): The number of worker processes.
+        settle (float): The seconds an export must stay unchanged before it is processed.
+        max_pending (int): The maximum number of exports in the pool at once, defaults to twice the workers.
+        cache_folder (str): The cache folder of the parsed and filtered tables, None to disable the cache.
+        state_folder (str): The folder of the incremental state of every patient, None to rebuild the patient.
+        clock (Callable[[], float]): The monotonic clock the settle time is measured with.
+    """
+
+    def __init__(
+        self,
+        exports_folder: str,
+        manifest_path: str,
+        output_folder: str,
+        workers: int = 1,
+        settle: float = SETTLE_SECONDS,
+        max_pending: int = None,
+        cache_folder: str = cache.CACHE_FOLDER,
+        state_folder: str = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.exports_folder = exports_folder
+        self.manifest_path = manifest_path
+        self.output_folder = output_folder
+        self.workers = workers
+        self.settle = settle
+        self.max_pending = max_pending or 2 * workers
+        self.cache_folder = cache_folder
+        self.state_folder = state_folder
+        self.clock = clock
+
+        self.manifest: Dict[str, List] = {}
+        self.manifest_mtime = None
+        # path -> (signature, time the signature was first seen)
+        self.seen: Dict[str, Tuple[Tuple, float]] = {}
+        # path -> signature of the last hash check, so settled files are hashed once
+        self.checked: Dict[str, Tuple] = {}
+        # path -> digest of the exports waiting for the pool, in arrival order
+        self.queue: Dict[str, str] = {}
+        self.pending: Dict[Future, Tuple[str, str]] = {}
+        self.executor: ProcessPoolExecutor = None
+
+        os.makedirs(output_folder, exist_ok=True)
+        self.state_path = os.path.join(output_folder, STATE_FILE)
+        self.digests: Dict[str, str] = {}
+        if os.path.isfile(self.state_path):
+            with open(self.state_path) as file:
+                self.digests = json.load(file)
+
+    def __enter__(self):
+        self.executor = ProcessPoolExecutor(self.workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.drain()
+        self.executor.shutdown()
+
+    def scan(self) -> Dict[str, Tuple]:
+        """
+        List the exports of the folder.
+
+        Returns:
+            Dict[str, Tuple]: The (size, modification time) signature of every export, by path.
+        """
+        return {
+            entry.path: (entry.stat().st_size, entry.stat().st_mtime_ns)
+            for entry in os.scandir(self.exports_folder)
+            if entry.is_file() and os.path.splitext(entry.name)[1] in batch.EXPORT_EXTENSIONS
+        }
+
+    def settled(self, signatures: Dict[str, Tuple]) -> List[str]:
+        """
+        Debounce the exports: keep the ones whose signature has not changed for the settle time.
+
+        Args:
+            signatures (Dict[str, Tuple]): The current signatures, as returned by scan.
+
+        Returns:
+            List[str]: The paths of the settled exports.
+        """
+        now = self.clock()
+        self.seen = {
+            path: self.seen[path] if self.seen.get(path, (None,))[0] == signature else (signature, now)
+            for path, signature in signatures.items()
+        }
+        return [
+            path
+            for path, (signature, first_seen) in self.seen.items()
+            if now - first_seen >= self.settle and self.checked.get(path) != signature
+        ]
+
+    def reload_manifest(self):
+        """Re-read the manifest when it changed, and re-check every export against its new rows."""
+        mtime = os.stat(self.manifest_path).st_mtime_ns
+        if mtime == self.manifest_mtime:
+            return
+        self.manifest = batch.read_manifest(self.manifest_path)
+        self.manifest_mtime = mtime
+        self.checked = {}
+
+    def job_digest(self, path: str, patient: str) -> str:
+        """
+        Hash what the outputs of an export depend on: its content and the patient's treatment dates.
+
+        Args:
+            path (str): The path of the export.
+            patient (str): The patient id, in the manifest.
+
+        Returns:
+            str: The hex digest.
+        """
+        digest = hashlib.sha256(cache.file_digest(path).encode())
+        digest.update(json.dumps([pd.Timestamp(d).date().isoformat() for d in self.manifest[patient]]).encode())
+        return digest.hexdigest()
+
+    def enqueue(self, paths: List[str]):
+        """
+        Queue the settled exports whose content or treatment dates were not processed yet.
+
+        An export already queued keeps its place and gets the new digest.
+
+        Args:
+            paths (List[str]): The paths of the settled exports.
+        """
+        in_flight = {path for path, _ in self.pending.values()}
+        for path in paths:
+            if path in in_flight:
+                # Checked again once the running job is done
+                continue
+            self.checked[path] = self.seen[path][0]
+            patient = os.path.splitext(os.path.basename(path))[0]
+            if patient not in self.manifest:
+                print(f"{path}: patient {patient} is not in the manifest, skipped", flush=True)
+                continue
+            digest = self.job_digest(path, patient)
+            if self.digests.get(path) != digest:
+                self.queue[path] = digest
+            else:
+                self.queue.pop(path, None)
+
+    def submit(self):
+        """Move queued exports into the pool while it has less than max_pending of them."""
+        while self.queue and len(self.pending) < self.max_pending:
+            path = next(iter(self.queue))
+            digest = self.queue.pop(path)
+            patient = os.path.splitext(os.path.basename(path))[0]
+            future = self.executor.submit(
+                batch.process_patient,
+                patient,
+                self.exports_folder,
+                self.manifest[patient],
+                self.output_folder,
+                self.cache_folder,
+                state_folder=self.state_folder,
+            )
+            self.pending[future] = (path, digest)
+
+    def collect(self, wait: bool = False):
+        """
+        Record the finished jobs in the log, and their content hash when they succeeded.
+
+        Args:
+            wait (bool): Whether to wait for the jobs still running.
+        """
+        done = [future for future in self.pending if wait or future.done()]
+        if not done:
+            return
+        rows = []
+        for future in done:
+            path, digest = self.pending.pop(future)
+            summary, _ = future.result()
+            if summary["status"] != "failed":
+                self.digests[path] = digest
+            rows.append({"time": datetime.now().isoformat(timespec="seconds"), "file": path, **summary})
+
+        log_path = os.path.join(self.output_folder, LOG_FILE)
+        pd.DataFrame(rows).to_csv(log_path, mode="a", header=not os.path.isfile(log_path), index=False)
+        partial = f"{self.state_path}.partial"
+        with open(partial, "w") as file:
+            json.dump(self.digests, file, indent=2)
+        os.replace(partial, self.state_path)
+
+    def poll(self):
+        """Run one cycle: collect the finished jobs, find the settled changed exports and fill the pool."""
+        self.collect()
+        self.reload_manifest()
+        self.enqueue(self.settled(self.scan()))
+        self.submit()
+
+    def drain(self):
+        """Process everything queued and wait for the pool to finish."""
+        while self.queue or self.pending:
+            self.submit()
+            self.collect(wait=True)
+
+    def run(self, interval: float = INTERVAL_SECONDS):
+        """
+        Poll the folder until interrupted, then finish the jobs already queued.
+
+        Args:
+            interval (float): The seconds between two polls.
+        """
+        with self:
+            try:
+                while True:
+                    self.poll()
+                    time.sleep(interval)
+            except KeyboardInterrupt:
+                print("Stopping, waiting for the queued exports", flush=True)
+
+
+def main(argv: List = None):
+    parser = argparse.ArgumentParser(description="Watch a folder of Qualtrics exports and analyze them.")
+    parser.add_argument("exports_folder")
+    parser.add_argument("manifest")
+    parser.add_argument("output_folder")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=INTERVAL_SECONDS, help="seconds between two polls")
+    parser.add_argument(
+        "--settle", type=float, default=SETTLE_SECONDS, help="seconds an export must stay unchanged"
+    )
+    parser.add_argument("--max-pending", type=int, default=None, help="maximum exports in the pool at once")
+    parser.add_argument("--state-folder", default=None, help="update every patient incrementally")
+    parser.add_argument("--cache-folder", default=cache.CACHE_FOLDER)
+    parser.add_argument("--no-cache", action="store_true", help="always parse and filter the exports")
+    args = parser.parse_args(argv)
+
+    ExportWatcher(
+        args.exports_folder,
+        args.manifest,
+        args.output_folder,
+        args.workers,
+        args.settle,
+        args.max_pending,
+        None if args.no_cache else args.cache_folder,
+        args.state_folder,
+    ).run(args.interval)
+
+
+if __name__ == "__main__":
+    main()